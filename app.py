@@ -128,9 +128,13 @@ def create_app():
             400,
         )
 
+    from scrobblescope.cache import prewarm_db_pool
+    from scrobblescope.cache_janitor import start_cache_janitor
     from scrobblescope.routes import bp
 
     application.register_blueprint(bp)
+    prewarm_db_pool()
+    start_cache_janitor()
     return application
 
 
@@ -43,6 +43,120 @@ async def main():
                 )
                 """
             )
+            # Per-album read counter ranking the rows pre-loaded into the
+            # in-process hot tier at boot.
+            await conn.execute(
+                """
+                ALTER TABLE spotify_cache
+                ADD COLUMN IF NOT EXISTS hit_count INTEGER NOT NULL DEFAULT 0
+                """
+            )
+            # Track durations as parallel arrays (schema v2).  Rows still
+            # holding only the v1 JSONB map get their arrays here.  The JSONB
+            # column is kept -- and still written by the app -- for one
+            # release, so machines on the old code during a rolling deploy
+            # or after a rollback keep reading durations.  A follow-up
+            # release clears it once no machine runs the v1 code.
+            await conn.execute(
+                """
+                ALTER TABLE spotify_cache
+                ADD COLUMN IF NOT EXISTS track_names   TEXT[],
+                ADD COLUMN IF NOT EXISTS track_seconds INTEGER[]
+                """
+            )
+            # Idempotent: converted rows have track_names set, so the WHERE
+            # matches nothing on later runs and only costs one scan.
+            converted = await conn.execute(
+                """
+                UPDATE spotify_cache SET
+                    (track_names, track_seconds) = (
+                        SELECT COALESCE(array_agg(key ORDER BY key), '{}'),
+                               COALESCE(
+                                   array_agg(value::numeric::int ORDER BY key),
+                                   '{}'
+                               )
+                        FROM jsonb_each_text(track_durations)
+                    )
+                WHERE track_names IS NULL AND track_durations IS NOT NULL
+                """
+            )
+            print(f"track_durations migration: {converted}")
+            # Negative cache: albums Spotify search had no match for.
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS spotify_no_match (
+                    artist_norm TEXT NOT NULL,
+                    album_norm  TEXT NOT NULL,
+                    updated_at  TIMESTAMPTZ DEFAULT NOW(),
+                    PRIMARY KEY (artist_norm, album_norm)
+                )
+                """
+            )
+            # The cache janitor deletes rows by age in small batches; these
+            # keep each batch an index range scan instead of a table scan.
+            await conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS spotify_cache_updated_at_idx
+                ON spotify_cache (updated_at)
+                """
+            )
+            await conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS spotify_no_match_updated_at_idx
+                ON spotify_no_match (updated_at)
+                """
+            )
+            # Spotify access token shared by every machine (one row).
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS spotify_token (
+                    id         SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+                    token      TEXT NOT NULL,
+                    expires_at DOUBLE PRECISION NOT NULL,
+                    updated_at TIMESTAMPTZ DEFAULT NOW()
+                )
+                """
+            )
+            # Persistent scrobble store (scrobblescope/scrobble_store.py):
+            # flattened scrobbles per user plus the contiguous synced window.
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS lastfm_scrobbles (
+                    username TEXT NOT NULL,
+                    uts      BIGINT NOT NULL,
+                    artist   TEXT NOT NULL,
+                    album    TEXT NOT NULL,
+                    track    TEXT NOT NULL
+                )
+                """
+            )
+            # No uniqueness: the same track can genuinely be scrobbled twice
+            # in one second, and fetched windows are deleted before their
+            # rows are inserted, so re-syncs never duplicate rows.  Older
+            # deployments created a primary key; dropping it is a no-op once
+            # it is gone.
+            await conn.execute(
+                """
+                ALTER TABLE lastfm_scrobbles
+                DROP CONSTRAINT IF EXISTS lastfm_scrobbles_pkey
+                """
+            )
+            await conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS lastfm_scrobbles_username_uts_idx
+                ON lastfm_scrobbles (username, uts)
+                """
+            )
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS lastfm_sync_state (
+                    username        TEXT PRIMARY KEY,
+                    synced_from_uts BIGINT NOT NULL,
+                    synced_to_uts   BIGINT NOT NULL,
+                    updated_at      TIMESTAMPTZ DEFAULT NOW()
+                )
+                """
+            )
             print("Schema initialized successfully")
         finally:
             await conn.close()
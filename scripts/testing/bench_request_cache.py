@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""Benchmark REQUEST_CACHE memory vs. decode cost for Last.fm pages.
+
+Builds a synthetic heavy user (100 ``user.getrecenttracks`` pages of 200
+tracks by default, shaped like real responses including the image URL lists)
+and compares two ways of keeping those pages in the in-memory cache:
+
+- **plain**: the decoded dicts, as ``set_cached_response`` stores by default.
+- **compressed**: zlib-compressed JSON via ``set_cached_response(...,
+  compress=True)``, decoded again on every hit.
+
+Memory is measured with ``tracemalloc`` (actual allocations) and with the
+``approx_size`` estimate the LRU budget is charged with.  Timings are the
+per-page encode cost on ``set`` and decode cost on ``get``.
+
+Usage example::
+
+    python scripts/testing/bench_request_cache.py --pages 100 --repeat 3
+
+No network or database access is needed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+# When executed directly Python adds the script's own directory to sys.path,
+# not the repo root.  Insert the repo root so ``scrobblescope`` resolves.
+_REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(_REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(_REPO_ROOT))
+
+from scrobblescope.lru import approx_size  # noqa: E402
+from scrobblescope.utils import (  # noqa: E402
+    _compress_payload,
+    _decompress_payload,
+)
+
+
+@dataclass
+class BenchResult:
+    """Memory and timing figures for one cache encoding.
+
+    Attributes
+    ----------
+    label : str
+        ``"plain"`` or ``"compressed"``.
+    traced_bytes : int
+        Bytes held by the cached pages according to ``tracemalloc``.
+    budget_bytes : int
+        Bytes the LRU budget is charged for the same pages.
+    encode_ms_per_page : float
+        Mean time to prepare one page for the cache.
+    decode_ms_per_page : float
+        Mean time to turn one cached entry back into a page dict.
+    """
+
+    label: str
+    traced_bytes: int
+    budget_bytes: int
+    encode_ms_per_page: float
+    decode_ms_per_page: float
+
+
+def make_page(
+    page: int, total_pages: int, tracks_per_page: int, rng: random.Random
+) -> dict[str, Any]:
+    """Return one synthetic ``user.getrecenttracks`` page.
+
+    Artists and albums are drawn from small pools so repetition resembles a
+    real listening history, which matters for how well zlib compresses it.
+    """
+    tracks = []
+    base_uts = 1_700_000_000 - page * tracks_per_page * 200
+    for i in range(tracks_per_page):
+        artist = f"Artist {rng.randrange(300)}"
+        album = f"{artist} Album {rng.randrange(8)}"
+        name = f"Track {rng.randrange(5000)}"
+        uts = base_uts - i * 200
+        image_id = f"{rng.getrandbits(64):016x}"
+        tracks.append(
+            {
+                "artist": {"mbid": "", "#text": artist},
+                "streamable": "0",
+                "image": [
+                    {
+                        "size": size,
+                        "#text": (
+                            f"https://lastfm.freetls.fastly.net/i/u/{px}/"
+                            f"{image_id}.png"
+                        ),
+                    }
+                    for size, px in (
+                        ("small", "34s"),
+                        ("medium", "64s"),
+                        ("large", "174s"),
+                        ("extralarge", "300x300"),
+                    )
+                ],
+                "mbid": "",
+                "album": {"mbid": "", "#text": album},
+                "name": name,
+                "url": f"https://www.last.fm/music/{artist}/_/{name}",
+                "date": {"uts": str(uts), "#text": "01 Jan 2024, 00:00"},
+            }
+        )
+    return {
+        "recenttracks": {
+            "track": tracks,
+            "@attr": {
+                "user": "bench",
+                "totalPages": str(total_pages),
+                "page": str(page),
+                "perPage": str(tracks_per_page),
+                "total": str(total_pages * tracks_per_page),
+            },
+        }
+    }
+
+
+def make_pages(pages: int, tracks_per_page: int, seed: int = 0) -> list[dict]:
+    """Return *pages* synthetic pages for one user."""
+    rng = random.Random(seed)
+    return [make_page(p, pages, tracks_per_page, rng) for p in range(1, pages + 1)]
+
+
+def _traced(build) -> tuple[Any, int]:
+    """Run *build* and return ``(result, bytes still allocated by it)``."""
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = build()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, after - before
+
+
+def bench_plain(pages: list[dict]) -> BenchResult:
+    """Measure caching decoded page dicts (no encode/decode work)."""
+    # Decoding a real response is what produces these dicts; re-create them
+    # from the compressed form under tracemalloc to count their allocations.
+    blobs = [_compress_payload(p) for p in pages]
+    held, traced = _traced(lambda: [_decompress_payload(b) for b in blobs])
+    budget = sum(approx_size(p) for p in held)
+    return BenchResult("plain", traced, budget, 0.0, 0.0)
+
+
+def bench_compressed(pages: list[dict], repeat: int) -> BenchResult:
+    """Measure caching zlib-compressed JSON and decoding it per hit."""
+    held, traced = _traced(lambda: [_compress_payload(p) for p in pages])
+    budget = sum(sys.getsizeof(b) + sys.getsizeof(b.blob) for b in held)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            _compress_payload(page)
+    encode_ms = (time.perf_counter() - start) * 1000 / (repeat * len(pages))
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for blob in held:
+            _decompress_payload(blob)
+    decode_ms = (time.perf_counter() - start) * 1000 / (repeat * len(pages))
+
+    return BenchResult("compressed", traced, budget, encode_ms, decode_ms)
+
+
+def print_results(results: list[BenchResult], pages: int) -> None:
+    """Print one line per encoding plus the plain/compressed ratio."""
+    for r in results:
+        print(
+            f"{r.label:>10}: "
+            f"traced={r.traced_bytes / (1024 * 1024):.1f}MB "
+            f"budget={r.budget_bytes / (1024 * 1024):.1f}MB "
+            f"encode={r.encode_ms_per_page:.2f}ms/page "
+            f"decode={r.decode_ms_per_page:.2f}ms/page"
+        )
+    plain, compressed = results
+    if compressed.traced_bytes:
+        ratio = plain.traced_bytes / compressed.traced_bytes
+        print(f"memory ratio (plain/compressed)={ratio:.1f}x")
+    print(
+        f"full-user decode ({pages} pages)="
+        f"{compressed.decode_ms_per_page * pages:.0f}ms"
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Create and return the CLI argument parser."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--tracks-per-page", type=int, default=200)
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Timing passes over all pages."
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run both benchmarks and print their results."""
+    args = build_parser().parse_args(argv)
+    pages = make_pages(args.pages, args.tracks_per_page, args.seed)
+    results = [
+        bench_plain(pages),
+        bench_compressed(pages, args.repeat),
+    ]
+    print_results(results, args.pages)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
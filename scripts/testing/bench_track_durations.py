@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Benchmark the two ``spotify_cache`` track-duration formats.
+
+Builds a synthetic batch of albums (500 by default, the size of a large
+``_batch_lookup_metadata`` call) and compares how their track durations
+are stored and read back:
+
+- **jsonb**: the v1 format, a JSONB ``{track: seconds}`` map.  asyncpg
+  hands JSONB to the app as text, so every lookup runs ``json.loads`` and
+  every persist ``json.dumps``.
+- **arrays**: the v2 ``track_names text[]`` / ``track_seconds int[]``
+  columns, which asyncpg decodes natively into lists.
+
+Decode times run the real ``_decode_track_durations`` over row dicts
+shaped like the asyncpg records of each format.  Stored sizes are
+estimates of the on-disk values from the documented JSONB and array
+layouts (headers, per-entry offsets, element data), not measurements.
+
+Usage example::
+
+    python scripts/testing/bench_track_durations.py --albums 500 --repeat 20
+
+No network or database access is needed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+# When executed directly Python adds the script's own directory to sys.path,
+# not the repo root.  Insert the repo root so ``scrobblescope`` resolves.
+_REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(_REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(_REPO_ROOT))
+
+from scrobblescope.cache import (  # noqa: E402
+    _decode_track_durations,
+    _flatten_track_durations,
+)
+
+_WORDS = (
+    "love night heart time world dream light fire home road blue rain "
+    "summer song girl away life run down dance sky gold"
+).split()
+
+
+@dataclass
+class BenchResult:
+    """Size and timing figures for one storage format.
+
+    Attributes
+    ----------
+    label : str
+        ``"jsonb"`` or ``"arrays"``.
+    stored_bytes : int
+        Estimated bytes of the stored values for the whole batch.
+    encode_ms_per_batch : float
+        Mean time to prepare the batch's durations for the upsert.
+    decode_ms_per_batch : float
+        Mean time to turn the batch's rows back into duration dicts.
+    """
+
+    label: str
+    stored_bytes: int
+    encode_ms_per_batch: float
+    decode_ms_per_batch: float
+
+
+def make_albums(albums: int, tracks: int, seed: int = 0) -> list[dict[str, int]]:
+    """Return *albums* ``{normalized track name: seconds}`` dicts."""
+    rng = random.Random(seed)
+    result = []
+    for _ in range(albums):
+        count = max(1, int(rng.gauss(tracks, tracks / 4)))
+        result.append(
+            {
+                " ".join(rng.sample(_WORDS, rng.randint(1, 4)))
+                + f" {i}": (rng.randint(90, 480))
+                for i in range(count)
+            }
+        )
+    return result
+
+
+def _jsonb_size(durations: dict[str, int]) -> int:
+    # Container header, one JEntry per key and per value, key bytes, and
+    # each value as a padded numeric.
+    keys = sum(len(k.encode()) for k in durations)
+    return 4 + 8 * len(durations) + keys + 8 * len(durations)
+
+
+def _arrays_size(durations: dict[str, int]) -> int:
+    # Two one-dimensional arrays without NULLs: a 24-byte header each, a
+    # short varlena per name, four bytes per int.
+    names = sum(1 + len(k.encode()) for k in durations)
+    return 24 + names + 24 + 4 * len(durations)
+
+
+def _time_ms(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def bench_jsonb(albums: list[dict[str, int]], repeat: int) -> BenchResult:
+    """Measure the v1 JSONB format."""
+    rows = [{"track_names": None, "track_durations": json.dumps(d)} for d in albums]
+    encode = _time_ms(lambda: [json.dumps(d) for d in albums], repeat)
+    decode = _time_ms(lambda: [_decode_track_durations(r) for r in rows], repeat)
+    size = sum(_jsonb_size(d) for d in albums)
+    return BenchResult("jsonb", size, encode, decode)
+
+
+def bench_arrays(albums: list[dict[str, int]], repeat: int) -> BenchResult:
+    """Measure the v2 ``track_names``/``track_seconds`` format."""
+    rows = [
+        {
+            "track_names": list(d),
+            "track_seconds": list(d.values()),
+            "track_durations": None,
+        }
+        for d in albums
+    ]
+    encode = _time_ms(lambda: _flatten_track_durations(albums), repeat)
+    decode = _time_ms(lambda: [_decode_track_durations(r) for r in rows], repeat)
+    size = sum(_arrays_size(d) for d in albums)
+    return BenchResult("arrays", size, encode, decode)
+
+
+def print_results(results: list[BenchResult], albums: int) -> None:
+    """Print one line per format plus the jsonb/arrays ratios."""
+    for r in results:
+        print(
+            f"{r.label:>6}: "
+            f"stored~{r.stored_bytes / 1024:.0f}KB "
+            f"encode={r.encode_ms_per_batch:.2f}ms "
+            f"decode={r.decode_ms_per_batch:.2f}ms "
+            f"per {albums}-album batch"
+        )
+    jsonb, arrays = results
+    if arrays.decode_ms_per_batch and arrays.stored_bytes:
+        print(
+            f"decode speed-up={jsonb.decode_ms_per_batch / arrays.decode_ms_per_batch:.1f}x "
+            f"size ratio={jsonb.stored_bytes / arrays.stored_bytes:.2f}x"
+        )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Create and return the CLI argument parser."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--albums", type=int, default=500)
+    parser.add_argument("--tracks", type=int, default=12, help="Mean tracks per album.")
+    parser.add_argument(
+        "--repeat", type=int, default=20, help="Timing passes over the batch."
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run both benchmarks and print their results."""
+    args = build_parser().parse_args(argv)
+    albums = make_albums(args.albums, args.tracks, args.seed)
+    results = [bench_jsonb(albums, args.repeat), bench_arrays(albums, args.repeat)]
+    print_results(results, args.albums)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,13 +2,26 @@ import asyncio
 import json
 import logging
 import os
+import threading
+import time
 
 try:
     import asyncpg
 except ImportError:
     asyncpg = None
 
-from scrobblescope.config import METADATA_CACHE_TTL_DAYS
+from scrobblescope.config import (
+    DB_POOL_HEALTH_CHECK_SECONDS,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_MIN_SIZE,
+    METADATA_CACHE_TTL_DAYS,
+    METADATA_HOT_CACHE_MAX_MB,
+    METADATA_HOT_CACHE_PRELOAD,
+    METADATA_REFRESH_AHEAD_DAYS,
+    SPOTIFY_NO_MATCH_TTL_DAYS,
+)
+from scrobblescope.lru import LRUCache
+from scrobblescope.service_loop import run_on_service_loop, submit
 
 # Capture DATABASE_URL once at import time.  load_dotenv() in app.py runs
 # before any module in scrobblescope is imported, so the value is guaranteed
@@ -19,11 +32,14 @@ _DATABASE_URL: str | None = os.environ.get("DATABASE_URL")
 
 
 async def _get_db_connection():
-    """Open a single asyncpg connection from DATABASE_URL, or return None.
+    """Return a handle for running queries against DATABASE_URL, or None.
 
     Returns None if DATABASE_URL is unset, asyncpg is unavailable, or the
-    connection attempt fails. The caller is responsible for closing the
-    returned connection.
+    database cannot be reached. The caller is responsible for closing the
+    returned handle.
+
+    The handle borrows from the process-wide pool (``_PooledConnection``);
+    with DB_POOL_MAX_SIZE set to 0 it is a dedicated asyncpg connection.
 
     Failure reasons are logged with explicit classification labels:
     - `asyncpg-missing`
@@ -42,17 +58,25 @@ async def _get_db_connection():
     if not dsn:
         logging.info("DB cache disabled (missing-env-var): DATABASE_URL is not set.")
         return None
+    if DB_POOL_MAX_SIZE <= 0:
+        return await _connect_with_retry(lambda: asyncpg.connect(dsn), "connection")
+    pool = await run_on_service_loop(_ensure_pool(dsn))
+    return None if pool is None else _PooledConnection(pool)
+
+
+async def _connect_with_retry(connect, what):
+    """Return ``await connect()``, retrying with backoff; None on exhaustion."""
     max_attempts = max(1, int(os.environ.get("DB_CONNECT_MAX_ATTEMPTS", "3")))
     base_delay_seconds = float(os.environ.get("DB_CONNECT_BASE_DELAY_SECONDS", "0.25"))
     for attempt in range(1, max_attempts + 1):
         try:
-            conn = await asyncpg.connect(dsn)
-            return conn
+            return await connect()
         except Exception as exc:
             if attempt >= max_attempts:
                 logging.warning(
-                    "DB cache unavailable (db-down): connection failed after %s "
+                    "DB cache unavailable (db-down): %s failed after %s "
                     "attempts (cache disabled): %s",
+                    what,
                     max_attempts,
                     exc,
                 )
@@ -69,13 +93,284 @@ async def _get_db_connection():
             await asyncio.sleep(delay)
 
 
+# The process-wide pool.  asyncpg pools are bound to the loop that created
+# them, so the pool is created, used and health-checked only on the service
+# loop; jobs reach it through _PooledConnection.
+_pool = None
+_pool_lock = None
+_pool_health_task = None
+
+
+async def _ensure_pool(dsn):
+    """Return the pool, creating it on first use; None if the DB is down.
+
+    Runs on the service loop.  A failed creation is retried by the next
+    caller, as a failed per-job connection used to be.
+    """
+    global _pool, _pool_lock, _pool_health_task
+    if _pool is not None:
+        return _pool
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+    async with _pool_lock:
+        if _pool is None:
+            pool = await _connect_with_retry(
+                lambda: asyncpg.create_pool(
+                    dsn, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE
+                ),
+                "pool creation",
+            )
+            if pool is not None:
+                logging.info(
+                    f"DB pool ready ({DB_POOL_MIN_SIZE}-{DB_POOL_MAX_SIZE} "
+                    f"connections)"
+                )
+                _pool = pool
+                if _pool_health_task is None or _pool_health_task.done():
+                    _pool_health_task = asyncio.ensure_future(_check_pool_health())
+    return _pool
+
+
+async def _check_pool_health():
+    """Ping the pool every DB_POOL_HEALTH_CHECK_SECONDS; drop it when broken.
+
+    A pool whose connections died (a Postgres restart, a Fly machine
+    migration) is terminated, and the next ``_get_db_connection`` builds a
+    fresh one.  Stops once the pool is gone.
+    """
+    global _pool
+    while _pool is not None:
+        await asyncio.sleep(DB_POOL_HEALTH_CHECK_SECONDS)
+        pool = _pool
+        if pool is None:
+            return
+        try:
+            await asyncio.wait_for(pool.fetchval("SELECT 1"), timeout=5)
+        except Exception as exc:
+            logging.warning(f"DB pool health check failed, recycling: {exc}")
+            if _pool is pool:
+                _pool = None
+            pool.terminate()
+            return
+
+
+def _db_configured():
+    """Return True when asyncpg is installed and DATABASE_URL is set."""
+    return asyncpg is not None and bool(_DATABASE_URL)
+
+
+def prewarm_db_pool():
+    """Create the pool in the background at startup (non-blocking).
+
+    The first job then finds its connections open, and a sleeping Fly
+    Postgres starts waking before anyone waits for it.  The most-hit
+    METADATA_HOT_CACHE_PRELOAD metadata rows are then loaded into the hot
+    tier.  A no-op without asyncpg, DATABASE_URL or the pool.
+    """
+    if not _db_configured() or DB_POOL_MAX_SIZE <= 0:
+        return
+    submit(_prewarm(_DATABASE_URL))
+
+
+async def _prewarm(dsn):
+    pool = await _ensure_pool(dsn)
+    if pool is None or METADATA_HOT_CACHE_PRELOAD <= 0:
+        return
+    loaded = await _preload_hot_metadata(pool, METADATA_HOT_CACHE_PRELOAD)
+    logging.info(f"Metadata hot tier pre-loaded with {loaded} rows")
+
+
+class _PooledConnection:
+    """Connection-like handle over the pool, usable from any event loop.
+
+    Each ``fetch``/``fetchrow``/``fetchval``/``execute`` borrows a pooled
+    connection on the service loop for that one statement, so a job never
+    holds a connection while it waits on Spotify or Last.fm.  Inside
+    ``async with handle.transaction():`` the handle is pinned to one
+    connection until the block ends.  Between statements it holds nothing,
+    so ``close`` has nothing to release; it keeps the open/close shape of
+    a dedicated connection for callers.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._pinned = None
+
+    async def _run(self, method, args, kwargs):
+        target = self._pinned if self._pinned is not None else self._pool
+
+        async def call():
+            return await getattr(target, method)(*args, **kwargs)
+
+        return await run_on_service_loop(call())
+
+    async def fetch(self, *args, **kwargs):
+        return await self._run("fetch", args, kwargs)
+
+    async def fetchrow(self, *args, **kwargs):
+        return await self._run("fetchrow", args, kwargs)
+
+    async def fetchval(self, *args, **kwargs):
+        return await self._run("fetchval", args, kwargs)
+
+    async def execute(self, *args, **kwargs):
+        return await self._run("execute", args, kwargs)
+
+    def transaction(self):
+        return _PooledTransaction(self)
+
+    async def close(self):
+        self._pinned = None
+
+
+class _PooledTransaction:
+    """``async with`` block running its handle's statements in one transaction."""
+
+    def __init__(self, handle):
+        self._handle = handle
+        self._tx = None
+
+    async def __aenter__(self):
+        pool = self._handle._pool
+
+        async def begin():
+            conn = await pool.acquire()
+            try:
+                tx = conn.transaction()
+                await tx.start()
+            except BaseException:
+                await pool.release(conn)
+                raise
+            return conn, tx
+
+        self._handle._pinned, self._tx = await run_on_service_loop(begin())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pool = self._handle._pool
+        conn, tx = self._handle._pinned, self._tx
+        self._handle._pinned = None
+
+        async def end():
+            try:
+                if exc_type is None:
+                    await tx.commit()
+                else:
+                    await tx.rollback()
+            finally:
+                await pool.release(conn)
+
+        await run_on_service_loop(end())
+        return False
+
+
+# Hot tier in front of spotify_cache: rows any job read or wrote recently,
+# so popular albums need no DB round trip and survive short DB outages.  An
+# entry never outlives its DB row: its TTL ends when the row's does.
+_METADATA_TTL_SECONDS = METADATA_CACHE_TTL_DAYS * 24 * 60 * 60
+_METADATA_HOT = LRUCache(METADATA_HOT_CACHE_MAX_MB * 1024 * 1024, _METADATA_TTL_SECONDS)
+_DB_TIER_LOCK = threading.Lock()
+_db_tier_hits = 0
+_db_tier_misses = 0
+
+
+def _lookup_hot_metadata(keys):
+    """Return the hot-tier rows for *keys*, shaped like ``_batch_lookup_metadata``.
+
+    Values are shallow copies; the ``track_durations`` dicts are shared
+    with the tier and must not be mutated.
+    """
+    found = {}
+    for key in keys:
+        row = _METADATA_HOT.get(key)
+        if row is not None:
+            found[key] = dict(row)
+    return found
+
+
+def get_metadata_cache_stats():
+    """Return hit/miss counters of both metadata tiers (memory, then DB)."""
+    with _DB_TIER_LOCK:
+        db = {"hits": _db_tier_hits, "misses": _db_tier_misses}
+    return {"memory": _METADATA_HOT.stats(), "db": db}
+
+
+def _decode_track_durations(row):
+    """Return a row's ``{track: seconds}`` dict, or None if not yet fetched.
+
+    Rows are stored as parallel ``track_names``/``track_seconds`` arrays,
+    which asyncpg decodes natively, and -- for one release, while machines
+    on the old code may still write it -- also as the v1 JSONB
+    ``track_durations`` map.  The JSONB wins while it is set: an old-code
+    upsert rewrites it but leaves the arrays stale.
+    """
+    td = row["track_durations"]
+    if td is None:
+        names = row.get("track_names")
+        if names is not None:
+            return dict(zip(names, row["track_seconds"]))
+        return None
+    if isinstance(td, str):
+        td = json.loads(td)
+    return td or {}
+
+
+def _flatten_track_durations(all_durations):
+    """Flatten per-row durations into parameters for ``_batch_persist_metadata``.
+
+    Returns ``(fetched, row_numbers, names, seconds)``: *fetched* says per
+    row whether durations are known (None means "not yet fetched"), and the
+    other three are parallel arrays holding every track, tagged with its
+    row's 1-based number.
+    """
+    fetched, row_numbers, names, seconds = [], [], [], []
+    for number, durations in enumerate(all_durations, start=1):
+        fetched.append(durations is not None)
+        for name, secs in (durations or {}).items():
+            row_numbers.append(number)
+            names.append(name)
+            seconds.append(secs)
+    return fetched, row_numbers, names, seconds
+
+
+def _remember_metadata_rows(rows, now=None):
+    """Parse ``spotify_cache`` rows into lookup dicts and add them to the hot tier.
+
+    Rows selected with an ``updated_epoch`` column keep their remaining DB
+    lifetime; others get the full TTL.
+    """
+    now = time.time() if now is None else now
+    result = {}
+    for r in rows:
+        key = (r["artist_norm"], r["album_norm"])
+        row = {
+            "spotify_id": r["spotify_id"],
+            "release_date": r["release_date"],
+            "album_image_url": r["album_image_url"],
+            "track_durations": _decode_track_durations(r),
+        }
+        updated_epoch = r.get("updated_epoch")
+        ttl = None
+        if updated_epoch is not None:
+            ttl = float(updated_epoch) + _METADATA_TTL_SECONDS - now
+        if ttl is None or ttl > 0:
+            _METADATA_HOT.set(key, row, now=now, ttl=ttl)
+        result[key] = dict(row)
+    return result
+
+
 async def _batch_lookup_metadata(conn, keys):
     """Look up cached Spotify metadata for a batch of (artist_norm, album_norm) keys.
 
     Executes a single SELECT using unnest() for efficient batch lookup.
     Only rows updated within the configured TTL are returned.
     Returns a dict keyed by (artist_norm, album_norm) with plain-dict values.
+    Rows found are added to the hot tier (``_lookup_hot_metadata``).
+
+    ``track_durations`` is None for rows cached from a search hit alone
+    (durations not yet fetched) and a dict, possibly empty, otherwise.
     """
+    global _db_tier_hits, _db_tier_misses
     if not keys:
         return {}
     artists = [k[0] for k in keys]
@@ -83,7 +378,8 @@ async def _batch_lookup_metadata(conn, keys):
     rows = await conn.fetch(
         """
         SELECT artist_norm, album_norm, spotify_id, release_date,
-               album_image_url, track_durations
+               album_image_url, track_names, track_seconds, track_durations,
+               EXTRACT(EPOCH FROM updated_at) AS updated_epoch
         FROM spotify_cache
         WHERE (artist_norm, album_norm) IN (
             SELECT unnest($1::text[]), unnest($2::text[])
@@ -94,37 +390,186 @@ async def _batch_lookup_metadata(conn, keys):
         albums,
         METADATA_CACHE_TTL_DAYS,
     )
-    result = {}
-    for r in rows:
-        td = r["track_durations"]
-        if isinstance(td, str):
-            td = json.loads(td)
-        result[(r["artist_norm"], r["album_norm"])] = {
-            "spotify_id": r["spotify_id"],
-            "release_date": r["release_date"],
-            "album_image_url": r["album_image_url"],
-            "track_durations": td if td else {},
-        }
+    result = _remember_metadata_rows(rows)
+    with _DB_TIER_LOCK:
+        _db_tier_hits += len(result)
+        _db_tier_misses += len(keys) - len(result)
     return result
 
 
-async def _cleanup_stale_metadata(conn):
-    """Delete spotify_cache rows older than METADATA_CACHE_TTL_DAYS.
+async def _preload_hot_metadata(conn, limit):
+    """Load the *limit* most-hit live rows into the hot tier; return the count.
+
+    ``hit_count`` is bumped by the refresh-ahead sweep for every album jobs
+    read between two sweeps (``_batch_record_hits``).
+    """
+    rows = await conn.fetch(
+        """
+        SELECT artist_norm, album_norm, spotify_id, release_date,
+               album_image_url, track_names, track_seconds, track_durations,
+               EXTRACT(EPOCH FROM updated_at) AS updated_epoch
+        FROM spotify_cache
+        WHERE updated_at > NOW() - make_interval(days => $1)
+        ORDER BY hit_count DESC
+        LIMIT $2
+        """,
+        METADATA_CACHE_TTL_DAYS,
+        limit,
+    )
+    return len(_remember_metadata_rows(rows))
+
+
+async def _batch_record_hits(conn, keys):
+    """Add one to ``hit_count`` of every spotify_cache row in *keys*."""
+    if not keys:
+        return
+    await conn.execute(
+        """
+        UPDATE spotify_cache SET hit_count = hit_count + 1
+        WHERE (artist_norm, album_norm) IN (
+            SELECT unnest($1::text[]), unnest($2::text[])
+        )
+        """,
+        [k[0] for k in keys],
+        [k[1] for k in keys],
+    )
+
+
+async def _batch_lookup_expiring(conn, keys):
+    """Return ``{key: spotify_id}`` for *keys* whose row expires soon.
 
-    Called opportunistically after each batch lookup. Non-fatal: any error
-    is logged as a warning and silently suppressed so the job continues.
+    A row is due when it is still within METADATA_CACHE_TTL_DAYS but will
+    pass it within METADATA_REFRESH_AHEAD_DAYS.
     """
-    try:
+    if not keys:
+        return {}
+    rows = await conn.fetch(
+        """
+        SELECT artist_norm, album_norm, spotify_id
+        FROM spotify_cache
+        WHERE (artist_norm, album_norm) IN (
+            SELECT unnest($1::text[]), unnest($2::text[])
+        )
+        AND updated_at <= NOW() - make_interval(days => $3)
+        AND updated_at > NOW() - make_interval(days => $4)
+        """,
+        [k[0] for k in keys],
+        [k[1] for k in keys],
+        max(0, METADATA_CACHE_TTL_DAYS - METADATA_REFRESH_AHEAD_DAYS),
+        METADATA_CACHE_TTL_DAYS,
+    )
+    return {(r["artist_norm"], r["album_norm"]): r["spotify_id"] for r in rows}
+
+
+# Tables the cache janitor (cache_janitor.py) may delete stale rows from.
+_JANITOR_TABLES = ("spotify_cache", "spotify_no_match")
+# Advisory lock key shared by every process that sweeps those tables.
+_JANITOR_LOCK_KEY = 0x5C0B_1E01
+
+
+async def _delete_stale_batch(conn, table, ttl_days, limit):
+    """Delete up to *limit* rows of *table* older than *ttl_days*; return the count.
+
+    Each batch is its own short transaction holding a transaction-level
+    advisory lock, so only one worker deletes at a time.  Returns None,
+    deleting nothing, when another worker holds the lock.  Rows locked by a
+    concurrent upsert are skipped, not waited for.
+    """
+    if table not in _JANITOR_TABLES:
+        raise ValueError(f"Not a cache table: {table}")
+    async with conn.transaction():
+        if not await conn.fetchval(
+            "SELECT pg_try_advisory_xact_lock($1)", _JANITOR_LOCK_KEY
+        ):
+            return None
         result = await conn.execute(
-            """
-            DELETE FROM spotify_cache
-            WHERE updated_at < NOW() - make_interval(days => $1)
+            f"""
+            DELETE FROM {table}
+            WHERE (artist_norm, album_norm) IN (
+                SELECT artist_norm, album_norm FROM {table}
+                WHERE updated_at < NOW() - make_interval(days => $1)
+                LIMIT $2
+                FOR UPDATE SKIP LOCKED
+            )
             """,
-            METADATA_CACHE_TTL_DAYS,
+            ttl_days,
+            limit,
+        )
+    return int(result.split()[-1])
+
+
+async def _batch_lookup_no_match(conn, keys):
+    """Return the subset of *keys* with a live "no Spotify match" entry.
+
+    Entries older than SPOTIFY_NO_MATCH_TTL_DAYS are ignored, so those
+    albums are searched again.
+    """
+    if not keys:
+        return set()
+    rows = await conn.fetch(
+        """
+        SELECT artist_norm, album_norm
+        FROM spotify_no_match
+        WHERE (artist_norm, album_norm) IN (
+            SELECT unnest($1::text[]), unnest($2::text[])
         )
-        logging.info("Stale cache cleanup: %s", result)
-    except Exception as exc:
-        logging.warning("Stale cache cleanup failed (non-fatal): %s", exc)
+        AND updated_at > NOW() - make_interval(days => $3)
+        """,
+        [k[0] for k in keys],
+        [k[1] for k in keys],
+        SPOTIFY_NO_MATCH_TTL_DAYS,
+    )
+    return {(r["artist_norm"], r["album_norm"]) for r in rows}
+
+
+async def _batch_persist_no_match(conn, keys):
+    """Record (artist_norm, album_norm) keys Spotify search had no match for.
+
+    Upserts in a single statement; a repeated miss restarts the entry's TTL.
+    """
+    if not keys:
+        return
+    keys = list(keys)
+    await conn.execute(
+        """
+        INSERT INTO spotify_no_match (artist_norm, album_norm)
+        SELECT * FROM unnest($1::text[], $2::text[])
+        ON CONFLICT (artist_norm, album_norm) DO UPDATE SET
+            updated_at = NOW()
+        """,
+        [k[0] for k in keys],
+        [k[1] for k in keys],
+    )
+
+
+async def _load_spotify_token(conn):
+    """Return the shared ``(token, expires_at)`` pair, or None if none is stored.
+
+    ``expires_at`` is a Unix timestamp, comparable with ``time.time()``.
+    """
+    row = await conn.fetchrow("SELECT token, expires_at FROM spotify_token")
+    return None if row is None else (row["token"], row["expires_at"])
+
+
+async def _persist_spotify_token(conn, token, expires_at):
+    """Store the Spotify token for other processes and machines.
+
+    A token that expires sooner than the stored one is not written, so two
+    machines refreshing at once settle on the longer-lived token.
+    """
+    await conn.execute(
+        """
+        INSERT INTO spotify_token (id, token, expires_at)
+        VALUES (1, $1, $2)
+        ON CONFLICT (id) DO UPDATE SET
+            token      = EXCLUDED.token,
+            expires_at = EXCLUDED.expires_at,
+            updated_at = NOW()
+        WHERE spotify_token.expires_at < EXCLUDED.expires_at
+        """,
+        token,
+        expires_at,
+    )
 
 
 async def _batch_persist_metadata(conn, rows):
@@ -132,7 +577,16 @@ async def _batch_persist_metadata(conn, rows):
 
     Uses INSERT ... SELECT FROM unnest() with ON CONFLICT DO UPDATE (upsert).
     Each element in *rows* is a tuple of (artist_norm, album_norm, spotify_id,
-    release_date, album_image_url, track_durations_dict).
+    release_date, album_image_url, track_durations_dict).  A None
+    track_durations is stored as NULL ("not yet fetched") and keeps the
+    durations already stored for the key -- unless the row matches a
+    different Spotify album, whose durations would be wrong.
+
+    Durations are stored in the ``track_names``/``track_seconds`` arrays
+    and, for machines still on the old code, in the JSONB
+    ``track_durations`` (see ``_decode_track_durations``).  unnest() cannot
+    take one array per row, so every row's tracks travel in flat arrays
+    tagged with the row's number and are regrouped by Postgres.
     """
     if not rows:
         return
@@ -141,21 +595,52 @@ async def _batch_persist_metadata(conn, rows):
     spotify_ids = [r[2] for r in rows]
     release_dates = [r[3] for r in rows]
     image_urls = [r[4] for r in rows]
-    track_durations_json = [json.dumps(r[5]) if r[5] else "{}" for r in rows]
+    fetched, row_numbers, names, seconds = _flatten_track_durations(
+        [r[5] for r in rows]
+    )
     await conn.execute(
         """
         INSERT INTO spotify_cache
             (artist_norm, album_norm, spotify_id, release_date,
-             album_image_url, track_durations)
-        SELECT * FROM unnest(
-            $1::text[], $2::text[], $3::text[], $4::text[],
-            $5::text[], $6::jsonb[]
-        )
+             album_image_url, track_names, track_seconds, track_durations)
+        SELECT t.a, t.b, t.c, t.d, t.e,
+               CASE WHEN t.f THEN COALESCE(tr.names, '{}') END,
+               CASE WHEN t.f THEN COALESCE(tr.seconds, '{}') END,
+               CASE WHEN t.f THEN COALESCE(tr.durations, '{}') END
+        FROM unnest(
+            $1::text[], $2::text[], $3::text[], $4::text[], $5::text[],
+            $6::boolean[]
+        ) WITH ORDINALITY AS t(a, b, c, d, e, f, i)
+        LEFT JOIN (
+            SELECT r, array_agg(n ORDER BY o) AS names,
+                   array_agg(s ORDER BY o) AS seconds,
+                   jsonb_object_agg(n, s) AS durations
+            FROM unnest($7::int[], $8::text[], $9::int[])
+                WITH ORDINALITY AS x(r, n, s, o)
+            GROUP BY r
+        ) AS tr ON tr.r = t.i
         ON CONFLICT (artist_norm, album_norm) DO UPDATE SET
             spotify_id      = EXCLUDED.spotify_id,
             release_date    = EXCLUDED.release_date,
             album_image_url = EXCLUDED.album_image_url,
-            track_durations = EXCLUDED.track_durations,
+            track_names     = COALESCE(
+                EXCLUDED.track_names,
+                CASE WHEN EXCLUDED.spotify_id
+                    IS NOT DISTINCT FROM spotify_cache.spotify_id
+                    THEN spotify_cache.track_names END
+            ),
+            track_seconds   = COALESCE(
+                EXCLUDED.track_seconds,
+                CASE WHEN EXCLUDED.spotify_id
+                    IS NOT DISTINCT FROM spotify_cache.spotify_id
+                    THEN spotify_cache.track_seconds END
+            ),
+            track_durations = COALESCE(
+                EXCLUDED.track_durations,
+                CASE WHEN EXCLUDED.spotify_id
+                    IS NOT DISTINCT FROM spotify_cache.spotify_id
+                    THEN spotify_cache.track_durations END
+            ),
             updated_at      = NOW()
         """,
         artists,
@@ -163,5 +648,33 @@ async def _batch_persist_metadata(conn, rows):
         spotify_ids,
         release_dates,
         image_urls,
-        track_durations_json,
+        fetched,
+        row_numbers,
+        names,
+        seconds,
     )
+    _remember_persisted_metadata(rows)
+
+
+def _remember_persisted_metadata(rows):
+    """Add rows shaped for ``_batch_persist_metadata`` to the hot tier."""
+    now = time.time()
+    for r in rows:
+        key = (r[0], r[1])
+        durations = r[5]
+        if durations is None:
+            # The upsert keeps stored durations of the same album; so does
+            # the hot tier.
+            known = _METADATA_HOT.peek(key, now=now)
+            if known and known["spotify_id"] == r[2]:
+                durations = known["track_durations"]
+        _METADATA_HOT.set(
+            key,
+            {
+                "spotify_id": r[2],
+                "release_date": r[3],
+                "album_image_url": r[4],
+                "track_durations": durations,
+            },
+            now=now,
+        )
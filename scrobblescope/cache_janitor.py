@@ -0,0 +1,109 @@
+"""Scheduled deletion of expired rows from the Postgres caches.
+
+Lookups already ignore rows past their TTL, so expired rows only cost disk
+and index space.  Deleting them used to happen on every job, as one
+unbounded ``DELETE`` scan per table inside the job's critical path.  The
+janitor does it on the service loop every ``CACHE_JANITOR_INTERVAL_SECONDS``
+instead, ``CACHE_JANITOR_BATCH_SIZE`` rows per statement through the
+``updated_at`` indexes, pausing between batches.  Each batch holds a
+Postgres advisory lock; a worker that finds it taken leaves the sweep to
+the machine holding it.
+
+Dependency chain (leaf-ward):
+    cache_janitor <- cache, service_loop
+"""
+
+import asyncio
+import logging
+import threading
+import time
+
+from scrobblescope.cache import (
+    _db_configured,
+    _delete_stale_batch,
+    _get_db_connection,
+)
+from scrobblescope.config import (
+    CACHE_JANITOR_BATCH_SIZE,
+    CACHE_JANITOR_INTERVAL_SECONDS,
+    METADATA_CACHE_TTL_DAYS,
+    SPOTIFY_NO_MATCH_TTL_DAYS,
+)
+from scrobblescope.service_loop import submit
+
+# Pause between two batches, so a long sweep leaves the DB to jobs.
+_BATCH_PAUSE_SECONDS = 0.1
+
+_LOCK = threading.Lock()
+_janitor = None
+
+
+def start_cache_janitor():
+    """Start the janitor on the service loop, once per process.
+
+    A no-op without a configured database or when
+    CACHE_JANITOR_INTERVAL_SECONDS is 0.
+    """
+    global _janitor
+    if CACHE_JANITOR_INTERVAL_SECONDS <= 0 or not _db_configured():
+        return
+    with _LOCK:
+        if _janitor is None or _janitor.done():
+            _janitor = submit(_janitor_forever())
+
+
+async def run_cache_janitor():
+    """Run one sweep; return ``{table: rows deleted}``, or None without a DB.
+
+    Tables reached after another worker took the lock are left out.
+    """
+    conn = await _get_db_connection()
+    if conn is None:
+        return None
+    started = time.monotonic()
+    reclaimed = {}
+    try:
+        for table, ttl_days in (
+            ("spotify_cache", METADATA_CACHE_TTL_DAYS),
+            ("spotify_no_match", SPOTIFY_NO_MATCH_TTL_DAYS),
+        ):
+            deleted = await _sweep_table(conn, table, ttl_days)
+            if deleted is None:
+                logging.info("Cache janitor: another worker is sweeping; yielding")
+                break
+            reclaimed[table] = deleted
+    finally:
+        await conn.close()
+    logging.info(
+        f"Cache janitor reclaimed {sum(reclaimed.values())} rows {reclaimed} "
+        f"in {time.monotonic() - started:.2f}s"
+    )
+    return reclaimed
+
+
+async def _sweep_table(conn, table, ttl_days):
+    """Delete *table*'s stale rows batch by batch; return the count.
+
+    Returns None if another worker held the lock before the first batch.
+    """
+    total = 0
+    while True:
+        deleted = await _delete_stale_batch(
+            conn, table, ttl_days, CACHE_JANITOR_BATCH_SIZE
+        )
+        if deleted is None:
+            return None if total == 0 else total
+        total += deleted
+        if deleted < CACHE_JANITOR_BATCH_SIZE:
+            return total
+        await asyncio.sleep(_BATCH_PAUSE_SECONDS)
+
+
+async def _janitor_forever():
+    """Sweep every CACHE_JANITOR_INTERVAL_SECONDS (runs on the service loop)."""
+    while True:
+        await asyncio.sleep(CACHE_JANITOR_INTERVAL_SECONDS)
+        try:
+            await run_cache_janitor()
+        except Exception as exc:
+            logging.warning(f"Cache janitor failed (non-fatal): {exc}")
@@ -0,0 +1,372 @@
+"""Weekly-chart ingestion: album play counts without downloading every scrobble.
+
+For ``sort_mode=playcount`` the album pipeline only needs per-album play
+counts and distinct-track counts, yet the full scan downloads every scrobble
+of the range at 200 per page.  Last.fm already serves those numbers
+pre-aggregated per week: ``user.getWeeklyAlbumChart`` gives album play
+counts and ``user.getWeeklyTrackChart`` gives track play counts, so a year
+costs about 2 x 52 requests no matter how much the user listened.
+
+The track chart carries no album field.  Tracks are attributed per week and
+artist: when the artist has exactly one album in that week's album chart and
+the artist's track plays add up to exactly that album's plays, every one of
+those scrobbles was of that album and the tracks are counted as certain.
+Otherwise (several albums, or some plays without an album tag) the tracks are
+only *possible* for each of the artist's albums.  An album's distinct-track
+count therefore has a lower bound (certain tracks) and an upper bound
+(certain plus possible); ``min_tracks`` is decided whenever the bounds allow
+it, and any album they cannot decide sends the whole job back to the full
+scan.  Albums kept on a lower bound report only their certain tracks.
+
+Chart weeks rarely line up with the requested range, so the partial weeks at
+either edge (and any gap in the chart list) are scanned from
+``user.getrecenttracks`` into the caller's accumulator and merged exactly.
+
+The two sources key albums by different artists.  The album chart credits
+each album to its *album* artist, while recent tracks (the edge windows and
+the full scan) only carry the *track* artist.  Recent tracks have no album
+artist to re-key by, so the keys are left as they are: for most albums the
+two artists match and the counts merge, but a compilation or a record with
+guest-credited tracks is tallied under the album artist for whole weeks and
+under each track artist for the edge windows.  A chart-path result can
+therefore differ from a full scan for such albums.
+
+Dependency chain (leaf-ward):
+    charts <- domain, lastfm, scrobble_store, scrobbles, utils
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from math import ceil, inf
+from typing import Any
+
+from scrobblescope.domain import normalize_name, normalize_track_name
+from scrobblescope.lastfm import (
+    fetch_all_recent_tracks_async,
+    fetch_scrobble_total_async,
+    fetch_weekly_chart_async,
+    fetch_weekly_chart_list_async,
+)
+from scrobblescope.scrobble_store import plan_store_windows
+from scrobblescope.scrobbles import ScrobbleBatch
+from scrobblescope.utils import create_optimized_session
+
+_SCAN_PAGE_SIZE = 200
+
+
+def _plan_chart_weeks(chart_weeks, from_ts, to_ts):
+    """Split ``[from_ts, to_ts]`` into whole chart weeks and scan windows.
+
+    Pure function.  *chart_weeks* are ``(from, to)`` ranges covering
+    ``from <= uts < to``, oldest first.  Returns ``(weeks, scan_windows)``
+    where *weeks* are the chart weeks lying entirely inside the range and
+    *scan_windows* are the inclusive ``(from, to)`` stretches they leave
+    uncovered: partial edge weeks and gaps in the chart list.
+    """
+    weeks = [(f, t) for f, t in chart_weeks if f >= from_ts and t - 1 <= to_ts]
+    scan_windows = []
+    cursor = from_ts
+    for week_from, week_to in weeks:
+        if week_from > cursor:
+            scan_windows.append((cursor, week_from - 1))
+        cursor = max(cursor, week_to)
+    if cursor <= to_ts:
+        scan_windows.append((cursor, to_ts))
+    return weeks, scan_windows
+
+
+def _estimate_scan_pages(total_scrobbles, from_ts, to_ts, windows):
+    """Estimate the recent-track pages needed to scan *windows*.
+
+    Assumes scrobbles are spread evenly over ``[from_ts, to_ts]``, which
+    holds *total_scrobbles*; each window costs at least one page.
+    """
+    span = max(to_ts - from_ts + 1, 1)
+    pages = 0
+    for win_from, win_to in windows:
+        share = total_scrobbles * (win_to - win_from + 1) / span
+        pages += max(1, ceil(share / _SCAN_PAGE_SIZE))
+    return pages
+
+
+class ChartTally:
+    """Per-album play counts and distinct-track bounds built from weekly charts.
+
+    ``albums`` maps the normalized ``(artist, album)`` key to the same dict
+    shape as the full scan (``play_count``, ``track_counts``,
+    ``original_artist``, ``original_album``) plus the bookkeeping for the
+    upper bound: ``possible_tracks`` and ``unbounded``.
+    """
+
+    def __init__(self):
+        self.albums: dict[tuple[str, str], dict[str, Any]] = {}
+        self.total_scrobbles = 0
+
+    def _entry(self, key, artist, album):
+        entry = self.albums.get(key)
+        if entry is None:
+            entry = self.albums[key] = {
+                "play_count": 0,
+                "track_counts": defaultdict(int),
+                "original_artist": artist,
+                "original_album": album,
+                "possible_tracks": set(),
+                "unbounded": False,
+            }
+        return entry
+
+    def add_week(self, album_rows, track_rows):
+        """Fold one week's album and track chart rows into the tally."""
+        # artist_norm -> {album key: plays this week}
+        artist_albums: defaultdict[str, dict] = defaultdict(dict)
+        for artist, album, plays in album_rows:
+            if not artist or not album or plays <= 0:
+                continue
+            key = normalize_name(artist, album)
+            self._entry(key, artist, album)["play_count"] += plays
+            albums = artist_albums[key[0]]
+            albums[key] = albums.get(key, 0) + plays
+
+        # artist_norm -> {normalized track: plays this week}
+        artist_tracks: defaultdict[str, dict] = defaultdict(dict)
+        for artist, track, plays in track_rows:
+            self.total_scrobbles += plays
+            if not artist or not track or plays <= 0:
+                continue
+            tracks = artist_tracks[normalize_name(artist, "")[0]]
+            name = normalize_track_name(track)
+            tracks[name] = tracks.get(name, 0) + plays
+
+        for artist_norm, albums in artist_albums.items():
+            tracks = artist_tracks.get(artist_norm, {})
+            track_plays = sum(tracks.values())
+            album_plays = sum(albums.values())
+            if len(albums) == 1 and track_plays == album_plays:
+                (key,) = albums
+                counts = self.albums[key]["track_counts"]
+                for name, plays in tracks.items():
+                    counts[name] += plays
+                continue
+            for key in albums:
+                entry = self.albums[key]
+                entry["possible_tracks"].update(tracks)
+                if track_plays < album_plays:
+                    # The two charts disagree (e.g. differently credited
+                    # artists), so the tracks cannot bound this album.
+                    entry["unbounded"] = True
+
+    def add_exact(self, key, data):
+        """Merge exactly counted scan data for one album (edge windows).
+
+        *key* is the scan's track-artist key and is used as is; it only
+        meets a chart week's entry when the album artist normalizes the same
+        (see the module docstring).
+        """
+        entry = self._entry(key, data["original_artist"], data["original_album"])
+        entry["play_count"] += data["play_count"]
+        for name, plays in data["track_counts"].items():
+            entry["track_counts"][name] += plays
+
+    def resolve(self, min_plays, min_tracks):
+        """Apply the album filters.  Returns ``(filtered_albums, undecided)``.
+
+        *undecided* counts albums passing ``min_plays`` whose distinct-track
+        bounds straddle ``min_tracks``.
+        """
+        filtered = {}
+        undecided = 0
+        for key, entry in self.albums.items():
+            if entry["play_count"] < min_plays:
+                continue
+            certain = len(entry["track_counts"])
+            if certain >= min_tracks:
+                filtered[key] = {
+                    "play_count": entry["play_count"],
+                    "track_counts": entry["track_counts"],
+                    "original_artist": entry["original_artist"],
+                    "original_album": entry["original_album"],
+                }
+                continue
+            if entry["unbounded"]:
+                upper = inf
+            else:
+                upper = len(entry["possible_tracks"].union(entry["track_counts"]))
+            if upper >= min_tracks:
+                undecided += 1
+        return filtered, undecided
+
+
+async def _fetch_chart_tally(session, username, weeks, progress_cb=None):
+    """Fetch every week's album and track chart into a ``ChartTally``.
+
+    Weeks are folded as they land.  Returns None if any chart failed: a
+    missing week would silently undercount, so the caller falls back.
+    """
+    tally = ChartTally()
+    total = 2 * len(weeks)
+    done = 0
+    failed = False
+
+    async def _week(week_from, week_to):
+        nonlocal done, failed
+        album_rows, track_rows = await asyncio.gather(
+            fetch_weekly_chart_async(session, username, "album", week_from, week_to),
+            fetch_weekly_chart_async(session, username, "track", week_from, week_to),
+        )
+        done += 2
+        if progress_cb is not None:
+            progress_cb(done, total)
+        if album_rows is None or track_rows is None:
+            failed = True
+            return
+        tally.add_week(album_rows, track_rows)
+
+    await asyncio.gather(*(_week(f, t) for f, t in weeks))
+    return None if failed else tally
+
+
+async def _scan_windows(username, windows, accumulator):
+    """Scan *windows* into *accumulator*; return merged fetch metadata."""
+    metadata: dict[str, Any] = {
+        "status": "ok",
+        "pages_expected": 0,
+        "pages_received": 0,
+    }
+    for win_from, win_to in windows:
+        batch = ScrobbleBatch()
+
+        def _on_page(page, batch=batch):
+            start = len(batch)
+            batch.extend_page(page)
+            if len(batch) > start:
+                accumulator.add(batch, start, len(batch))
+
+        _, meta = await fetch_all_recent_tracks_async(
+            username, win_from, win_to, page_cb=_on_page
+        )
+        if meta.get("status") == "error":
+            return meta
+        metadata["pages_expected"] += meta["pages_expected"]
+        metadata["pages_received"] += meta["pages_received"]
+    dropped = metadata["pages_expected"] - metadata["pages_received"]
+    if dropped > 0:
+        metadata["status"] = "partial"
+        metadata["pages_dropped"] = dropped
+    return metadata
+
+
+async def _charts_are_cheaper(session, username, weeks, windows, scan_windows):
+    """Return True when the chart path needs fewer requests than a scan.
+
+    *scan_windows* are the windows the scan would download (see
+    ``plan_store_windows``).  One probe request reads the scrobble total of
+    the first of them and the estimates assume that density throughout.
+    The probe is exactly the scan's own first request, so when the scan
+    wins it costs nothing extra: the scan reads that page from the request
+    cache.
+    """
+    probe_from, probe_to = scan_windows[0]
+    total = await fetch_scrobble_total_async(session, username, probe_from, probe_to)
+    if total is None:
+        return False
+    scan_pages = _estimate_scan_pages(total, probe_from, probe_to, scan_windows)
+    chart_requests = 2 * len(weeks) + _estimate_scan_pages(
+        total, probe_from, probe_to, windows
+    )
+    logging.info(
+        f"Ingest estimate for {username}: scan={scan_pages} pages, "
+        f"charts={chart_requests} requests ({total} scrobbles probed)"
+    )
+    return chart_requests < scan_pages
+
+
+async def fetch_albums_from_charts(
+    username,
+    from_ts,
+    to_ts,
+    min_plays,
+    min_tracks,
+    accumulator,
+    probe=True,
+    progress_cb=None,
+):
+    """Build ``filtered_albums`` from weekly charts, or return None to fall back.
+
+    *accumulator* is an empty scan accumulator (``add(batch, start, end)``
+    plus ``albums`` and ``total_tracks``) that the edge windows are folded
+    into.  With *probe* the chart path is only taken when it is estimated to
+    need fewer requests than a scan (``_charts_are_cheaper``); a range the
+    scrobble store already covers is scanned without any Last.fm request.
+
+    Returns ``(filtered_albums, fetch_metadata)`` in the same shape as the
+    full scan, with ``ingest_mode="charts"`` and the usual ``stats`` key.
+    Returns None -- after logging why -- when the chart list is unavailable,
+    no whole chart week fits the range, the probe prefers a scan, any chart
+    or edge scan failed, or some album's ``min_tracks`` cannot be decided.
+    """
+    start_time = time.time()
+    scan_windows = None
+    if probe:
+        scan_windows = await plan_store_windows(username, from_ts, to_ts)
+        if scan_windows is None:
+            scan_windows = [(from_ts, to_ts)]
+        if not scan_windows:
+            logging.info(f"Charts: scrobble store covers the range for {username}")
+            return None
+    async with create_optimized_session() as session:
+        chart_weeks = await fetch_weekly_chart_list_async(session, username)
+        if chart_weeks is None:
+            logging.info(f"Charts: no weekly chart list for {username}, scanning")
+            return None
+        weeks, windows = _plan_chart_weeks(chart_weeks, from_ts, to_ts)
+        if not weeks:
+            logging.info(f"Charts: no whole chart week in range for {username}")
+            return None
+        if probe and not await _charts_are_cheaper(
+            session, username, weeks, windows, scan_windows
+        ):
+            return None
+
+        tally, scan_meta = await asyncio.gather(
+            _fetch_chart_tally(session, username, weeks, progress_cb),
+            _scan_windows(username, windows, accumulator),
+        )
+
+    if tally is None:
+        logging.warning(f"Charts: a weekly chart failed for {username}, scanning")
+        return None
+    if scan_meta.get("status") == "error":
+        logging.warning(f"Charts: edge scan failed for {username}, scanning")
+        return None
+
+    for key, data in accumulator.albums.items():
+        tally.add_exact(key, data)
+    filtered, undecided = tally.resolve(min_plays, min_tracks)
+    if undecided:
+        logging.info(
+            f"Charts: {undecided} album(s) for {username} need exact track "
+            f"counts for min_tracks={min_tracks}, scanning"
+        )
+        return None
+
+    chart_requests = 2 * len(weeks) + 1
+    metadata: dict[str, Any] = {
+        **scan_meta,
+        "pages_expected": scan_meta["pages_expected"] + chart_requests,
+        "pages_received": scan_meta["pages_received"] + chart_requests,
+        "ingest_mode": "charts",
+        "chart_weeks": len(weeks),
+    }
+    metadata["stats"] = {
+        "total_scrobbles": tally.total_scrobbles + accumulator.total_tracks,
+        "pages_fetched": metadata["pages_received"],
+        "unique_albums": len(tally.albums),
+        "albums_passing_filter": len(filtered),
+    }
+    logging.info(
+        f"Charts: {len(weeks)} weeks + {len(windows)} scanned window(s) for "
+        f"{username} in {time.time() - start_time:.1f}s"
+    )
+    return filtered, metadata
@@ -0,0 +1,199 @@
+"""Adaptive (AIMD) in-flight limit shared across every job's event loop.
+
+The static ``MAX_CONCURRENT_LASTFM`` / ``SPOTIFY_*_CONCURRENCY`` semaphores
+had to be hand-tuned: too low wastes the upstream budget, too high turns
+every burst into a wave of 429s that each coroutine sleeps off on its own.
+``AdaptiveConcurrencyLimit`` replaces them with a single process-wide limit
+per endpoint that follows the classic AIMD rule:
+
+- **Additive increase** -- every healthy completion while the limit is
+  actually in use adds ``1 / limit``, so the limit grows by about one slot
+  per round trip, up to a ceiling.  "Healthy" means no 429, no timeout, and
+  a smoothed latency within ``latency_tolerance`` times the best recently
+  seen.
+- **Multiplicative decrease** -- a 429 (reported by the request code via
+  ``note_throttled()``) or a timeout multiplies the limit by
+  ``backoff_factor``.  Only requests that started after the previous
+  decrease can trigger another one, so a single congestion event that fails
+  a whole window of in-flight requests halves the limit once, not N times.
+
+Jobs run on separate threads and event loops, so the limit is guarded by a
+``threading.Lock`` and waiters are woken with ``call_soon_threadsafe`` on
+their own loop -- the same cross-loop approach as ``utils._GlobalThrottle``.
+
+This module is a leaf -- it imports nothing from the scrobblescope package.
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+
+
+class _Slot:
+    """Bookkeeping for one held permit: start time, epoch, 429 flag."""
+
+    __slots__ = ("started", "epoch", "throttled")
+
+    def __init__(self, started, epoch):
+        self.started = started
+        self.epoch = epoch
+        self.throttled = False
+
+
+class AdaptiveConcurrencyLimit:
+    """Thread-safe AIMD concurrency limit usable as an async context manager.
+
+    Drop-in for an ``asyncio.Semaphore`` passed to ``retry_with_semaphore``:
+    ``async with limit:`` waits for a permit on any event loop.  Code running
+    inside the block calls ``note_throttled()`` when the upstream answered
+    429 so the permit is released as a congestion signal.
+    """
+
+    _EWMA_ALPHA = 0.2
+    _FLOOR_DRIFT = 1.01  # lets the latency floor recover from a lucky outlier
+
+    def __init__(
+        self,
+        name,
+        initial,
+        minimum=1,
+        maximum=None,
+        backoff_factor=0.5,
+        latency_tolerance=2.0,
+    ):
+        self.name = name
+        self.minimum = minimum
+        self.maximum = max(initial, maximum or initial)
+        self.backoff_factor = backoff_factor
+        self.latency_tolerance = latency_tolerance
+        self._lock = threading.Lock()
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._waiters = deque()  # (loop, future) in arrival order
+        self._epoch = 0  # bumped on every decrease
+        self._decreases = 0
+        self._latency_ewma = None
+        self._latency_floor = None
+        self._slot = contextvars.ContextVar(f"{name}_slot", default=None)
+
+    @property
+    def limit(self):
+        """Current whole-number in-flight limit."""
+        with self._lock:
+            return int(self._limit)
+
+    def snapshot(self):
+        """Return current limit, usage and decrease count for logging."""
+        with self._lock:
+            return {
+                "limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "waiting": len(self._waiters),
+                "decreases": self._decreases,
+            }
+
+    def note_throttled(self):
+        """Mark the caller's current permit as answered with a 429.
+
+        No-op outside an ``async with`` block of this limit, so request code
+        can call it unconditionally even when a caller supplied its own
+        semaphore.
+        """
+        slot = self._slot.get()
+        if slot is not None:
+            slot.throttled = True
+
+    async def __aenter__(self):
+        await self._acquire()
+        with self._lock:
+            epoch = self._epoch
+        self._slot.set(_Slot(time.monotonic(), epoch))
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        slot = self._slot.get()
+        self._slot.set(None)
+        congested = slot.throttled or (
+            exc_type is not None and issubclass(exc_type, asyncio.TimeoutError)
+        )
+        latency = time.monotonic() - slot.started
+        with self._lock:
+            self._in_flight -= 1
+            if congested:
+                self._decrease_locked(slot.epoch)
+            elif exc_type is None:
+                self._increase_locked(latency)
+            self._wake_locked()
+        return False
+
+    async def _acquire(self):
+        with self._lock:
+            if not self._waiters and self._in_flight < int(self._limit):
+                self._in_flight += 1
+                return
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.append((fut.get_loop(), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            # Granted just before the cancellation landed: hand the permit on.
+            if fut.done() and not fut.cancelled():
+                self._release_unused()
+            raise
+
+    def _release_unused(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._wake_locked()
+
+    def _grant(self, fut):
+        """Runs on the waiter's loop; gives the permit back if it left."""
+        if fut.done():
+            self._release_unused()
+        else:
+            fut.set_result(None)
+
+    def _wake_locked(self):
+        while self._waiters and self._in_flight < int(self._limit):
+            loop, fut = self._waiters.popleft()
+            if fut.cancelled():
+                continue
+            self._in_flight += 1
+            try:
+                loop.call_soon_threadsafe(self._grant, fut)
+            except RuntimeError:
+                # The waiter's loop has already been closed.
+                self._in_flight -= 1
+
+    def _decrease_locked(self, slot_epoch):
+        if slot_epoch != self._epoch:
+            return  # this request was already in flight at the last decrease
+        old = int(self._limit)
+        self._limit = max(float(self.minimum), self._limit * self.backoff_factor)
+        self._epoch += 1
+        self._decreases += 1
+        logging.warning(
+            f"{self.name} concurrency: congestion signal, limit {old} -> "
+            f"{int(self._limit)}"
+        )
+
+    def _increase_locked(self, latency):
+        if self._latency_ewma is None:
+            self._latency_ewma = latency
+        else:
+            self._latency_ewma += self._EWMA_ALPHA * (latency - self._latency_ewma)
+        if self._latency_floor is None:
+            self._latency_floor = self._latency_ewma
+        else:
+            self._latency_floor = min(
+                self._latency_ewma, self._latency_floor * self._FLOOR_DRIFT
+            )
+        if self._latency_ewma > self._latency_floor * self.latency_tolerance:
+            return
+        # Only grow while the limit is the bottleneck (this permit included).
+        if self._in_flight + 1 < int(self._limit):
+            return
+        self._limit = min(float(self.maximum), self._limit + 1.0 / self._limit)
@@ -9,27 +9,151 @@ SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 # These values can be overridden via environment variables for tuning without code changes.
 MAX_CONCURRENT_LASTFM = int(os.getenv("MAX_CONCURRENT_LASTFM", "10"))
 LASTFM_REQUESTS_PER_SECOND = int(os.getenv("LASTFM_REQUESTS_PER_SECOND", "10"))
+# Last.fm allows 5 req/s averaged over 5 minutes. The global throttle keeps
+# that average over a sliding window and lets short bursts run at
+# LASTFM_REQUESTS_PER_SECOND.
+LASTFM_AVERAGE_REQUESTS_PER_SECOND = float(
+    os.getenv("LASTFM_AVERAGE_REQUESTS_PER_SECOND", "5")
+)
+LASTFM_RATE_WINDOW_SECONDS = int(os.getenv("LASTFM_RATE_WINDOW_SECONDS", "300"))
 
 SPOTIFY_SEARCH_CONCURRENCY = int(os.getenv("SPOTIFY_SEARCH_CONCURRENCY", "10"))
 SPOTIFY_BATCH_CONCURRENCY = int(os.getenv("SPOTIFY_BATCH_CONCURRENCY", "25"))
 SPOTIFY_REQUESTS_PER_SECOND = int(os.getenv("SPOTIFY_REQUESTS_PER_SECOND", "10"))
+SPOTIFY_RATE_WINDOW_SECONDS = int(os.getenv("SPOTIFY_RATE_WINDOW_SECONDS", "30"))
+# The three concurrency values above are starting points for the adaptive
+# (AIMD) limits in concurrency.py, shared process-wide per endpoint. The
+# limits grow while upstream stays healthy, up to these ceilings, and halve
+# on 429s or timeouts.
+LASTFM_CONCURRENCY_CEILING = int(
+    os.getenv("LASTFM_CONCURRENCY_CEILING", str(2 * MAX_CONCURRENT_LASTFM))
+)
+SPOTIFY_SEARCH_CONCURRENCY_CEILING = int(
+    os.getenv("SPOTIFY_SEARCH_CONCURRENCY_CEILING", str(2 * SPOTIFY_SEARCH_CONCURRENCY))
+)
+SPOTIFY_BATCH_CONCURRENCY_CEILING = int(
+    os.getenv("SPOTIFY_BATCH_CONCURRENCY_CEILING", str(2 * SPOTIFY_BATCH_CONCURRENCY))
+)
+# The album-detail stage sends a batch once 20 found IDs are queued or this
+# long after the first one arrived, so details overlap the remaining searches.
+SPOTIFY_DETAIL_LINGER_SECONDS = float(os.getenv("SPOTIFY_DETAIL_LINGER_SECONDS", "0.5"))
+# Albums whose running counts already pass min_plays/min_tracks during the
+# Last.fm scan get their DB lookup and Spotify search started right away
+# instead of after the last page ("0" disables).
+SPOTIFY_PREFETCH_ENABLED = os.getenv("SPOTIFY_PREFETCH_ENABLED", "1") == "1"
+# Playtime ranking needs Spotify track durations. Albums cached with their
+# durations are always ranked; at most this many cache misses and lite cache
+# hits still missing durations per job are sent to Spotify (the rest, lowest
+# play counts first, are skipped).
+PLAYTIME_SPOTIFY_MISS_BUDGET = int(os.getenv("PLAYTIME_SPOTIFY_MISS_BUDGET", "500"))
 SPOTIFY_SEARCH_RETRIES = int(os.getenv("SPOTIFY_SEARCH_RETRIES", "3"))
+# An artist with at least this many cache misses is resolved once and its
+# albums are paged from the artist-albums endpoint (50 per page, at most
+# MAX_PAGES pages) instead of one search per album ("0" disables).
+SPOTIFY_ARTIST_CATALOG_MIN_MISSES = int(
+    os.getenv("SPOTIFY_ARTIST_CATALOG_MIN_MISSES", "3")
+)
+SPOTIFY_ARTIST_CATALOG_MAX_PAGES = int(
+    os.getenv("SPOTIFY_ARTIST_CATALOG_MAX_PAGES", "4")
+)
 SPOTIFY_BATCH_RETRIES = int(os.getenv("SPOTIFY_BATCH_RETRIES", "3"))
 
 # Global state tracking
 REQUEST_CACHE_TIMEOUT = 3600  # Cache timeout in seconds (1 hour)
+# Memory budget for REQUEST_CACHE (approximate bytes, LRU-evicted beyond it).
+# The Fly.io VM has 512 MB; 64 MB holds a few hundred decoded Last.fm pages.
+REQUEST_CACHE_MAX_MB = int(os.getenv("REQUEST_CACHE_MAX_MB", "64"))
+# Store cached Last.fm recent-track pages zlib-compressed (decoded on hit).
+# See scripts/testing/bench_request_cache.py for the memory/CPU trade-off.
+REQUEST_CACHE_COMPRESS_PAGES = os.getenv("REQUEST_CACHE_COMPRESS_PAGES", "1") == "1"
+# Last.fm pages of a month shard that closed before the late-scrobble lookback
+# cannot change any more, so they stay in REQUEST_CACHE this long instead.
+LASTFM_CLOSED_SHARD_CACHE_TTL = int(
+    os.getenv("LASTFM_CLOSED_SHARD_CACHE_TTL", str(24 * 60 * 60))
+)
+# A scan whose range holds more than this many pages is split into
+# calendar-month shards fetched concurrently; smaller ranges (light users)
+# are fetched as one range, saving a first-page request per month.  The page
+# count comes from a cached whole-range first page, else is estimated from
+# the newest month's first page (which the fetch keeps as data).
+LASTFM_SHARD_MIN_PAGES = int(os.getenv("LASTFM_SHARD_MIN_PAGES", "12"))
 JOB_TTL_SECONDS = 2 * 60 * 60
 # Default 5 (was 10 until 2026-07-31): the 2026-03-04 load test ran 2/3/5
 # concurrent users clean while the 10-user run never completed. Each API
-# has its own global throttle (`_LASTFM_THROTTLE` and `_SPOTIFY_THROTTLE`,
-# utils.py:81-82), each serializing its reservations behind a shared lock
-# with no per-job fairness and no ordering guarantee. The binding
-# constraint is the Last.fm scrobble-fetch phase: at 10 req/s shared
-# across jobs, a cap of 5 averages ~2 req/s per job through that phase
-# rather than guaranteeing it -- enough headroom on this single small
+# has its own global throttle (`_LASTFM_THROTTLE` and `_SPOTIFY_THROTTLE`
+# in utils.py), each serving per-job queues round-robin. The binding
+# constraint is the Last.fm scrobble-fetch phase: at the sustained
+# LASTFM_AVERAGE_REQUESTS_PER_SECOND (5 req/s, half the old flat 10 req/s;
+# bursts still reach 10) shared across jobs, a cap of 5 gives each busy job
+# ~1 req/s through that phase -- enough headroom on this single small
 # Fly.io machine.
 MAX_ACTIVE_JOBS = int(os.getenv("MAX_ACTIVE_JOBS", "5"))
+# How album jobs sorted by play count read Last.fm (charts.py): "scan"
+# downloads every scrobble page; "charts" builds the counts from weekly album
+# and track charts; "auto" takes the charts only when they need fewer
+# requests than the scan. Charts fall back to the scan when they cannot
+# decide min_tracks exactly. Jobs can override this per request.
+LASTFM_INGEST_MODE = os.getenv("LASTFM_INGEST_MODE", "auto")
+# Process-wide asyncpg pool (cache.py), opened at startup and shared by all
+# jobs; each statement borrows a connection, so MAX_SIZE bounds the load on
+# the small Postgres. "0" disables the pool: one connection per use.
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "5"))
+DB_POOL_HEALTH_CHECK_SECONDS = int(os.getenv("DB_POOL_HEALTH_CHECK_SECONDS", "60"))
 METADATA_CACHE_TTL_DAYS = int(os.getenv("METADATA_CACHE_TTL_DAYS", "30"))
+# In-memory hot tier in front of spotify_cache (cache.py), bounded by
+# approximate size. At startup the PRELOAD most-hit rows are loaded into it
+# ("0" disables); hits are counted by the refresh-ahead sweep below.
+METADATA_HOT_CACHE_MAX_MB = int(os.getenv("METADATA_HOT_CACHE_MAX_MB", "16"))
+METADATA_HOT_CACHE_PRELOAD = int(os.getenv("METADATA_HOT_CACHE_PRELOAD", "2000"))
+# Cached albums a job hit that are due to expire within this many days are
+# re-fetched by Spotify ID in the background, every
+# METADATA_REFRESH_INTERVAL_SECONDS, so popular albums do not all drop out of
+# the cache together ("0" disables). The refresher sends at most
+# METADATA_REFRESH_RATE_SHARE of SPOTIFY_REQUESTS_PER_SECOND.
+METADATA_REFRESH_AHEAD_DAYS = int(os.getenv("METADATA_REFRESH_AHEAD_DAYS", "3"))
+METADATA_REFRESH_INTERVAL_SECONDS = int(
+    os.getenv("METADATA_REFRESH_INTERVAL_SECONDS", "600")
+)
+METADATA_REFRESH_RATE_SHARE = float(os.getenv("METADATA_REFRESH_RATE_SHARE", "0.1"))
+# Albums Spotify answered "no match" for are remembered (spotify_no_match)
+# and not searched again for this many days. Shorter than the metadata TTL:
+# a missing album may still be added to Spotify.
+SPOTIFY_NO_MATCH_TTL_DAYS = int(os.getenv("SPOTIFY_NO_MATCH_TTL_DAYS", "7"))
+# Rows past those TTLs are deleted by a janitor on the service loop every
+# CACHE_JANITOR_INTERVAL_SECONDS ("0" disables), at most BATCH_SIZE rows per
+# statement; an advisory lock keeps it to one machine at a time.
+CACHE_JANITOR_INTERVAL_SECONDS = int(
+    os.getenv("CACHE_JANITOR_INTERVAL_SECONDS", str(60 * 60))
+)
+CACHE_JANITOR_BATCH_SIZE = int(os.getenv("CACHE_JANITOR_BATCH_SIZE", "1000"))
+# New metadata and no-match answers are written behind the jobs
+# (write_behind.py): queued rows from all jobs are coalesced and upserted
+# every WRITE_BEHIND_FLUSH_SECONDS, BATCH_SIZE rows per statement, retried
+# while the DB is down with at most MAX_PENDING albums waiting, and flushed
+# at exit.
+WRITE_BEHIND_FLUSH_SECONDS = float(os.getenv("WRITE_BEHIND_FLUSH_SECONDS", "1"))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500"))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "20000"))
+
+# Persistent scrobble store (scrobble_store.py). The lookback re-reads the
+# last day before the high-water mark on every sync so late scrobbles from
+# offline devices are not missed; one day is under one page for most users.
+SCROBBLE_STORE_ENABLED = os.getenv("SCROBBLE_STORE_ENABLED", "1") == "1"
+SCROBBLE_SYNC_LOOKBACK_SECONDS = int(
+    os.getenv("SCROBBLE_SYNC_LOOKBACK_SECONDS", str(24 * 60 * 60))
+)
+
+# The Spotify token (client credentials, valid for an hour) is refreshed on
+# the service loop this many seconds before it expires, so jobs do not wait
+# for one ("0" disables; an expired token is then refreshed on demand, with
+# one request shared by every waiting job).
+SPOTIFY_TOKEN_REFRESH_AHEAD_SECONDS = int(
+    os.getenv("SPOTIFY_TOKEN_REFRESH_AHEAD_SECONDS", "300")
+)
+# Share the token through Postgres (spotify_token) so other machines and
+# restarted processes reuse it instead of requesting their own.
+SPOTIFY_TOKEN_PERSIST = os.getenv("SPOTIFY_TOKEN_PERSIST", "1") == "1"
 
 spotify_token_cache = {"token": None, "expires_at": 0}
 
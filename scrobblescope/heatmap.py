@@ -3,26 +3,25 @@
 This module owns the heatmap processing pipeline: fetch recent tracks for the
 last 365 days, bucket each scrobble into a calendar date, and store a
 ``{date_str: count}`` dict as the job result.  It reuses the existing Last.fm
-fetch infrastructure (``lastfm.fetch_all_recent_tracks_async``), the job state
+fetch infrastructure (``scrobble_store.fetch_recent_tracks_incremental``, which
+reads the persistent scrobble store before going to Last.fm), the job state
 machine (``repositories.*``), and the concurrency slot system (``worker.*``).
 
 Dependency chain (leaf-ward):
-    heatmap <- config, lastfm, repositories, utils, worker
+    heatmap <- config, repositories, scrobble_store, scrobbles, utils, worker
 
-No Spotify enrichment, no DB cache, no domain normalization -- iteration 1
-deals only with raw scrobble counts per day.
+No Spotify enrichment, no metadata cache, no domain normalization -- iteration
+1 deals only with raw scrobble counts per day.
 """
 
 import asyncio
 import logging
 import sys
 import time
-from collections import Counter
 from datetime import datetime
 from datetime import time as dt_time
 from datetime import timedelta, timezone
 
-from scrobblescope.lastfm import fetch_all_recent_tracks_async
 from scrobblescope.repositories import (
     cleanup_expired_jobs,
     set_job_error,
@@ -30,15 +29,60 @@ from scrobblescope.repositories import (
     set_job_results,
     set_job_stat,
 )
-from scrobblescope.utils import cleanup_expired_cache
+from scrobblescope.scrobble_store import fetch_recent_tracks_incremental
+from scrobblescope.scrobbles import ScrobbleBatch
+from scrobblescope.utils import cleanup_expired_cache, tag_requests_with_job
 from scrobblescope.worker import release_job_slot
 
+_SECONDS_PER_DAY = 24 * 60 * 60
+
+
+class _DailyCountAccumulator:
+    """Streaming per-day scrobble counter for the heatmap.
+
+    ``add`` folds rows ``[start, end)`` of a ``ScrobbleBatch`` into one
+    integer bucket per UTC day, so it can be used as the ``scrobbles_cb`` of
+    the Last.fm fetch.  Day attribution is plain integer division of the
+    ``uts`` timestamp, equivalent to decoding it as a UTC date.
+    """
+
+    def __init__(self, from_date, to_date):
+        self.from_date = from_date
+        self.to_date = to_date
+        self._origin = int(
+            datetime.combine(from_date, dt_time.min, tzinfo=timezone.utc).timestamp()
+        )
+        self._counts = [0] * ((to_date - from_date).days + 1)
+
+    def add(self, batch, start, end):
+        """Count rows ``[start, end)`` of *batch* into their UTC day buckets."""
+        counts = self._counts
+        num_days = len(counts)
+        origin = self._origin
+        timestamps = batch.timestamps
+        for i in range(start, end):
+            # Last.fm UTS values are UTC-anchored; bucketing on UTC days keeps
+            # attribution consistent across server timezones (lastfm.py:31
+            # already follows this pattern for year extraction).  Tracks
+            # outside the range (boundary pages) fall outside the buckets.
+            day_index = (timestamps[i] - origin) // _SECONDS_PER_DAY
+            if 0 <= day_index < num_days:
+                counts[day_index] += 1
+
+    def daily_counts(self):
+        """Return every date in the range mapped to its count (0 if none)."""
+        return {
+            (self.from_date + timedelta(days=offset)).isoformat(): count
+            for offset, count in enumerate(self._counts)
+        }
+
 
 def _aggregate_daily_counts(pages, from_date, to_date):
     """Aggregate raw Last.fm page data into a ``{YYYY-MM-DD: count}`` dict.
 
-    This is a pure function (no I/O, no side-effects) extracted from the async
-    orchestrator for easy unit testing.
+    This is a pure function (no I/O, no side-effects) over the same
+    ``ScrobbleBatch`` + ``_DailyCountAccumulator`` path the streaming job
+    uses, kept for callers and tests that already hold a list of pages.
 
     Args:
         pages: List of raw Last.fm JSON page dicts.  Each page has
@@ -59,31 +103,10 @@ def _aggregate_daily_counts(pages, from_date, to_date):
         - Tracks outside the ``[from_date, to_date]`` window are excluded
           (Last.fm can return boundary pages with out-of-range entries).
     """
-    # Phase 1: count scrobbles per day using the uts timestamp.
-    counter = Counter()
-    for page in pages:
-        for track in page.get("recenttracks", {}).get("track", []):
-            uts = track.get("date", {}).get("uts")
-            if not uts:
-                # "Now playing" tracks lack a date field -- skip them.
-                continue
-            ts = int(uts)
-            # Last.fm UTS values are UTC-anchored; decoding as UTC keeps day
-            # attribution consistent across server timezones (lastfm.py:31
-            # already follows this pattern for year extraction).
-            day = datetime.fromtimestamp(ts, tz=timezone.utc).date()
-            if from_date <= day <= to_date:
-                counter[day.isoformat()] += 1
-
-    # Phase 2: fill every calendar date in the range with 0 where missing.
-    daily_counts = {}
-    current = from_date
-    while current <= to_date:
-        key = current.isoformat()
-        daily_counts[key] = counter.get(key, 0)
-        current += timedelta(days=1)
-
-    return daily_counts
+    batch = ScrobbleBatch.from_pages(pages)
+    accumulator = _DailyCountAccumulator(from_date, to_date)
+    accumulator.add(batch, 0, len(batch))
+    return accumulator.daily_counts()
 
 
 async def _fetch_and_process_heatmap(job_id, username):
@@ -91,8 +114,8 @@ async def _fetch_and_process_heatmap(job_id, username):
 
     Phases:
         0%      -- housekeeping (cache/job cleanup, initial progress)
-        5-80%   -- Last.fm page fetching with progress callback
-        80-90%  -- daily count aggregation
+        5-80%   -- Last.fm page fetching, each page counted as it lands
+        80-90%  -- fill the 365-day range from the day counters
         90%     -- zero-scrobble guard
         100%    -- store results
 
@@ -138,9 +161,16 @@ async def _fetch_and_process_heatmap(job_id, username):
         error=False,
     )
 
+    # Scrobbles are folded into the day buckets as each page lands
+    # (scrobbles_cb), so the raw JSON for the whole year is never held.
+    accumulator = _DailyCountAccumulator(from_date, to_date)
     fetch_start = time.time()
-    pages, fetch_metadata = await fetch_all_recent_tracks_async(
-        username, from_ts, to_ts, progress_cb=_heatmap_progress
+    _, fetch_metadata = await fetch_recent_tracks_incremental(
+        username,
+        from_ts,
+        to_ts,
+        progress_cb=_heatmap_progress,
+        scrobbles_cb=accumulator.add,
     )
     fetch_elapsed = time.time() - fetch_start
     logging.info(f"Heatmap Last.fm fetch for {username}: {fetch_elapsed:.1f}s")
@@ -170,9 +200,9 @@ async def _fetch_and_process_heatmap(job_id, username):
             f"({pct}% data loss). Heatmap may be incomplete.",
         )
 
-    # Phase 80-90%: aggregate daily counts ------------------------------------
+    # Phase 80-90%: fill the day range from the streamed counters -------------
     set_job_progress(job_id, progress=80, message="Counting your daily scrobbles...")
-    daily_counts = _aggregate_daily_counts(pages, from_date, to_date)
+    daily_counts = accumulator.daily_counts()
 
     total = sum(daily_counts.values())
     max_count = max(daily_counts.values()) if daily_counts else 0
@@ -213,6 +243,7 @@ def heatmap_task(job_id, username):
     else:
         loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
+    tag_requests_with_job(job_id)
     try:
         loop.run_until_complete(_fetch_and_process_heatmap(job_id, username))
     except Exception:
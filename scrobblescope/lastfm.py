@@ -3,21 +3,30 @@ import logging
 import time
 from collections.abc import Callable
 from datetime import datetime, timezone
+from math import ceil
 from typing import Any
 
 from scrobblescope.config import (
     LASTFM_API_KEY,
+    LASTFM_AVERAGE_REQUESTS_PER_SECOND,
+    LASTFM_CLOSED_SHARD_CACHE_TTL,
+    LASTFM_RATE_WINDOW_SECONDS,
     LASTFM_REQUESTS_PER_SECOND,
-    MAX_CONCURRENT_LASTFM,
+    LASTFM_SHARD_MIN_PAGES,
+    REQUEST_CACHE_COMPRESS_PAGES,
+    SCROBBLE_SYNC_LOOKBACK_SECONDS,
 )
 from scrobblescope.utils import (
     create_optimized_session,
     get_cached_response,
+    get_lastfm_concurrency,
     get_lastfm_limiter,
     retry_with_semaphore,
     set_cached_response,
 )
 
+_LASTFM_API_URL = "https://ws.audioscrobbler.com/2.0/"
+
 
 async def check_user_exists(username):
     """Verify if a Last.fm user exists and return registration year.
@@ -69,25 +78,29 @@ async def check_user_exists(username):
             return {"exists": True, "registered_year": None}
 
 
-async def fetch_recent_tracks_page_async(
-    session, username, from_ts, to_ts, page, retries=3, semaphore=None
+async def _fetch_lastfm_json(
+    session,
+    params,
+    label,
+    retries=3,
+    semaphore=None,
+    cache_ttl=None,
+    compress=False,
 ):
-    """Fetch a single page of Last.fm scrobbles with retry and rate limiting.
+    """GET one Last.fm API call with caching, retry and rate limiting.
 
-    Returns parsed JSON on success or None after all retries are exhausted.
-    Raises ``ValueError`` if the user is not found (HTTP 404).
+    Shared by every per-user Last.fm method.  Returns parsed JSON on success
+    or None after all retries are exhausted.  Raises ``ValueError`` if the
+    user is not found (HTTP 404).  *label* names the call in log messages,
+    e.g. ``"page 3"``.
+
+    Each attempt holds a permit of *semaphore*, defaulting to the shared
+    adaptive Last.fm limit, which shrinks on 429s and timeouts.  *cache_ttl*
+    overrides the request-cache lifetime for data of a closed time range and
+    *compress* stores the cached payload zlib-compressed.
     """
-    url = "https://ws.audioscrobbler.com/2.0/"
-    params = {
-        "method": "user.getrecenttracks",
-        "user": username,
-        "api_key": LASTFM_API_KEY,
-        "format": "json",
-        "from": from_ts,
-        "to": to_ts,
-        "limit": 200,
-        "page": page,
-    }
+    url = _LASTFM_API_URL
+    username = params["user"]
 
     # check cache first
     cached_response = get_cached_response(url, params)
@@ -95,17 +108,25 @@ async def fetch_recent_tracks_page_async(
         return cached_response
 
     limiter = get_lastfm_limiter()
+    concurrency = get_lastfm_concurrency()
+    if semaphore is None:
+        semaphore = concurrency
 
     async def fetch_once():
         async with limiter:
-            logging.debug(f"Requesting Last.fm page {page}")
+            logging.debug(f"Requesting Last.fm {label}")
             async with session.get(url, params=params) as resp:
                 if resp.status == 429:
                     retry_after = int(resp.headers.get("Retry-After", "1"))
+                    concurrency.note_throttled()
+                    limiter.back_off(retry_after)
                     logging.warning(
-                        f"⚠️ LAST.FM RATE LIMIT (429) on page {page}! "
+                        f"⚠️ LAST.FM RATE LIMIT (429) on {label}! "
                         f"Retry after {retry_after}s. "
-                        f"Current limiter: {LASTFM_REQUESTS_PER_SECOND} req/s, consider reducing concurrency."
+                        f"Limiter: {LASTFM_AVERAGE_REQUESTS_PER_SECOND} req/s "
+                        f"sustained over {LASTFM_RATE_WINDOW_SECONDS}s, bursts "
+                        f"to {LASTFM_REQUESTS_PER_SECOND} req/s, "
+                        f"in-flight limit {concurrency.limit}."
                     )
                     return None, retry_after
                 if resp.status == 404:
@@ -115,18 +136,24 @@ async def fetch_recent_tracks_page_async(
                 if resp.status != 200:
                     body = await resp.text()
                     logging.warning(
-                        f"❌ Unexpected Last.fm status {resp.status} on page {page}: {body[:200]}"
+                        f"❌ Unexpected Last.fm status {resp.status} on {label}: {body[:200]}"
                     )
                     return None, None
                 try:
                     data = await resp.json()
                     # Cache the response for future use
-                    set_cached_response(url, data, params)
+                    set_cached_response(
+                        url,
+                        data,
+                        params,
+                        compress=compress,
+                        ttl=cache_ttl,
+                    )
                     return data, None
                 except Exception:
                     body = await resp.text()
                     logging.error(
-                        f"❌ Invalid JSON from Last.fm page {page}. Body starts with: {body[:200]}"
+                        f"❌ Invalid JSON from Last.fm {label}. Body starts with: {body[:200]}"
                     )
                     return None, None
 
@@ -140,25 +167,167 @@ async def fetch_recent_tracks_page_async(
         default=None,
         backoff=lambda a: min(0.25 * (a + 1), 1.0),
         reraise=(ValueError,),
-        error_label=f"Last.fm page {page}",
+        error_label=f"Last.fm {label}",
+    )
+
+
+def _recent_tracks_params(username, from_ts, to_ts, page, limit=200):
+    """Return the ``user.getrecenttracks`` query (also its request-cache key)."""
+    return {
+        "method": "user.getrecenttracks",
+        "user": username,
+        "api_key": LASTFM_API_KEY,
+        "format": "json",
+        "from": from_ts,
+        "to": to_ts,
+        "limit": limit,
+        "page": page,
+    }
+
+
+async def fetch_recent_tracks_page_async(
+    session,
+    username,
+    from_ts,
+    to_ts,
+    page,
+    retries=3,
+    semaphore=None,
+    cache_ttl=None,
+    limit=200,
+):
+    """Fetch a single page of Last.fm scrobbles with retry and rate limiting.
+
+    Returns parsed JSON on success or None after all retries are exhausted.
+    Raises ``ValueError`` if the user is not found (HTTP 404).
+
+    Each attempt holds a permit of *semaphore*, defaulting to the shared
+    adaptive Last.fm limit, which shrinks on 429s and timeouts.  *cache_ttl*
+    overrides the request-cache lifetime for pages of a closed time range.
+    *limit* is the page size.
+    """
+    return await _fetch_lastfm_json(
+        session,
+        _recent_tracks_params(username, from_ts, to_ts, page, limit),
+        f"page {page}",
+        retries=retries,
+        semaphore=semaphore,
+        cache_ttl=cache_ttl,
+        compress=REQUEST_CACHE_COMPRESS_PAGES,
     )
 
 
-async def fetch_pages_batch_async(session, username, from_ts, to_ts, pages):
+async def fetch_scrobble_total_async(session, username, from_ts, to_ts):
+    """Return the number of scrobbles in ``[from_ts, to_ts]``, or None.
+
+    Costs one ``user.getrecenttracks`` request: the first page that
+    ``fetch_all_recent_tracks_async`` requests for the same range, with the
+    same parameters and cache lifetime, so a scan of the range that follows
+    is served that page from the request cache.
     """
-    Fetch Last.fm pages with controlled concurrency to respect rate limits.
-    Semaphore (MAX_CONCURRENT_LASTFM) caps in-flight requests; rate limiter
-    (_LASTFM_LIMITER) caps throughput. Called once with all pages rather than
-    in sequential batches to avoid idle gaps.
+    page = await fetch_recent_tracks_page_async(
+        session,
+        username,
+        from_ts,
+        to_ts,
+        1,
+        cache_ttl=_shard_cache_ttl(to_ts, int(time.time())),
+    )
+    try:
+        return int(page["recenttracks"]["@attr"]["total"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _as_list(value):
+    """Return a Last.fm collection as a list.
+
+    Last.fm's JSON serializer turns a one-element list into a bare object
+    and an empty one into a missing key.
     """
-    semaphore = asyncio.Semaphore(MAX_CONCURRENT_LASTFM)
+    if value is None:
+        return []
+    if isinstance(value, dict):
+        return [value]
+    return value
 
-    async def fetch_with_semaphore(page):
-        return await fetch_recent_tracks_page_async(
-            session, username, from_ts, to_ts, page, semaphore=semaphore
-        )
 
-    tasks = [fetch_with_semaphore(p) for p in pages]
+async def fetch_weekly_chart_list_async(session, username):
+    """Return the user's weekly chart ranges as ``[(from, to), ...]``, or None.
+
+    Ranges are oldest first.  Each covers ``from <= uts < to``; Last.fm only
+    lists weeks that have ended.
+    """
+    params = {
+        "method": "user.getweeklychartlist",
+        "user": username,
+        "api_key": LASTFM_API_KEY,
+        "format": "json",
+    }
+    data = await _fetch_lastfm_json(session, params, "weekly chart list")
+    if not data or "weeklychartlist" not in data:
+        return None
+    try:
+        weeks = [
+            (int(chart["from"]), int(chart["to"]))
+            for chart in _as_list(data["weeklychartlist"].get("chart"))
+        ]
+    except (KeyError, TypeError, ValueError):
+        return None
+    return sorted(weeks)
+
+
+async def fetch_weekly_chart_async(session, username, kind, week_from, week_to):
+    """Fetch one week of the user's album or track chart.
+
+    *kind* is ``"album"`` or ``"track"``.  Returns a list of
+    ``(artist, name, playcount)`` tuples, or None when the request failed.
+    Weeks that closed before the late-scrobble lookback cannot change, so
+    they stay cached as long as closed scrobble shards.
+    """
+    params = {
+        "method": f"user.getweekly{kind}chart",
+        "user": username,
+        "api_key": LASTFM_API_KEY,
+        "format": "json",
+        "from": week_from,
+        "to": week_to,
+    }
+    data = await _fetch_lastfm_json(
+        session,
+        params,
+        f"weekly {kind} chart {week_from}",
+        cache_ttl=_shard_cache_ttl(week_to - 1, int(time.time())),
+        compress=REQUEST_CACHE_COMPRESS_PAGES,
+    )
+    root = (data or {}).get(f"weekly{kind}chart")
+    if root is None:
+        return None
+    rows = []
+    for entry in _as_list(root.get(kind)):
+        try:
+            artist = entry["artist"]["#text"]
+            rows.append((artist, entry["name"], int(entry["playcount"])))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return rows
+
+
+async def fetch_pages_batch_async(
+    session, username, from_ts, to_ts, pages, cache_ttl=None
+):
+    """
+    Fetch Last.fm pages with controlled concurrency to respect rate limits.
+    The shared adaptive limit (get_lastfm_concurrency) caps in-flight
+    requests; rate limiter (_LASTFM_LIMITER) caps throughput. Called once
+    with all pages rather than in sequential batches to avoid idle gaps.
+    """
+    tasks = [
+        fetch_recent_tracks_page_async(
+            session, username, from_ts, to_ts, p, cache_ttl=cache_ttl
+        )
+        for p in pages
+    ]
     results = await asyncio.gather(*tasks)
 
     successful = sum(1 for r in results if r is not None)
@@ -166,73 +335,274 @@ async def fetch_pages_batch_async(session, username, from_ts, to_ts, pages):
     return results
 
 
-async def fetch_all_recent_tracks_async(username, from_ts, to_ts, progress_cb=None):
+def _plan_time_shards(from_ts, to_ts):
+    """Split ``[from_ts, to_ts]`` into inclusive UTC calendar-month shards.
+
+    Pure function.  Shards are returned newest first, matching the order in
+    which Last.fm pages a range, so concatenating their pages keeps the
+    overall timestamp order.  Inner shards are whole months, which makes
+    their page requests -- and cache keys -- identical across jobs whose
+    ranges merely overlap.
+    """
+    shards = []
+    start = from_ts
+    while start <= to_ts:
+        dt = datetime.fromtimestamp(start, tz=timezone.utc)
+        next_month = datetime(
+            dt.year + dt.month // 12, dt.month % 12 + 1, 1, tzinfo=timezone.utc
+        )
+        end = min(to_ts, int(next_month.timestamp()) - 1)
+        shards.append((start, end))
+        start = end + 1
+    shards.reverse()
+    return shards
+
+
+def _shard_cache_ttl(shard_to, now):
+    """Return the request-cache TTL for a shard's pages.
+
+    A shard that ended more than the late-scrobble lookback ago is closed:
+    its pages can no longer change, so they stay cached much longer than the
+    default hour.  Open shards use the default.
+    """
+    if shard_to < now - SCROBBLE_SYNC_LOOKBACK_SECONDS:
+        return LASTFM_CLOSED_SHARD_CACHE_TTL
+    return None
+
+
+def _total_pages(page):
+    """Return the ``totalPages`` of a first page (at least 1)."""
+    return max(1, int(page["recenttracks"]["@attr"]["totalPages"]))
+
+
+def _estimated_pages(page, page_from, page_to, from_ts, to_ts):
+    """Estimate the pages of ``[from_ts, to_ts]`` from a first page of part of it.
+
+    Assumes the scrobble rate of ``[page_from, page_to]`` holds throughout.
+    """
+    try:
+        total = int(page["recenttracks"]["@attr"]["total"])
+    except (KeyError, TypeError, ValueError):
+        total = _total_pages(page) * 200
+    share = (to_ts - from_ts + 1) / max(page_to - page_from + 1, 1)
+    return ceil(total * share / 200)
+
+
+async def _plan_fetch_shards(session, username, from_ts, to_ts):
+    """Return ``(shards, probe)`` for ``fetch_all_recent_tracks_async``.
+
+    *shards* are inclusive ranges, newest first; *probe*, when not None, is
+    the already fetched first page of ``shards[0]``.  Returns ``(None,
+    None)`` when the probe request failed.
+
+    Without any request when possible: a range within one month is one
+    shard anyway, and a whole-range first page already in the request cache
+    (the auto ingest probe fetches exactly that page) tells the page count.
+    Otherwise the newest month's first page is fetched -- it is real data
+    either way -- and the range's page count estimated from it.  A light
+    range is then fetched as that month plus the rest in one piece.
+    """
+    months = _plan_time_shards(from_ts, to_ts)
+    if len(months) == 1:
+        return months, None
+    whole = get_cached_response(
+        _LASTFM_API_URL, _recent_tracks_params(username, from_ts, to_ts, 1)
+    )
+    if whole and "recenttracks" in whole:
+        if _total_pages(whole) <= LASTFM_SHARD_MIN_PAGES:
+            return [(from_ts, to_ts)], whole
+        return months, None
+
+    newest_from, newest_to = months[0]
+    probe = await fetch_recent_tracks_page_async(
+        session,
+        username,
+        newest_from,
+        newest_to,
+        1,
+        cache_ttl=_shard_cache_ttl(newest_to, int(time.time())),
+    )
+    if not probe or "recenttracks" not in probe:
+        return None, None
+    estimate = _estimated_pages(probe, newest_from, newest_to, from_ts, to_ts)
+    if estimate <= LASTFM_SHARD_MIN_PAGES:
+        return [months[0], (from_ts, newest_from - 1)], probe
+    return months, probe
+
+
+async def fetch_all_recent_tracks_async(
+    username, from_ts, to_ts, progress_cb=None, page_cb=None
+):
     """Fetch all Last.fm scrobble pages. Returns (pages, metadata) tuple.
 
+    The range is split into calendar-month shards (``_plan_time_shards``)
+    whose first pages are requested concurrently, so no serial page-1 round
+    trip per shard gates the rest of the fetch; each shard fans out its
+    remaining pages as soon as its first page reports ``totalPages``.  Light
+    ranges (at most ``LASTFM_SHARD_MIN_PAGES`` pages) are not worth a
+    first-page request per month and are fetched whole instead; see
+    ``_plan_fetch_shards`` for how that is decided.  A shard's first page
+    that fails is requested once more; if it fails again a whole month is
+    missing, which no page count can describe, so the fetch errors.
+
     Args:
         progress_cb: Optional ``Callable[[int, int], None]`` invoked as
             ``progress_cb(pages_done, total_pages)`` after each page
-            fetch completes.
+            fetch completes.  *total_pages* grows while shards report
+            their page counts.
+        page_cb: Optional ``Callable[[dict], None]`` streaming consumer.  When
+            given, every successfully fetched page is handed to
+            ``page_cb(page)`` as soon as it lands and is NOT retained, so the
+            returned ``pages`` list is empty.  Callers fold each page into
+            their counters while later pages are still in flight, and peak
+            memory stays at a few pages per job instead of the whole range.
+            Pages arrive in completion order, not timestamp order.
+
+    Without *page_cb* the returned pages are in Last.fm's newest-first
+    order: shards newest first, pages ascending within each shard.
     """
+    error_meta: dict[str, Any] = {"status": "error", "reason": "lastfm_unavailable"}
     fetch_start_time = time.time()
+    now = int(time.time())
+
     async with create_optimized_session() as session:
-        first = await fetch_recent_tracks_page_async(
-            session, username, from_ts, to_ts, 1
-        )
-        if not first or "recenttracks" not in first:
+        shards, probe = await _plan_fetch_shards(session, username, from_ts, to_ts)
+        if shards is None:
             logging.error("Failed to fetch initial page from Last.fm")
-            error_meta: dict[str, Any] = {
-                "status": "error",
-                "reason": "lastfm_unavailable",
-            }
             return [], error_meta
+        ttls = [_shard_cache_ttl(shard_to, now) for _, shard_to in shards]
+        logging.info(f"Last.fm: Fetching {len(shards)} time shard(s) for {username}")
+
+        def _page_task(shard, page):
+            if shard == 0 and page == 1 and probe is not None:
+                future = asyncio.get_running_loop().create_future()
+                future.set_result(probe)
+                return future
+            shard_from, shard_to = shards[shard]
+            return asyncio.ensure_future(
+                fetch_recent_tracks_page_async(
+                    session,
+                    username,
+                    shard_from,
+                    shard_to,
+                    page,
+                    cache_ttl=ttls[shard],
+                )
+            )
 
-        total_pages = int(first["recenttracks"]["@attr"]["totalPages"])
-        logging.info(f"Last.fm: Fetching {total_pages} pages of scrobbles")
-        all_pages = [first]
+        first_tasks = [_page_task(i, 1) for i in range(len(shards))]
+        # Unknown shards count as one page until their first page reports.
+        shard_pages = [1] * len(shards)
+        first_ok = [False] * len(shards)
+        retried = [False] * len(shards)
+        pages_received = 0
+        all_pages = []
 
-        if progress_cb is not None:
-            progress_cb(1, total_pages)
+        def _accept(page):
+            if page_cb is not None:
+                page_cb(page)
+            else:
+                all_pages.append(page)
 
-        if total_pages > 1:
-            remaining = range(2, total_pages + 1)
+        def _first_page_landed(shard, page):
+            if not page or "recenttracks" not in page:
+                return False
+            first_ok[shard] = True
+            shard_pages[shard] = _total_pages(page)
+            return True
 
-            if progress_cb is not None:
-                # Per-page progress: use as_completed instead of gather
-                semaphore = asyncio.Semaphore(MAX_CONCURRENT_LASTFM)
-                tasks = [
-                    asyncio.ensure_future(
-                        fetch_recent_tracks_page_async(
+        if progress_cb is not None or page_cb is not None:
+            # Per-page handling: consume tasks as they complete.  Done
+            # tasks are dropped from ``pending`` immediately so a streamed
+            # page is not kept alive by its finished task object.
+            pending = {task: (i, 1) for i, task in enumerate(first_tasks)}
+            del first_tasks
+            completed = 0
+            shard_lost = False
+            try:
+                while pending and not shard_lost:
+                    done, _ = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        shard, page_no = pending.pop(task)
+                        result = task.result()
+                        if page_no == 1 and not _first_page_landed(shard, result):
+                            if not retried[shard]:
+                                retried[shard] = True
+                                pending[_page_task(shard, 1)] = (shard, 1)
+                                continue
+                            shard_lost = True
+                            break
+                        completed += 1
+                        if page_no == 1:
+                            for p in range(2, shard_pages[shard] + 1):
+                                pending[_page_task(shard, p)] = (shard, p)
+                        if result is not None:
+                            pages_received += 1
+                            _accept(result)
+                        if progress_cb is not None:
+                            progress_cb(completed, sum(shard_pages))
+                        del result
+            finally:
+                for task in pending:
+                    task.cancel()
+        else:
+            try:
+                firsts = await asyncio.gather(*first_tasks)
+                failed = [
+                    shard
+                    for shard, first in enumerate(firsts)
+                    if not _first_page_landed(shard, first)
+                ]
+                retries = await asyncio.gather(*(_page_task(i, 1) for i in failed))
+                for shard, first in zip(failed, retries):
+                    if _first_page_landed(shard, first):
+                        firsts[shard] = first
+            finally:
+                for task in first_tasks:
+                    task.cancel()
+            rest = []
+            for shard in range(len(shards)):
+                if all(first_ok) and shard_pages[shard] > 1:
+                    shard_from, shard_to = shards[shard]
+                    rest.append(
+                        fetch_pages_batch_async(
                             session,
                             username,
-                            from_ts,
-                            to_ts,
-                            p,
-                            semaphore=semaphore,
+                            shard_from,
+                            shard_to,
+                            range(2, shard_pages[shard] + 1),
+                            cache_ttl=ttls[shard],
                         )
                     )
-                    for p in remaining
-                ]
-                completed = 1  # page 1 already done
-                for fut in asyncio.as_completed(tasks):
-                    result = await fut
-                    completed += 1
-                    if result is not None:
-                        all_pages.append(result)
-                    progress_cb(completed, total_pages)
-            else:
-                results = await fetch_pages_batch_async(
-                    session, username, from_ts, to_ts, remaining
-                )
-                all_pages.extend([r for r in results if r])
+                else:
+                    rest.append(_no_pages())
+            rest_results = await asyncio.gather(*rest)
+            for shard, first in enumerate(firsts):
+                for page in [first, *rest_results[shard]]:
+                    if page:
+                        pages_received += 1
+                        _accept(page)
+
+        if not all(first_ok):
+            months = [
+                datetime.fromtimestamp(shards[i][0], tz=timezone.utc).strftime("%Y-%m")
+                for i, ok in enumerate(first_ok)
+                if not ok
+            ]
+            logging.error(
+                f"Failed to fetch the first Last.fm page of {', '.join(months)} "
+                f"after a retry"
+            )
+            return [], error_meta
 
         fetch_elapsed = time.time() - fetch_start_time
+        pages_expected = sum(shard_pages)
         logging.info(
-            f"⏱️  Time elapsed (fetching {total_pages} Last.fm pages): {fetch_elapsed:.1f}s"
+            f"⏱️  Time elapsed (fetching {pages_expected} Last.fm pages): {fetch_elapsed:.1f}s"
         )
 
-        pages_expected = total_pages
-        pages_received = len(all_pages)
         metadata: dict[str, Any] = {
             "status": "ok",
             "pages_expected": pages_expected,
@@ -244,3 +614,8 @@ async def fetch_all_recent_tracks_async(username, from_ts, to_ts, progress_cb=No
 
         logging.info(f"Last.fm: Fetched {pages_received}/{pages_expected} pages")
         return all_pages, metadata
+
+
+async def _no_pages():
+    """Placeholder result for a shard with nothing left to fetch."""
+    return []
@@ -0,0 +1,167 @@
+"""Thread-safe, size-bounded LRU cache with TTL and byte accounting.
+
+Every background job runs on its own thread and event loop, so any
+process-wide cache must be guarded by a ``threading.Lock`` rather than an
+asyncio primitive.  ``LRUCache`` keeps entries in an ``OrderedDict`` ordered
+from least to most recently used, charges each entry an approximate byte
+size at insert time, and evicts from the cold end whenever the total exceeds
+the configured budget.  Entries past their TTL are treated as misses and
+dropped on access or by ``purge_expired``.
+
+Sizes come from ``approx_size``, a walk over nested dicts/lists summing
+``sys.getsizeof``.  It ignores sharing between objects, so it over-counts
+interned strings slightly; the number is meant for budgeting, not for
+reporting exact RSS.
+
+This module is a leaf -- it imports nothing from the scrobblescope package.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def approx_size(obj):
+    """Return an approximate deep size of *obj* in bytes.
+
+    Walks dicts, lists and tuples iteratively (JSON payloads can nest deeply
+    enough to make recursion a liability) and adds ``sys.getsizeof`` for
+    every container, key and leaf.
+    """
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+    return total
+
+
+class LRUCache:
+    """Byte-budgeted LRU mapping of keys to values with a TTL.
+
+    ``get``/``set`` are O(1) apart from sizing the value on ``set``.  A value
+    larger than the whole budget is not stored.  Hit, miss, eviction and
+    expiration counters accumulate for the life of the process; ``stats``
+    returns a snapshot.  ``ttl_seconds`` is the default lifetime; ``set``
+    can override it per entry.
+    """
+
+    def __init__(self, max_bytes, ttl_seconds, sizeof=approx_size):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._sizeof = sizeof
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, value, size)
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def _drop(self, key):
+        """Remove *key* and release its bytes.  Caller holds the lock."""
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key, now=None):
+        """Return the live value for *key* and mark it most recently used.
+
+        Returns None on a miss; an expired entry counts as a miss and is
+        removed.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            if now >= entry[0]:
+                self._drop(key)
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def peek(self, key, now=None):
+        """Return the live value for *key* without touching recency or counters."""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now >= entry[0]:
+                return None
+            return entry[1]
+
+    def set(self, key, value, now=None, size=None, ttl=None):
+        """Store *value* under *key*, evicting cold entries over budget.
+
+        *size* overrides the computed byte size (useful when the caller
+        already knows it, e.g. for encoded payloads) and *ttl* the default
+        lifetime.  Returns False when the value alone exceeds the budget and
+        was not stored.
+        """
+        now = time.time() if now is None else now
+        expires_at = now + (self.ttl_seconds if ttl is None else ttl)
+        # Size outside the lock: walking a large payload must not stall
+        # other jobs' cache lookups.
+        size = self._sizeof(value) if size is None else size
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if size > self.max_bytes:
+                return False
+            self._entries[key] = (expires_at, value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                cold_key = next(iter(self._entries))
+                self._drop(cold_key)
+                self._evictions += 1
+            return True
+
+    def purge_expired(self, now=None):
+        """Remove every entry past the TTL; return how many were removed."""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [
+                key
+                for key, (expires_at, _, _) in self._entries.items()
+                if now >= expires_at
+            ]
+            for key in expired:
+                self._drop(key)
+            self._expirations += len(expired)
+        return len(expired)
+
+    def clear(self):
+        """Drop every entry.  Counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Return a snapshot of size and hit/miss/eviction counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
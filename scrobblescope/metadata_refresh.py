@@ -0,0 +1,145 @@
+"""Refresh-ahead for ``spotify_cache`` rows that jobs keep hitting.
+
+A cache hit does not touch the row's ``updated_at``, so an album stays
+cached for exactly ``METADATA_CACHE_TTL_DAYS`` after it was fetched, however
+often it is read.  Albums first cached on a busy day therefore all expire
+together, and the next job to ask pays a search plus a detail fetch for each
+of them.
+
+Jobs report their cache hits through ``note_cache_hits``.  Every
+``METADATA_REFRESH_INTERVAL_SECONDS`` a refresher on the service loop takes
+the keys reported since its last sweep, bumps their ``hit_count`` (which
+ranks the rows pre-loaded into the hot tier at boot), asks Postgres which
+of those rows expire within ``METADATA_REFRESH_AHEAD_DAYS`` and re-fetches
+them by their stored Spotify ID -- ``/v1/albums``, 20 per request, no search -- then
+upserts them, which restarts their TTL.  The refresher sends its requests
+one at a time, at most ``METADATA_REFRESH_RATE_SHARE`` of the Spotify rate,
+through its own lane of the global Spotify throttle, so it never competes
+with jobs for more than that share.
+
+Dependency chain (leaf-ward):
+    metadata_refresh <- cache, service_loop, spotify, utils
+"""
+
+import asyncio
+import logging
+import threading
+
+from scrobblescope.cache import (
+    _batch_lookup_expiring,
+    _batch_persist_metadata,
+    _batch_record_hits,
+    _get_db_connection,
+)
+from scrobblescope.config import (
+    METADATA_REFRESH_AHEAD_DAYS,
+    METADATA_REFRESH_INTERVAL_SECONDS,
+    METADATA_REFRESH_RATE_SHARE,
+    SPOTIFY_REQUESTS_PER_SECOND,
+)
+from scrobblescope.service_loop import submit
+from scrobblescope.spotify import (
+    _album_image_url,
+    _album_track_durations,
+    fetch_spotify_access_token,
+    fetch_spotify_album_details_batch,
+)
+from scrobblescope.utils import create_optimized_session, tag_requests_with_job
+
+# Spotify IDs per /v1/albums request (the endpoint's maximum).
+_REFRESH_BATCH_SIZE = 20
+# Keys remembered between sweeps; hits beyond it wait for a later sweep.
+_MAX_HOT_KEYS = 10_000
+
+_LOCK = threading.Lock()
+_hot_keys: set = set()
+_refresher = None
+
+
+def note_cache_hits(keys):
+    """Remember cached album keys a job just read, for the next sweep.
+
+    Starts the background refresher on first use; a no-op when
+    METADATA_REFRESH_AHEAD_DAYS is 0.
+    """
+    global _refresher
+    if METADATA_REFRESH_AHEAD_DAYS <= 0:
+        return
+    with _LOCK:
+        for key in keys:
+            if len(_hot_keys) >= _MAX_HOT_KEYS:
+                break
+            _hot_keys.add(key)
+        if _refresher is None or _refresher.done():
+            _refresher = submit(_refresh_forever())
+
+
+def _take_hot_keys():
+    global _hot_keys
+    with _LOCK:
+        keys, _hot_keys = _hot_keys, set()
+    return keys
+
+
+async def refresh_expiring_metadata():
+    """Run one sweep; return the number of rows refreshed.
+
+    Rows Spotify no longer returns are left to expire.  A failure loses
+    this sweep's keys, which the next job to hit them reports again.
+    """
+    keys = _take_hot_keys()
+    if not keys:
+        return 0
+    conn = await _get_db_connection()
+    if conn is None:
+        return 0
+    try:
+        await _batch_record_hits(conn, list(keys))
+        due = await _batch_lookup_expiring(conn, list(keys))
+        if not due:
+            return 0
+        token = await fetch_spotify_access_token()
+        if not token:
+            return 0
+        key_by_id = {spotify_id: key for key, spotify_id in due.items()}
+        ids = list(key_by_id)
+        interval = 1.0 / (SPOTIFY_REQUESTS_PER_SECOND * METADATA_REFRESH_RATE_SHARE)
+        rows = []
+        async with create_optimized_session() as session:
+            for start in range(0, len(ids), _REFRESH_BATCH_SIZE):
+                if start:
+                    await asyncio.sleep(interval)
+                details = await fetch_spotify_album_details_batch(
+                    session, ids[start : start + _REFRESH_BATCH_SIZE], token
+                )
+                for spotify_id, album in details.items():
+                    artist_norm, album_norm = key_by_id[spotify_id]
+                    rows.append(
+                        (
+                            artist_norm,
+                            album_norm,
+                            spotify_id,
+                            album.get("release_date", ""),
+                            _album_image_url(album),
+                            _album_track_durations(album),
+                        )
+                    )
+        await _batch_persist_metadata(conn, rows)
+        logging.info(
+            f"Metadata refresh-ahead: {len(rows)}/{len(due)} expiring rows "
+            f"refreshed ({len(keys)} hot keys)"
+        )
+        return len(rows)
+    finally:
+        await conn.close()
+
+
+async def _refresh_forever():
+    """Sweep every METADATA_REFRESH_INTERVAL_SECONDS (runs on the service loop)."""
+    tag_requests_with_job("metadata-refresh")
+    while True:
+        await asyncio.sleep(METADATA_REFRESH_INTERVAL_SECONDS)
+        try:
+            await refresh_expiring_metadata()
+        except Exception as exc:
+            logging.warning(f"Metadata refresh-ahead failed (non-fatal): {exc}")
@@ -5,23 +5,27 @@ import threading
 import time
 from collections import defaultdict
 from datetime import datetime
-from math import ceil
 from typing import Any, cast
 
 from scrobblescope.cache import (
     _batch_lookup_metadata,
-    _batch_persist_metadata,
-    _cleanup_stale_metadata,
+    _batch_lookup_no_match,
     _get_db_connection,
+    _lookup_hot_metadata,
+    get_metadata_cache_stats,
 )
+from scrobblescope.charts import fetch_albums_from_charts
 from scrobblescope.config import (
-    SPOTIFY_BATCH_CONCURRENCY,
+    LASTFM_INGEST_MODE,
+    PLAYTIME_SPOTIFY_MISS_BUDGET,
+    SPOTIFY_ARTIST_CATALOG_MIN_MISSES,
+    SPOTIFY_DETAIL_LINGER_SECONDS,
+    SPOTIFY_PREFETCH_ENABLED,
     SPOTIFY_REQUESTS_PER_SECOND,
-    SPOTIFY_SEARCH_CONCURRENCY,
 )
 from scrobblescope.domain import normalize_name, normalize_track_name
 from scrobblescope.errors import SpotifyUnavailableError
-from scrobblescope.lastfm import fetch_all_recent_tracks_async
+from scrobblescope.metadata_refresh import note_cache_hits
 from scrobblescope.repositories import (
     add_job_unmatched,
     cleanup_expired_jobs,
@@ -31,95 +35,227 @@ from scrobblescope.repositories import (
     set_job_results,
     set_job_stat,
 )
+from scrobblescope.scrobble_store import fetch_recent_tracks_incremental
 from scrobblescope.spotify import (
+    _album_image_url,
+    _album_track_durations,
     fetch_spotify_access_token,
     fetch_spotify_album_details_batch,
-    search_for_spotify_album_id,
+    fetch_spotify_artist_catalog,
+    search_for_spotify_album,
+    warm_spotify_token,
 )
+from scrobblescope.spotify_prefetch import SpotifyPrefetch
 from scrobblescope.utils import (
     cleanup_expired_cache,
     create_optimized_session,
     format_seconds,
     format_seconds_mobile,
+    get_spotify_search_concurrency,
+    tag_requests_with_job,
 )
 from scrobblescope.worker import release_job_slot
+from scrobblescope.write_behind import queue_metadata_rows, queue_no_match
 
-# Hard upper bound on the number of albums sent to process_albums when sorting
-# by playtime. Playtime ranking requires Spotify track durations, so pre-slicing
-# is impossible -- but an unbounded album count creates proportional Spotify API
-# load. 500 albums at 20 per batch = 25 batch requests, well within practical
-# limits. A user with 500+ albums passing min_plays/min_tracks is an extreme
-# outlier; raw play_count is the best available proxy for culling the tail.
-_PLAYTIME_ALBUM_CAP = 500
+INGEST_MODES = ("auto", "charts", "scan")
+
+# Spotify IDs per album-detail request (the endpoint accepts up to 20).
+_DETAIL_BATCH_SIZE = 20
+
+
+class _AlbumAccumulator:
+    """Streaming per-album play and distinct-track counters over a ScrobbleBatch.
+
+    ``add`` folds rows ``[start, end)`` of a ``ScrobbleBatch`` into the
+    counters, so it can be used as the ``scrobbles_cb`` of the Last.fm fetch
+    and aggregation overlaps the network wait instead of following it.  The
+    loop only touches integer ids; ``normalize_name`` runs once per distinct
+    (artist, album) id pair and ``normalize_track_name`` once per distinct
+    track id, instead of once per scrobble.
+
+    When *on_qualified* is given it is called once with an album's key as
+    soon as the album's running counts reach *min_plays* and *min_tracks*.
+    Counts only grow, so such an album is certain to pass ``filtered``.
+    """
+
+    def __init__(self, from_ts, to_ts, min_plays=0, min_tracks=0, on_qualified=None):
+        self.from_ts = from_ts
+        self.to_ts = to_ts
+        self.min_plays = min_plays
+        self.min_tracks = min_tracks
+        self.on_qualified = on_qualified
+        self._qualified: set[tuple[str, str]] = set()
+        self.total_tracks = 0
+        self.albums: defaultdict[tuple[str, str], dict[str, Any]] = defaultdict(
+            lambda: {"play_count": 0, "track_counts": defaultdict(int)}
+        )
+        # (artist_id, album_id) -> normalized album key, or None when the
+        # artist or album name is empty and the scrobble must be skipped.
+        self._pair_keys: dict[tuple[int, int], tuple[str, str] | None] = {}
+        # track_id -> normalized track name, or None for an empty name.
+        self._track_names: dict[int, str | None] = {}
+
+    def add(self, batch, start, end):
+        """Fold rows ``[start, end)`` of *batch* into the album counters."""
+        self.total_tracks += end - start
+        timestamps = batch.timestamps
+        artist_ids = batch.artist_ids
+        album_ids = batch.album_ids
+        track_ids = batch.track_ids
+        pair_keys = self._pair_keys
+        track_names = self._track_names
+        albums = self.albums
+        on_qualified = self.on_qualified
+        min_plays = self.min_plays
+        min_tracks = self.min_tracks
+        qualified = self._qualified
+        for i in range(start, end):
+            ts = timestamps[i]
+            if ts < self.from_ts or ts > self.to_ts:
+                continue
+            pair = (artist_ids[i], album_ids[i])
+            if pair in pair_keys:
+                key = pair_keys[pair]
+            else:
+                art = batch.artists[pair[0]]
+                alb = batch.albums[pair[1]]
+                key = normalize_name(art, alb) if alb and art else None
+                pair_keys[pair] = key
+            if key is None:
+                continue
+            track_id = track_ids[i]
+            if track_id in track_names:
+                normalized = track_names[track_id]
+            else:
+                name = batch.tracks[track_id]
+                normalized = normalize_track_name(name) if name else None
+                track_names[track_id] = normalized
+            if normalized is None:
+                continue
+            if key in albums:
+                album = albums[key]
+            else:
+                album = albums[key]
+                album["original_artist"] = batch.artists[pair[0]]
+                album["original_album"] = batch.albums[pair[1]]
+            album["play_count"] += 1
+            album["track_counts"][normalized] += 1
+            if (
+                on_qualified is not None
+                and album["play_count"] >= min_plays
+                and key not in qualified
+                and len(album["track_counts"]) >= min_tracks
+            ):
+                qualified.add(key)
+                on_qualified(key)
+
+    def filtered(self, min_plays, min_tracks):
+        """Return albums passing both the min_plays and min_tracks filters."""
+        return {
+            k: v
+            for k, v in self.albums.items()
+            if v["play_count"] >= min_plays and len(v["track_counts"]) >= min_tracks
+        }
+
+
+def _resolve_ingest_mode(sort_mode, ingest_mode):
+    """Return the Last.fm ingest mode ("auto", "charts" or "scan") for a job.
+
+    Weekly charts only carry play counts, so every other sort mode scans.
+    An unknown *ingest_mode* falls back to ``LASTFM_INGEST_MODE``.
+    """
+    if sort_mode != "playcount":
+        return "scan"
+    if ingest_mode in INGEST_MODES:
+        return ingest_mode
+    if LASTFM_INGEST_MODE in INGEST_MODES:
+        return LASTFM_INGEST_MODE
+    return "scan"
+
+
+def _add_partial_data_warning(fetch_metadata):
+    """Attach a user-facing warning to partial fetch metadata."""
+    if fetch_metadata.get("status") == "partial":
+        dropped = fetch_metadata["pages_dropped"]
+        expected = fetch_metadata["pages_expected"]
+        pct = round((dropped / expected) * 100)
+        fetch_metadata["partial_data_warning"] = (
+            f"Note: {dropped} of {expected} Last.fm pages failed to load "
+            f"({pct}% data loss). Results may be incomplete."
+        )
 
 
 async def fetch_top_albums_async(
-    username, year, min_plays=10, min_tracks=3, progress_cb=None
+    username,
+    year,
+    min_plays=10,
+    min_tracks=3,
+    progress_cb=None,
+    sort_mode=None,
+    ingest_mode=None,
+    on_qualified=None,
 ):
     """Fetch and filter top albums. Returns (filtered_albums, fetch_metadata) tuple.
 
+    Scrobbles are streamed into an ``_AlbumAccumulator`` as each page lands;
+    the job keeps them only in compact ``ScrobbleBatch`` form, never as the
+    raw page dicts.  For ``sort_mode="playcount"`` the counts may instead come
+    from Last.fm's weekly charts (see ``charts.py`` and
+    ``_resolve_ingest_mode``); the chart path falls back to the scan whenever
+    it cannot produce the same result.
+
     The returned ``fetch_metadata`` dict includes a ``stats`` key with
     aggregation counters (total_scrobbles, pages_fetched, unique_albums,
     albums_passing_filter) so the caller can record them as job stats.
 
     Args:
         progress_cb: Optional ``Callable[[int, int], None]`` forwarded to
-            ``fetch_all_recent_tracks_async`` for per-page progress.
+            ``fetch_recent_tracks_incremental`` for per-page progress.
+        on_qualified: Optional ``Callable[[tuple[str, str]], None]`` told each
+            album key the moment the scan proves it passes the filters (see
+            ``_AlbumAccumulator``).  The chart path never calls it.
     """
     logging.debug(f"Start fetch_top_albums_async(user={username}, year={year})")
     from_ts = int(datetime(year, 1, 1).timestamp())
     to_ts = int(datetime(year, 12, 31, 23, 59, 59).timestamp())
-    pages, fetch_metadata = await fetch_all_recent_tracks_async(
-        username, from_ts, to_ts, progress_cb=progress_cb
-    )
-    logging.debug(f"Pages fetched: {len(pages)}")
-    total_tracks = sum(len(p.get("recenttracks", {}).get("track", [])) for p in pages)
-    logging.debug(f"Total tracks: {total_tracks}")
 
-    if fetch_metadata.get("status") == "partial":
-        dropped = fetch_metadata["pages_dropped"]
-        expected = fetch_metadata["pages_expected"]
-        pct = round((dropped / expected) * 100)
-        fetch_metadata["partial_data_warning"] = (
-            f"Note: {dropped} of {expected} Last.fm pages failed to load "
-            f"({pct}% data loss). Results may be incomplete."
+    mode = _resolve_ingest_mode(sort_mode, ingest_mode)
+    if mode != "scan":
+        charted = await fetch_albums_from_charts(
+            username,
+            from_ts,
+            to_ts,
+            min_plays,
+            min_tracks,
+            _AlbumAccumulator(from_ts, to_ts),
+            probe=mode == "auto",
+            progress_cb=progress_cb,
         )
-
-    albums: defaultdict[tuple[str, str], dict[str, Any]] = defaultdict(
-        lambda: {"play_count": 0, "track_counts": defaultdict(int)}
+        if charted is not None:
+            filtered, fetch_metadata = charted
+            _add_partial_data_warning(fetch_metadata)
+            return filtered, fetch_metadata
+
+    accumulator = _AlbumAccumulator(from_ts, to_ts, min_plays, min_tracks, on_qualified)
+    _, fetch_metadata = await fetch_recent_tracks_incremental(
+        username,
+        from_ts,
+        to_ts,
+        progress_cb=progress_cb,
+        scrobbles_cb=accumulator.add,
     )
-    for page in pages:
-        for t in page.get("recenttracks", {}).get("track", []):
-            alb = t.get("album", {}).get("#text", "...")
-            art = t.get("artist", {}).get("#text", "...")
-            name = t.get("name", "...")
-            date = t.get("date", {}).get("uts")
-            if not date:
-                continue
-            ts = int(date)
-            if ts < from_ts or ts > to_ts:
-                continue
-            if alb and art and name:
-                key = normalize_name(art, alb)
-                if "original_artist" not in albums[key]:
-                    albums[key]["original_artist"] = art
-                    albums[key]["original_album"] = alb
-                albums[key]["play_count"] += 1
-                normalized = normalize_track_name(name)
-                albums[key]["track_counts"][normalized] += 1
-    logging.debug(f"Unique albums: {len(albums)}")
-
-    filtered = {
-        k: v
-        for k, v in albums.items()
-        if v["play_count"] >= min_plays and len(v["track_counts"]) >= min_tracks
-    }
+    logging.debug(f"Total tracks: {accumulator.total_tracks}")
+
+    _add_partial_data_warning(fetch_metadata)
+
+    logging.debug(f"Unique albums: {len(accumulator.albums)}")
+    filtered = accumulator.filtered(min_plays, min_tracks)
     logging.debug(f"Albums after filter: {len(filtered)}")
 
     fetch_metadata["stats"] = {
-        "total_scrobbles": total_tracks,
-        "pages_fetched": len(pages),
-        "unique_albums": len(albums),
+        "total_scrobbles": accumulator.total_tracks,
+        "pages_fetched": fetch_metadata.get("pages_received", 0),
+        "unique_albums": len(accumulator.albums),
         "albums_passing_filter": len(filtered),
     }
 
@@ -190,154 +326,350 @@ def _get_user_friendly_reason(
         return f"Unknown release year: {release_date}"
 
 
+class _SpotifyProgress:
+    """One 20%-60% progress scale shared by the Spotify search and detail stages.
+
+    Every search is one unit of work and every album whose details will be
+    fetched is another, so the two stages can overlap without the bar
+    jumping between per-phase ranges.  Pending searches are assumed to
+    match; an unmatched search drops its detail unit, so the fraction only
+    grows.  With ``details=False`` (lite enrichment) searches fill the whole
+    range.
+    """
+
+    START = 20
+    SPAN = 40
+
+    def __init__(self, job_id, searches, prefound=0, details=True):
+        self.job_id = job_id
+        self.searches = searches
+        self.details = details
+        self.prefound = prefound
+        self.searched = 0
+        self.found = prefound
+        self.detailed = 0
+        self._unmatched = 0
+
+    def _report(self, message):
+        if self.details:
+            done = self.searched + self.detailed
+            expected = 2 * self.searches + self.prefound - self._unmatched
+        else:
+            done = self.searched
+            expected = self.searches
+        pct = self.START + int(self.SPAN * done / max(expected, 1))
+        set_job_progress(self.job_id, progress=pct, message=message)
+
+    def search_done(self, found):
+        self.searched += 1
+        if found:
+            self.found += 1
+        else:
+            self._unmatched += 1
+        self._report(f"Searching Spotify: {self.searched}/{self.searches} albums...")
+
+    def details_done(self, count):
+        self.detailed += count
+        self._report(f"Enriched {self.detailed}/{self.found} albums from Spotify...")
+
+
+def _add_no_match_unmatched(job_id, data):
+    """Register an album Spotify has no match for as unmatched on the job."""
+    original_artist = data["original_artist"]
+    original_album = data["original_album"]
+    unmatched_key = "|".join(normalize_name(original_artist, original_album))
+    add_job_unmatched(
+        job_id,
+        unmatched_key,
+        {
+            "artist": original_artist,
+            "album": original_album,
+            "reason": "No Spotify match",
+        },
+    )
+
+
+def _plan_artist_catalogs(cache_misses, prefetched_hits):
+    """Group misses by normalized artist for catalog resolution.
+
+    Returns ``{artist: [(key, data), ...]}`` for artists with at least
+    SPOTIFY_ARTIST_CATALOG_MIN_MISSES misses still to search; one artist
+    lookup plus a few catalog pages is cheaper than that many searches.
+    """
+    if SPOTIFY_ARTIST_CATALOG_MIN_MISSES <= 0:
+        return {}
+    by_artist = defaultdict(list)
+    for key, data in cache_misses.items():
+        if key not in prefetched_hits:
+            by_artist[key[0]].append((key, data))
+    return {
+        artist: items
+        for artist, items in by_artist.items()
+        if len(items) >= SPOTIFY_ARTIST_CATALOG_MIN_MISSES
+    }
+
+
 async def _run_spotify_search_phase(
     job_id,
     session,
     cache_misses,
     token,
-    search_semaphore,
+    search_hits=None,
+    progress=None,
+    on_found=None,
+    prefetched_hits=None,
+    no_match=None,
 ):
     """Parallel Spotify search for all cache misses.
 
-    Reports progress in the 20-40% range. Registers unmatched albums via
-    add_job_unmatched. Returns (spotify_id_to_key, spotify_id_to_original_data).
+    Reports progress through *progress* (a ``_SpotifyProgress``, created if
+    omitted). Registers unmatched albums via add_job_unmatched. Returns
+    (spotify_id_to_key, spotify_id_to_original_data).
+    When *search_hits* is a dict it is filled with spotify_id -> search hit
+    (the simplified album object) for the lite enrichment path.
+    *on_found* is called as ``on_found(spotify_id, key, data)`` the moment a
+    search matches, so a downstream stage can start on it immediately.
+    Keys in *prefetched_hits* (key -> hit or None, from a ``SpotifyPrefetch``)
+    reuse that result instead of searching again.  When *no_match* is a set,
+    keys Spotify answered with no match are added to it (failed searches
+    are not: they say nothing about the album).
+
+    Artists with several misses are matched against their Spotify catalog
+    first (``_plan_artist_catalogs``); only albums missing from it fall back
+    to a per-album search.
     """
+    prefetched_hits = prefetched_hits or {}
+    if progress is None:
+        progress = _SpotifyProgress(job_id, len(cache_misses))
     logging.info(
         f"Starting parallel search for {len(cache_misses)} "
-        f"Spotify albums (max {SPOTIFY_SEARCH_CONCURRENCY} "
-        f"concurrent, {SPOTIFY_REQUESTS_PER_SECOND} req/s limit)"
+        f"Spotify albums (adaptive limit "
+        f"{get_spotify_search_concurrency().limit} concurrent, "
+        f"{SPOTIFY_REQUESTS_PER_SECOND} req/s limit)"
     )
     search_start_time = time.time()
 
-    async def search_with_semaphore(key, data):
+    async def search_one(key, data):
+        if key in prefetched_hits:
+            return [(key, prefetched_hits[key], data)]
         artist, album = key
-        spotify_id = await search_for_spotify_album_id(
-            session,
-            artist,
-            album,
-            token,
-            semaphore=search_semaphore,
-        )
-        return key, spotify_id, data
-
-    search_tasks = [
-        search_with_semaphore(key, data) for key, data in cache_misses.items()
-    ]
-
-    search_results = []
-    searches_done = 0
-    total_searches = len(search_tasks)
-    for fut in asyncio.as_completed(search_tasks):
-        result = await fut
-        search_results.append(result)
-        searches_done += 1
-        # Map search progress into the 20%-40% range
-        pct = 20 + int(20 * searches_done / max(total_searches, 1))
-        set_job_progress(
-            job_id,
-            progress=pct,
-            message=(
-                f"Searching Spotify: {searches_done}/" f"{total_searches} albums..."
-            ),
-        )
+        hit = await search_for_spotify_album(session, artist, album, token)
+        return [(key, hit, data)]
+
+    catalog_matches = 0
+
+    async def resolve_artist(artist, items):
+        """Match an artist's misses in its catalog; search the leftovers."""
+        nonlocal catalog_matches
+        catalog = await fetch_spotify_artist_catalog(session, artist, token) or {}
+        resolved = [
+            (key, catalog[key[1]], data) for key, data in items if key[1] in catalog
+        ]
+        catalog_matches += len(resolved)
+        leftovers = [
+            search_one(key, data) for key, data in items if key[1] not in catalog
+        ]
+        for found in await asyncio.gather(*leftovers):
+            resolved.extend(found)
+        return resolved
+
+    catalogs = _plan_artist_catalogs(cache_misses, prefetched_hits)
+    search_tasks = [resolve_artist(artist, items) for artist, items in catalogs.items()]
+    search_tasks.extend(
+        search_one(key, data)
+        for key, data in cache_misses.items()
+        if key[0] not in catalogs or key in prefetched_hits
+    )
 
     spotify_id_to_key = {}
     spotify_id_to_original_data = {}
-    for key, spotify_id, data in search_results:
-        if spotify_id:
-            spotify_id_to_key[spotify_id] = key
-            spotify_id_to_original_data[spotify_id] = data
-        else:
-            original_artist = data["original_artist"]
-            original_album = data["original_album"]
-            unmatched_key = "|".join(normalize_name(original_artist, original_album))
-            add_job_unmatched(
-                job_id,
-                unmatched_key,
-                {
-                    "artist": original_artist,
-                    "album": original_album,
-                    "reason": "No Spotify match",
-                },
-            )
+    for fut in asyncio.as_completed(search_tasks):
+        for key, hit, data in await fut:
+            if hit:
+                spotify_id = hit["id"]
+                spotify_id_to_key[spotify_id] = key
+                spotify_id_to_original_data[spotify_id] = data
+                if search_hits is not None:
+                    search_hits[spotify_id] = hit
+                if on_found is not None:
+                    on_found(spotify_id, key, data)
+            else:
+                if hit is not None and no_match is not None:
+                    no_match.add(key)
+                _add_no_match_unmatched(job_id, data)
+            progress.search_done(bool(hit))
 
     search_duration = time.time() - search_start_time
     logging.info(
         f"Spotify search completed in {search_duration:.1f}s: "
         f"{len(spotify_id_to_key)}/{len(cache_misses)} "
-        f"misses found on Spotify"
+        f"misses found on Spotify ({catalog_matches} from "
+        f"{len(catalogs)} artist catalogs)"
     )
 
     return spotify_id_to_key, spotify_id_to_original_data
 
 
-async def _run_spotify_batch_detail_phase(
+class _AlbumDetailBatcher:
+    """Consumer stage of the search -> album-detail pipeline.
+
+    Found Spotify IDs are ``put`` on an ``asyncio.Queue``; a consumer task
+    groups them and dispatches one ``fetch_spotify_album_details_batch``
+    call as soon as ``_DETAIL_BATCH_SIZE`` IDs have accumulated or
+    ``SPOTIFY_DETAIL_LINGER_SECONDS`` have passed since the first ID of the
+    batch arrived, whichever comes first.  ``on_batch(batch_ids, details)``
+    runs as each batch completes.  ``close`` flushes the remainder without
+    lingering and waits for every batch.
+    """
+
+    def __init__(self, session, token, on_batch, linger=None):
+        self._session = session
+        self._token = token
+        self._on_batch = on_batch
+        self._linger = SPOTIFY_DETAIL_LINGER_SECONDS if linger is None else linger
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._batches: list[asyncio.Task] = []
+        self.batch_sizes: list[int] = []
+        self._consumer = asyncio.ensure_future(self._consume())
+
+    def put(self, spotify_id):
+        self._queue.put_nowait(spotify_id)
+
+    async def _fetch(self, batch_ids):
+        details = await fetch_spotify_album_details_batch(
+            self._session, batch_ids, self._token
+        )
+        self._on_batch(batch_ids, details)
+
+    def _dispatch(self, batch_ids):
+        self.batch_sizes.append(len(batch_ids))
+        self._batches.append(asyncio.ensure_future(self._fetch(batch_ids)))
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        # One long-lived get() future: cancelling a get() that raced with a
+        # put() could drop an ID, so a timed-out wait keeps it for later.
+        getter = None
+        try:
+            while True:
+                if getter is None:
+                    getter = asyncio.ensure_future(self._queue.get())
+                first = await getter
+                getter = None
+                if first is None:
+                    return
+                batch = [first]
+                deadline = loop.time() + self._linger
+                while len(batch) < _DETAIL_BATCH_SIZE:
+                    getter = asyncio.ensure_future(self._queue.get())
+                    done, _ = await asyncio.wait(
+                        {getter}, timeout=max(0.0, deadline - loop.time())
+                    )
+                    if not done:
+                        break  # linger expired; getter carries over
+                    item = getter.result()
+                    getter = None
+                    if item is None:
+                        self._dispatch(batch)
+                        return
+                    batch.append(item)
+                self._dispatch(batch)
+        finally:
+            if getter is not None:
+                getter.cancel()
+
+    async def close(self):
+        """Flush the last partial batch and wait for every batch to finish."""
+        self._queue.put_nowait(None)
+        await self._consumer
+        await asyncio.gather(*self._batches)
+
+    def cancel(self):
+        self._consumer.cancel()
+        for task in self._batches:
+            task.cancel()
+
+
+async def _run_spotify_detail_pipeline(
     job_id,
     session,
-    valid_spotify_ids,
+    cache_misses,
     token,
-    spotify_id_to_key,
-    spotify_id_to_original_data,
     cache_hits,
+    duration_backfill,
+    prefetched_hits=None,
+    no_match=None,
 ):
-    """Batch-fetch Spotify album details for all found IDs.
+    """Search misses and fetch their album details as one pipelined stage.
 
-    Reports progress in the 40-60% range. Promotes enriched albums into
-    cache_hits (mutated in place). Returns new_metadata_rows.
+    The search phase is the producer: every match goes straight to an
+    ``_AlbumDetailBatcher``, so detail batches run while later searches are
+    still in flight instead of waiting for all of them.  Stored IDs of
+    *duration_backfill* hits are queued before the first search.  Both
+    stages report through one ``_SpotifyProgress``.
+
+    Promotes enriched albums into cache_hits (mutated in place). Returns
+    new_metadata_rows.
     """
-    new_metadata_rows = []
-    batch_size = 20
-    num_batches = ceil(len(valid_spotify_ids) / batch_size)
-    logging.info(
-        f"Fetching album details for "
-        f"{len(valid_spotify_ids)} albums "
-        f"in {num_batches} parallel batches "
-        f"(batch size: {batch_size})"
+    progress = _SpotifyProgress(
+        job_id, len(cache_misses), prefound=len(duration_backfill)
     )
-    batch_start_time = time.time()
-
-    batch_groups = [
-        valid_spotify_ids[i : i + batch_size]
-        for i in range(0, len(valid_spotify_ids), batch_size)
-    ]
-    batch_semaphore = asyncio.Semaphore(SPOTIFY_BATCH_CONCURRENCY)
-
-    async def fetch_batch_with_semaphore(batch_ids):
-        return await fetch_spotify_album_details_batch(
-            session,
-            batch_ids,
-            token,
-            semaphore=batch_semaphore,
-        )
+    spotify_id_to_key = {}
+    spotify_id_to_original_data = {}
+    new_metadata_rows = []
+    start_time = time.time()
 
-    batch_tasks = [fetch_batch_with_semaphore(batch) for batch in batch_groups]
-
-    all_album_details = {}
-    batches_done = 0
-    for fut in asyncio.as_completed(batch_tasks):
-        batch_result = await fut
-        all_album_details.update(batch_result)
-        batches_done += 1
-        # Map batch progress into the 40%-60% range
-        pct = 40 + int(20 * batches_done / max(num_batches, 1))
-        enriched_so_far = len(all_album_details)
-        set_job_progress(
-            job_id,
-            progress=pct,
-            message=(
-                f"Enriched {enriched_so_far}/"
-                f"{len(valid_spotify_ids)} albums from Spotify..."
-            ),
+    def on_batch(batch_ids, details):
+        new_metadata_rows.extend(
+            _promote_album_details(
+                details, spotify_id_to_key, spotify_id_to_original_data, cache_hits
+            )
         )
+        progress.details_done(len(batch_ids))
+
+    batcher = _AlbumDetailBatcher(session, token, on_batch)
+
+    def on_found(spotify_id, key, data):
+        spotify_id_to_key[spotify_id] = key
+        spotify_id_to_original_data[spotify_id] = data
+        batcher.put(spotify_id)
+
+    try:
+        for key, cached in duration_backfill.items():
+            on_found(cached["spotify_id"], key, cache_hits[key]["original"])
+        if cache_misses:
+            await _run_spotify_search_phase(
+                job_id,
+                session,
+                cache_misses,
+                token,
+                progress=progress,
+                on_found=on_found,
+                prefetched_hits=prefetched_hits,
+                no_match=no_match,
+            )
+        await batcher.close()
+    except BaseException:
+        batcher.cancel()
+        raise
 
-    batch_duration = time.time() - batch_start_time
     logging.info(
-        f"Album details fetch completed in "
-        f"{batch_duration:.1f}s: Got details for "
-        f"{len(all_album_details)} albums"
+        f"Spotify search + details completed in {time.time() - start_time:.1f}s: "
+        f"{len(batcher.batch_sizes)} detail batches "
+        f"(sizes {batcher.batch_sizes}), {len(new_metadata_rows)} albums enriched"
     )
+    return new_metadata_rows
+
 
-    # Extract cacheable fields, promote to cache_hits
+def _promote_album_details(
+    all_album_details, spotify_id_to_key, spotify_id_to_original_data, cache_hits
+):
+    """Promote fetched album details into cache_hits (mutated in place).
+
+    Missing or empty detail objects (deleted albums, failed batches) are
+    skipped. Returns new_metadata_rows.
+    """
+    new_metadata_rows = []
     for spotify_id, album_details in all_album_details.items():
         if not album_details:
             continue
@@ -347,15 +679,8 @@ async def _run_spotify_batch_detail_phase(
         key = spotify_id_to_key[spotify_id]
 
         release_date = album_details.get("release_date", "")
-        album_image_url = (
-            album_details.get("images", [{}])[0].get("url")
-            if album_details.get("images")
-            else None
-        )
-        track_durations = {
-            normalize_track_name(t.get("name", "")): t.get("duration_ms", 0) // 1000
-            for t in album_details.get("tracks", {}).get("items", [])
-        }
+        album_image_url = _album_image_url(album_details)
+        track_durations = _album_track_durations(album_details)
 
         cache_hits[key] = {
             "cached": {
@@ -381,14 +706,63 @@ async def _run_spotify_batch_detail_phase(
     return new_metadata_rows
 
 
-async def _fetch_spotify_misses(job_id, cache_misses, cache_hits):
+def _promote_search_hits(
+    spotify_id_to_key, spotify_id_to_original_data, search_hits, cache_hits
+):
+    """Promote search hits into cache_hits without fetching album details.
+
+    The lite enrichment path: release date and artwork come straight from
+    the search payload, and ``track_durations`` is None ("not yet fetched")
+    so a later playtime job backfills it.  Mutates *cache_hits* in place and
+    returns new_metadata_rows.
+    """
+    new_metadata_rows = []
+    for spotify_id, hit in search_hits.items():
+        key = spotify_id_to_key[spotify_id]
+        release_date = hit.get("release_date", "")
+        album_image_url = _album_image_url(hit)
+        cache_hits[key] = {
+            "cached": {
+                "spotify_id": spotify_id,
+                "release_date": release_date,
+                "album_image_url": album_image_url,
+                "track_durations": None,
+            },
+            "original": spotify_id_to_original_data[spotify_id],
+        }
+        new_metadata_rows.append(
+            (key[0], key[1], spotify_id, release_date, album_image_url, None)
+        )
+    return new_metadata_rows
+
+
+async def _fetch_spotify_misses(
+    job_id,
+    cache_misses,
+    cache_hits,
+    need_durations=True,
+    duration_backfill=None,
+    prefetched_hits=None,
+    no_match=None,
+):
     """Fetch Spotify metadata for cache misses via search + batch detail.
 
+    Only playtime ranking needs track durations, which only the album-detail
+    endpoint returns; that path runs the pipelined search -> detail stage
+    (``_run_spotify_detail_pipeline``).  With ``need_durations=False`` the
+    detail stage is skipped and misses are promoted from their search hits
+    alone (``_promote_search_hits``).  *duration_backfill* maps cache-hit
+    keys whose durations were never fetched to their cached metadata; their
+    stored Spotify IDs join the detail stage without a new search.
+    *prefetched_hits* holds search results the prefetch already has, and
+    keys Spotify had no match for are added to the *no_match* set.
+
     Mutates *cache_hits* in place by promoting newly found entries.
     Returns a list of new_metadata_rows tuples for DB persistence.
     Raises SpotifyUnavailableError if token fetch fails and no cache_hits exist.
     """
-    if not cache_misses:
+    duration_backfill = duration_backfill or {}
+    if not cache_misses and not duration_backfill:
         return []
 
     token = await fetch_spotify_access_token()
@@ -408,26 +782,34 @@ async def _fetch_spotify_misses(job_id, cache_misses, cache_hits):
         )
         return []
 
-    new_metadata_rows = []
     async with create_optimized_session() as session:
-        search_semaphore = asyncio.Semaphore(SPOTIFY_SEARCH_CONCURRENCY)
+        if need_durations:
+            return await _run_spotify_detail_pipeline(
+                job_id,
+                session,
+                cache_misses,
+                token,
+                cache_hits,
+                duration_backfill,
+                prefetched_hits,
+                no_match,
+            )
+        search_hits = {}
         spotify_id_to_key, spotify_id_to_original_data = (
             await _run_spotify_search_phase(
-                job_id, session, cache_misses, token, search_semaphore
-            )
-        )
-        valid_spotify_ids = list(spotify_id_to_original_data.keys())
-        if valid_spotify_ids:
-            new_metadata_rows = await _run_spotify_batch_detail_phase(
                 job_id,
                 session,
-                valid_spotify_ids,
+                cache_misses,
                 token,
-                spotify_id_to_key,
-                spotify_id_to_original_data,
-                cache_hits,
+                search_hits,
+                progress=_SpotifyProgress(job_id, len(cache_misses), details=False),
+                prefetched_hits=prefetched_hits,
+                no_match=no_match,
             )
-    return new_metadata_rows
+        )
+        return _promote_search_hits(
+            spotify_id_to_key, spotify_id_to_original_data, search_hits, cache_hits
+        )
 
 
 def _build_results(
@@ -518,9 +900,20 @@ async def process_albums(
     release_scope,
     decade=None,
     release_year=None,
+    prefetched=None,
 ):
     """Process albums using cached metadata when available, fetching from
-    Spotify only for cache misses, then persisting new results."""
+    Spotify only for cache misses, then queueing new results for the
+    write-behind persister (results do not wait for the upsert).
+
+    Albums in the ``spotify_no_match`` negative cache are reported unmatched
+    without a search, and new "no match" answers are recorded there.
+    *prefetched* is a finished ``SpotifyPrefetch``: albums it already looked
+    up or searched during the Last.fm fetch are not looked up or searched
+    again.  The in-memory hot tier is consulted before Postgres, so its
+    albums are served even when the DB is down.  Playtime jobs keep every
+    cache hit with durations and send at most PLAYTIME_SPOTIFY_MISS_BUDGET
+    misses and duration backfills to Spotify."""
     logging.info(
         f"Processing {len(filtered_albums)} albums. "
         f"Filters: year={year}, release_scope={release_scope}, "
@@ -533,24 +926,46 @@ async def process_albums(
     conn = await _get_db_connection()
     set_job_stat(job_id, "db_cache_enabled", bool(conn))
     cached_metadata = {}
+    known_no_match = set()
+    lookup_keys = list(filtered_albums.keys())
+    prefetched_hits = {}
+    if prefetched is not None:
+        cached_metadata = {
+            key: row for key, row in prefetched.cached.items() if key in filtered_albums
+        }
+        known_no_match = prefetched.no_match & filtered_albums.keys()
+        lookup_keys = [key for key in lookup_keys if key not in prefetched.looked_up]
+        prefetched_hits = prefetched.search_hits
+    # The in-memory hot tier answers first, with or without a DB connection.
+    hot_hits = _lookup_hot_metadata(lookup_keys)
+    cached_metadata.update(hot_hits)
+    lookup_keys = [key for key in lookup_keys if key not in hot_hits]
+    set_job_stat(job_id, "memory_cache_hits", len(hot_hits))
     if conn:
         try:
-            cached_metadata = await _batch_lookup_metadata(
-                conn, list(filtered_albums.keys())
-            )
+            if lookup_keys:
+                cached_metadata.update(await _batch_lookup_metadata(conn, lookup_keys))
             set_job_stat(job_id, "db_cache_lookup_hits", len(cached_metadata))
+            tiers = get_metadata_cache_stats()
             logging.info(
-                f"DB cache: {len(cached_metadata)} hits / "
-                f"{len(filtered_albums)} total albums"
+                f"DB cache: {len(cached_metadata)} hits "
+                f"({len(hot_hits)} from memory) / "
+                f"{len(filtered_albums)} total albums; since start: "
+                f"memory {tiers['memory']['hits']} hits/"
+                f"{tiers['memory']['misses']} misses, "
+                f"DB {tiers['db']['hits']} hits/{tiers['db']['misses']} misses"
             )
         except Exception as exc:
             logging.warning(f"DB lookup failed, proceeding without cache: {exc}")
             set_job_stat(
                 job_id, "db_cache_warning", "DB lookup failed; cache bypassed."
             )
-            cached_metadata = {}
-        # Opportunistic stale-row cleanup -- non-fatal, errors swallowed inside.
-        await _cleanup_stale_metadata(conn)
+        try:
+            known_no_match |= await _batch_lookup_no_match(
+                conn, [key for key in lookup_keys if key not in cached_metadata]
+            )
+        except Exception as exc:
+            logging.warning(f"No-match cache lookup failed (non-fatal): {exc}")
     else:
         set_job_stat(
             job_id,
@@ -563,6 +978,7 @@ async def process_albums(
     # =================================================================
     cache_hits = {}  # key -> {"cached": dict, "original": original_data}
     cache_misses = {}  # key -> original_data
+    no_match_hits = 0
 
     for key, original_data in filtered_albums.items():
         if key in cached_metadata:
@@ -570,35 +986,85 @@ async def process_albums(
                 "cached": cached_metadata[key],
                 "original": original_data,
             }
+        elif key in known_no_match:
+            _add_no_match_unmatched(job_id, original_data)
+            no_match_hits += 1
         else:
             cache_misses[key] = original_data
 
+    if conn and cache_hits:
+        note_cache_hits(cache_hits.keys())  # keep popular rows from expiring
+    # Hits cached by a lite (search-only) enrichment have no durations yet;
+    # only playtime ranking needs them.
+    need_durations = sort_mode == "playtime"
+    duration_backfill = {}
+    budget_skipped = 0
+    if need_durations:
+        lite_hits = {
+            key: entry["original"]
+            for key, entry in cache_hits.items()
+            if entry["cached"].get("track_durations") is None
+        }
+        cache_misses, kept_lite, (misses_skipped, backfill_skipped) = (
+            _apply_playtime_miss_budget(cache_misses, prefetched_hits, lite_hits)
+        )
+        for key in lite_hits:
+            if key in kept_lite:
+                duration_backfill[key] = cache_hits[key]["cached"]
+            else:
+                del cache_hits[key]  # cannot be ranked by play time
+        budget_skipped = misses_skipped + backfill_skipped
+        set_job_stat(job_id, "playtime_misses_skipped", misses_skipped)
+        set_job_stat(job_id, "playtime_backfill_skipped", backfill_skipped)
+        if duration_backfill:
+            logging.info(
+                f"Backfilling track durations for {len(duration_backfill)} "
+                f"cached albums"
+            )
     db_hit_count = len(cache_hits)
     set_job_stat(job_id, "cache_hits", db_hit_count)
-    logging.info(f"Cache partition: {db_hit_count} hits, {len(cache_misses)} misses")
+    set_job_stat(job_id, "db_no_match_hits", no_match_hits)
+    if prefetched is not None:
+        set_job_stat(
+            job_id,
+            "spotify_prefetched",
+            sum(1 for key in cache_misses if key in prefetched_hits),
+        )
+    logging.info(
+        f"Cache partition: {db_hit_count} hits, {no_match_hits} known no-match, "
+        f"{len(cache_misses)} misses"
+    )
 
     # =================================================================
     # Phase 3: Spotify fetch for misses only
     # =================================================================
+    new_no_match = set()
     try:
         new_metadata_rows = await _fetch_spotify_misses(
-            job_id, cache_misses, cache_hits
+            job_id,
+            cache_misses,
+            cache_hits,
+            need_durations,
+            duration_backfill,
+            prefetched_hits,
+            new_no_match,
         )
 
         # =============================================================
-        # Phase 4: DB Batch Persist
+        # Phase 4: Queue new rows for the write-behind persister
         # =============================================================
-        if conn and new_metadata_rows:
-            try:
-                await _batch_persist_metadata(conn, new_metadata_rows)
-                set_job_stat(job_id, "db_cache_persisted", len(new_metadata_rows))
-                logging.info(
-                    f"Persisted {len(new_metadata_rows)} new metadata "
-                    f"rows to DB cache"
-                )
-            except Exception as exc:
-                logging.warning(f"DB persist failed (non-fatal): {exc}")
-                set_job_stat(job_id, "db_cache_warning", "DB persist failed.")
+        # Not gated on conn: the persister has its own connection, and the
+        # rows fill the hot tier even while the DB is unreachable.
+        if new_metadata_rows:
+            queue_metadata_rows(new_metadata_rows)
+            set_job_stat(job_id, "db_cache_persisted", len(new_metadata_rows))
+            logging.info(
+                f"Queued {len(new_metadata_rows)} new metadata rows for the "
+                f"DB cache"
+            )
+        if new_no_match:
+            queue_no_match(new_no_match)
+            set_job_stat(job_id, "db_no_match_persisted", len(new_no_match))
     finally:
         if conn:
             await conn.close()
@@ -611,7 +1077,7 @@ async def process_albums(
     set_job_stat(
         job_id,
         "spotify_unmatched",
-        len(filtered_albums) - total_matched,
+        len(filtered_albums) - total_matched - budget_skipped,
     )
 
     return _build_results(
@@ -632,11 +1098,11 @@ def _record_lastfm_stats(job_id, fetch_metadata):
 
 
 def _apply_pre_slice(filtered_albums, sort_mode, limit_results, release_scope):
-    """Apply pre-Spotify pre-slicing and playtime cap.
+    """Apply the pre-Spotify playcount pre-slice.
 
-    Playcount pre-slice: only when sort_mode='playcount', release_scope='all',
-    and limit_results is a valid integer. Playtime cap: fires at
-    _PLAYTIME_ALBUM_CAP when sort_mode='playtime'. Returns the (possibly
+    Only when sort_mode='playcount', release_scope='all', and limit_results
+    is a valid integer.  Playtime jobs are bounded later, and only in their
+    cache misses (``_apply_playtime_miss_budget``).  Returns the (possibly
     reduced) dict.
     """
     if sort_mode == "playcount" and limit_results != "all" and release_scope == "all":
@@ -653,21 +1119,61 @@ def _apply_pre_slice(filtered_albums, sort_mode, limit_results, release_scope):
         except ValueError:
             pass  # malformed limit_results handled by the post-process slice
 
-    if sort_mode == "playtime" and len(filtered_albums) > _PLAYTIME_ALBUM_CAP:
-        sorted_items = sorted(
-            filtered_albums.items(),
-            key=lambda kv: cast(int, kv[1]["play_count"]),
-            reverse=True,
-        )
-        filtered_albums = dict(sorted_items[:_PLAYTIME_ALBUM_CAP])
-        logging.warning(
-            f"Playtime album cap applied: capped {len(sorted_items)} albums "
-            f"to top {_PLAYTIME_ALBUM_CAP} by play_count before Spotify fetch"
-        )
-
     return filtered_albums
 
 
+def _apply_playtime_miss_budget(cache_misses, prefetched_hits, backfill=None):
+    """Bound a playtime job's Spotify work; return ``(misses, backfill, skipped)``.
+
+    Playtime ranking needs Spotify track durations, so every miss costs a
+    search plus its share of a detail batch, and every *backfill* album (a
+    lite cache hit without durations, mapped to its original data) its share
+    of a detail batch.  Both draw on one budget of
+    PLAYTIME_SPOTIFY_MISS_BUDGET albums; cache hits with durations cost
+    nothing and are never dropped.  Misses the prefetch already searched come
+    first (their search is paid for), then misses and backfills together by
+    play_count -- the best available proxy for culling the tail.  *skipped*
+    is ``(skipped misses, skipped backfills)``.
+    """
+    backfill = backfill or {}
+    if len(cache_misses) + len(backfill) <= PLAYTIME_SPOTIFY_MISS_BUDGET:
+        return cache_misses, backfill, (0, 0)
+    ranked = sorted(
+        [*cache_misses.items(), *backfill.items()],
+        key=lambda kv: (kv[0] in prefetched_hits, cast(int, kv[1]["play_count"])),
+        reverse=True,
+    )
+    kept = dict(ranked[:PLAYTIME_SPOTIFY_MISS_BUDGET])
+    kept_misses = {k: v for k, v in kept.items() if k in cache_misses}
+    kept_backfill = {k: v for k, v in kept.items() if k in backfill}
+    skipped = (
+        len(cache_misses) - len(kept_misses),
+        len(backfill) - len(kept_backfill),
+    )
+    logging.warning(
+        f"Playtime miss budget applied: {skipped[0]} of {len(cache_misses)} "
+        f"cache misses and {skipped[1]} of {len(backfill)} duration backfills "
+        f"skipped, {PLAYTIME_SPOTIFY_MISS_BUDGET} sent to Spotify"
+    )
+    return kept_misses, kept_backfill, skipped
+
+
+def _start_spotify_prefetch(sort_mode, limit_results, release_scope):
+    """Return a ``SpotifyPrefetch`` for the job, or None when it would waste calls.
+
+    A playcount pre-slice keeps only the top N albums, which are not known
+    until the fetch ends, so it gets no prefetch.  Playtime jobs search at
+    most PLAYTIME_SPOTIFY_MISS_BUDGET albums, the most the budget can let
+    through; their DB lookups are unbounded.
+    """
+    if not SPOTIFY_PREFETCH_ENABLED:
+        return None
+    if sort_mode == "playcount" and limit_results != "all" and release_scope == "all":
+        return None
+    search_limit = PLAYTIME_SPOTIFY_MISS_BUDGET if sort_mode == "playtime" else None
+    return SpotifyPrefetch(search_limit)
+
+
 def _detect_spotify_total_failure(job_id, results, filtered_albums):
     """Return True and set job error if all filtered albums had no Spotify match.
 
@@ -727,12 +1233,15 @@ async def _fetch_and_process(
     min_plays=10,
     min_tracks=3,
     limit_results="all",
+    ingest_mode=None,
 ):
     """Fetch and process albums in the background for a single job."""
+    prefetch = None
     try:
         overall_start_time = time.time()
         cleanup_expired_cache()
         cleanup_expired_jobs()
+        warm_spotify_token()
 
         set_job_progress(
             job_id,
@@ -759,12 +1268,16 @@ async def _fetch_and_process(
                 message=f"Fetching Last.fm page {pages_done}/{total_pages}...",
             )
 
+        prefetch = _start_spotify_prefetch(sort_mode, limit_results, release_scope)
         filtered_albums, fetch_metadata = await fetch_top_albums_async(
             username,
             year,
             min_plays=min_plays,
             min_tracks=min_tracks,
             progress_cb=_lastfm_progress,
+            sort_mode=sort_mode,
+            ingest_mode=ingest_mode,
+            on_qualified=prefetch.add if prefetch else None,
         )
         step_elapsed = time.time() - step_start_time
         logging.info(f"Time elapsed (Last.fm data fetch): {step_elapsed:.1f}s")
@@ -805,6 +1318,7 @@ async def _fetch_and_process(
 
         step_start_time = time.time()
 
+        prefetched = await prefetch.finish() if prefetch else None
         try:
             results = await process_albums(
                 job_id,
@@ -814,6 +1328,7 @@ async def _fetch_and_process(
                 release_scope,
                 decade,
                 release_year,
+                prefetched,
             )
         except SpotifyUnavailableError:
             set_job_error(job_id, "spotify_unavailable")
@@ -867,6 +1382,9 @@ async def _fetch_and_process(
 
         logging.exception(f"Error processing request for {username} in {year}")
         return []
+    finally:
+        if prefetch is not None:
+            await prefetch.aclose()
 
 
 def background_task(
@@ -880,6 +1398,7 @@ def background_task(
     min_plays=10,
     min_tracks=3,
     limit_results="all",
+    ingest_mode=None,
 ):
     """Run the async fetch pipeline in a dedicated event loop on this thread.
 
@@ -894,6 +1413,7 @@ def background_task(
     else:
         loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
+    tag_requests_with_job(job_id)
     try:
         loop.run_until_complete(
             _fetch_and_process(
@@ -907,6 +1427,7 @@ def background_task(
                 min_plays,
                 min_tracks,
                 limit_results,
+                ingest_mode,
             )
         )
     except Exception:
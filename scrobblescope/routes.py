@@ -5,7 +5,7 @@ from flask import Blueprint, jsonify, render_template, request
 
 from scrobblescope.heatmap import heatmap_task
 from scrobblescope.lastfm import check_user_exists
-from scrobblescope.orchestrator import background_task
+from scrobblescope.orchestrator import INGEST_MODES, background_task
 from scrobblescope.repositories import (
     cleanup_expired_jobs,
     create_job,
@@ -418,6 +418,10 @@ def results_loading():
     min_plays = request.form.get("min_plays", "10")
     min_tracks = request.form.get("min_tracks", "3")
     limit_results = request.form.get("limit_results", "all")
+    # Optional per-job override of LASTFM_INGEST_MODE; unknown values use it.
+    ingest_mode = request.form.get("ingest_mode")
+    if ingest_mode not in INGEST_MODES:
+        ingest_mode = None
 
     if not username or not year:
         logging.warning("Missing username or year in form submission.")
@@ -473,6 +477,7 @@ def results_loading():
         "min_plays": min_plays,
         "min_tracks": min_tracks,
         "limit_results": limit_results,
+        "ingest_mode": ingest_mode,
     }
 
     job_id = create_job(params)
@@ -491,6 +496,7 @@ def results_loading():
                 min_plays,
                 min_tracks,
                 limit_results,
+                ingest_mode,
             ),
         )
     except Exception:
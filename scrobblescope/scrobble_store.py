@@ -0,0 +1,340 @@
+"""Persistent per-user scrobble store with incremental Last.fm sync.
+
+Album and heatmap jobs used to re-download their whole time range from
+Last.fm on every run, even when the same user asked for the same year a day
+earlier.  This module keeps flattened scrobbles per user in Postgres
+(``lastfm_scrobbles``, created by ``init_db.py``) together with a synced
+window in ``lastfm_sync_state``.  A later job only fetches the parts of its
+``[from_ts, to_ts]`` range that fall outside that window -- in practice the
+scrobbles newer than the high-water mark -- and reads the rest from the DB.
+
+The synced window is kept contiguous per user so "everything between
+``synced_from_uts`` and ``synced_to_uts`` is stored" stays a single fact.  A
+request that neither overlaps nor touches the window replaces it instead of
+fetching the gap in between, which could be years of history.
+
+Jobs for the same user may run concurrently (an album job and a heatmap, or
+a double submit).  Persists take a per-user advisory lock and are dropped
+when another job changed the sync state after this one planned its windows,
+so rows are never stored twice and a window never vouches for deleted rows.
+
+Scrobbles are handed to callers as a columnar ``ScrobbleBatch`` (see
+``scrobbles.py``): stored rows go straight from the DB into the batch, and
+fetched pages are appended and dropped as they arrive.
+
+Dependency chain (leaf-ward):
+    scrobble_store <- cache, config, lastfm, scrobbles
+"""
+
+import logging
+import time
+from typing import Any
+
+from scrobblescope.cache import _get_db_connection
+from scrobblescope.config import SCROBBLE_STORE_ENABLED, SCROBBLE_SYNC_LOOKBACK_SECONDS
+from scrobblescope.lastfm import fetch_all_recent_tracks_async
+from scrobblescope.scrobbles import ScrobbleBatch
+
+
+def _plan_sync(state, from_ts, to_ts, now):
+    """Decide which Last.fm windows must be fetched for a request.
+
+    Pure function: data-in, plan-out.  *state* is ``(synced_from_uts,
+    synced_to_uts)`` or None when the user has never been synced.
+
+    Returns ``(windows, reset, new_state)`` where *windows* is a list of
+    inclusive ``(from, to)`` ranges to fetch, *reset* says whether the stored
+    window must be discarded (no overlap with the request), and *new_state*
+    is the synced window to record once every fetch succeeds.  The right-hand
+    edge of the synced window never moves past *now*: scrobbles for the
+    future can still arrive.
+    """
+    capped_to = min(to_ts, now)
+    if state is None:
+        return [(from_ts, to_ts)], True, (from_ts, capped_to)
+
+    synced_from, synced_to = state
+    if to_ts < synced_from - 1 or from_ts > synced_to + 1:
+        return [(from_ts, to_ts)], True, (from_ts, capped_to)
+
+    windows = []
+    if from_ts < synced_from:
+        windows.append((from_ts, synced_from - 1))
+    if to_ts > synced_to:
+        # Re-read a short lookback before the high-water mark so scrobbles
+        # submitted late (offline devices, delayed scrobblers) are picked up.
+        right_from = max(from_ts, synced_to + 1 - SCROBBLE_SYNC_LOOKBACK_SECONDS)
+        windows.append((right_from, to_ts))
+    new_state = (min(from_ts, synced_from), max(synced_to, capped_to))
+    return windows, False, new_state
+
+
+def _window_rows(batch, start, end, from_ts, to_ts):
+    """Return ``(uts, artist, album, track)`` rows of ``batch[start:end]``
+    that fall inside the inclusive window.
+
+    Last.fm can return boundary pages with out-of-range entries; those must
+    not be stored as if the window vouched for them.
+    """
+    return [row for row in batch.rows(start, end) if from_ts <= row[0] <= to_ts]
+
+
+async def _fetch_into_batch(
+    batch, username, from_ts, to_ts, progress_cb=None, scrobbles_cb=None
+):
+    """Stream a Last.fm range into *batch*; return the fetch metadata.
+
+    Each page is appended to the batch and then dropped, and
+    ``scrobbles_cb(batch, start, end)`` is told which rows it added.
+    """
+
+    def _on_page(page):
+        start = len(batch)
+        batch.extend_page(page)
+        if scrobbles_cb is not None and len(batch) > start:
+            scrobbles_cb(batch, start, len(batch))
+
+    _, metadata = await fetch_all_recent_tracks_async(
+        username, from_ts, to_ts, progress_cb=progress_cb, page_cb=_on_page
+    )
+    return metadata
+
+
+async def _load_sync_state(conn, user_key):
+    """Return the user's ``(synced_from_uts, synced_to_uts)`` window, or None."""
+    row = await conn.fetchrow(
+        """
+        SELECT synced_from_uts, synced_to_uts
+        FROM lastfm_sync_state
+        WHERE username = $1
+        """,
+        user_key,
+    )
+    if row is None:
+        return None
+    return row["synced_from_uts"], row["synced_to_uts"]
+
+
+async def _load_scrobbles(conn, user_key, from_ts, to_ts):
+    """Return stored ``(uts, artist, album, track)`` rows in the inclusive range."""
+    rows = await conn.fetch(
+        """
+        SELECT uts, artist, album, track
+        FROM lastfm_scrobbles
+        WHERE username = $1 AND uts BETWEEN $2 AND $3
+        """,
+        user_key,
+        from_ts,
+        to_ts,
+    )
+    return [(r["uts"], r["artist"], r["album"], r["track"]) for r in rows]
+
+
+async def _persist_sync(conn, user_key, planned_state, windows, rows, reset, new_state):
+    """Replace the fetched windows' rows and advance the synced window.
+
+    Returns False, writing nothing, when the user's sync state is no longer
+    *planned_state* (the one the windows were planned on): another job has
+    persisted since, and its rows and window must not be overwritten or
+    doubled.  A transaction-level advisory lock on the user serializes
+    concurrent persists so that check cannot race.
+
+    Runs in one transaction so a crash never leaves the high-water mark ahead
+    of the rows it vouches for.  Fetched windows are authoritative: stored
+    rows inside them are deleted first, so scrobbles removed on Last.fm
+    within the lookback also disappear here, and rows are inserted as
+    fetched: identical scrobbles in the same second are all kept.
+    """
+    async with conn.transaction():
+        await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1))", user_key)
+        if await _load_sync_state(conn, user_key) != planned_state:
+            return False
+        if reset:
+            await conn.execute(
+                "DELETE FROM lastfm_scrobbles WHERE username = $1", user_key
+            )
+        for win_from, win_to in windows:
+            await conn.execute(
+                """
+                DELETE FROM lastfm_scrobbles
+                WHERE username = $1 AND uts BETWEEN $2 AND $3
+                """,
+                user_key,
+                win_from,
+                win_to,
+            )
+        if rows:
+            await conn.execute(
+                """
+                INSERT INTO lastfm_scrobbles (username, uts, artist, album, track)
+                SELECT $1::text, * FROM unnest(
+                    $2::bigint[], $3::text[], $4::text[], $5::text[]
+                )
+                """,
+                user_key,
+                [r[0] for r in rows],
+                [r[1] for r in rows],
+                [r[2] for r in rows],
+                [r[3] for r in rows],
+            )
+        await conn.execute(
+            """
+            INSERT INTO lastfm_sync_state
+                (username, synced_from_uts, synced_to_uts, updated_at)
+            VALUES ($1, $2, $3, NOW())
+            ON CONFLICT (username) DO UPDATE SET
+                synced_from_uts = EXCLUDED.synced_from_uts,
+                synced_to_uts   = EXCLUDED.synced_to_uts,
+                updated_at      = NOW()
+            """,
+            user_key,
+            new_state[0],
+            new_state[1],
+        )
+    return True
+
+
+def _merge_fetch_metadata(metas):
+    """Combine per-window fetch metadata into one dict of the usual shape."""
+    merged: dict[str, Any] = {
+        "status": "ok",
+        "pages_expected": 0,
+        "pages_received": 0,
+    }
+    for meta in metas:
+        if meta.get("status") == "error":
+            return dict(meta)
+        merged["pages_expected"] += meta.get("pages_expected", 0)
+        merged["pages_received"] += meta.get("pages_received", 0)
+    dropped = merged["pages_expected"] - merged["pages_received"]
+    if dropped > 0:
+        merged["status"] = "partial"
+        merged["pages_dropped"] = dropped
+    return merged
+
+
+async def plan_store_windows(username, from_ts, to_ts):
+    """Return the windows a store-backed fetch of the range would download.
+
+    Returns None when the store is disabled or unreachable, in which case a
+    fetch downloads the whole range.  Read-only: the sync state is not
+    touched.
+    """
+    conn = await _get_db_connection() if SCROBBLE_STORE_ENABLED else None
+    if conn is None:
+        return None
+    try:
+        state = await _load_sync_state(conn, username.lower())
+    except Exception as exc:
+        logging.warning(f"Scrobble store lookup failed: {exc}")
+        return None
+    finally:
+        await conn.close()
+    windows, _, _ = _plan_sync(state, from_ts, to_ts, int(time.time()))
+    return windows
+
+
+async def fetch_recent_tracks_incremental(
+    username, from_ts, to_ts, progress_cb=None, scrobbles_cb=None
+):
+    """Fetch a range's scrobbles into a ``ScrobbleBatch``, reusing the store.
+
+    Returns ``(batch, metadata)`` where *metadata* has the usual Last.fm
+    fetch shape plus a ``store_scrobbles`` count.  Stored scrobbles are
+    appended first, then fetched pages as they land; when given,
+    ``scrobbles_cb(batch, start, end)`` is invoked after every append so
+    callers can fold rows ``[start, end)`` into their counters while later
+    pages are still in flight.  When the DB is unavailable or the store is
+    disabled this is a plain full fetch.
+
+    The store is only written when every window fetched cleanly; a partial
+    fetch must not advance the high-water mark past pages that were dropped.
+    Store failures are logged and never fail the job.
+    """
+    batch = ScrobbleBatch()
+    conn = await _get_db_connection() if SCROBBLE_STORE_ENABLED else None
+    if conn is None:
+        metadata = await _fetch_into_batch(
+            batch, username, from_ts, to_ts, progress_cb, scrobbles_cb
+        )
+        return batch, metadata
+
+    # The connection is only held for the lookup and, later, the persist:
+    # the Last.fm fetch in between can take minutes.
+    user_key = username.lower()
+    try:
+        state = await _load_sync_state(conn, user_key)
+        windows, reset, new_state = _plan_sync(state, from_ts, to_ts, int(time.time()))
+        stored_rows = []
+        if not reset:
+            stored_rows = [
+                r
+                for r in await _load_scrobbles(conn, user_key, from_ts, to_ts)
+                if not any(w_from <= r[0] <= w_to for w_from, w_to in windows)
+            ]
+    except Exception as exc:
+        logging.warning(f"Scrobble store lookup failed, full fetch: {exc}")
+        metadata = await _fetch_into_batch(
+            batch, username, from_ts, to_ts, progress_cb, scrobbles_cb
+        )
+        return batch, metadata
+    finally:
+        await conn.close()
+    stored_count = len(stored_rows)
+    logging.info(
+        f"Scrobble store for {username}: {stored_count} stored scrobbles, "
+        f"{len(windows)} window(s) to fetch"
+    )
+
+    for row in stored_rows:
+        batch.append(*row)
+    del stored_rows
+    if scrobbles_cb is not None and stored_count:
+        scrobbles_cb(batch, 0, stored_count)
+
+    # Windows are fetched one after another, so each one's rows form a
+    # contiguous range of the batch that can be persisted afterwards.
+    metas = []
+    window_ranges = []
+    for win_from, win_to in windows:
+        start = len(batch)
+        metas.append(
+            await _fetch_into_batch(
+                batch, username, win_from, win_to, progress_cb, scrobbles_cb
+            )
+        )
+        window_ranges.append((start, len(batch)))
+    metadata = _merge_fetch_metadata(metas)
+    metadata["store_scrobbles"] = stored_count
+    if metadata["status"] == "error":
+        return ScrobbleBatch(), metadata
+
+    # Nothing fetched means the synced window is unchanged.
+    if metadata["status"] == "ok" and windows:
+        new_rows = []
+        for (win_from, win_to), (start, end) in zip(windows, window_ranges):
+            new_rows.extend(_window_rows(batch, start, end, win_from, win_to))
+        await _persist_windows(user_key, state, windows, new_rows, reset, new_state)
+
+    return batch, metadata
+
+
+async def _persist_windows(user_key, planned_state, windows, rows, reset, new_state):
+    """Run ``_persist_sync`` on a fresh connection; failures are logged only."""
+    conn = await _get_db_connection()
+    if conn is None:
+        logging.warning("Scrobble store persist skipped: DB unavailable")
+        return
+    try:
+        persisted = await _persist_sync(
+            conn, user_key, planned_state, windows, rows, reset, new_state
+        )
+        if not persisted:
+            logging.info(
+                f"Scrobble store for {user_key} changed during the fetch; "
+                f"leaving it to the job that updated it"
+            )
+    except Exception as exc:
+        logging.warning(f"Scrobble store persist failed (non-fatal): {exc}")
+    finally:
+        await conn.close()
@@ -0,0 +1,59 @@
+"""Process-wide event loop for background maintenance work.
+
+Every job runs on its own thread and event loop, and both go away when the
+job ends, so work that must outlive a job -- keeping the Spotify token
+fresh, for example -- cannot be parked on a job's loop.  This module owns
+one extra loop, run forever on a daemon thread that is started on first
+use, and lets any thread hand it a coroutine.  Resources bound to a single
+loop, such as the asyncpg pool, live here and are used by every job through
+``run_on_service_loop``.
+
+This module is a leaf -- it imports nothing from the scrobblescope package.
+"""
+
+import asyncio
+import logging
+import threading
+
+_LOCK = threading.Lock()
+_LOOP = None
+
+
+def get_service_loop():
+    """Return the service loop, starting its daemon thread on first use."""
+    global _LOOP
+    with _LOCK:
+        if _LOOP is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="service-loop", daemon=True
+            ).start()
+            _LOOP = loop
+        return _LOOP
+
+
+def _log_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logging.warning(f"Background task failed: {future.exception()!r}")
+
+
+def submit(coro):
+    """Run *coro* on the service loop; return a ``concurrent.futures.Future``.
+
+    Callers may ignore the future: a failure is logged, never raised into
+    the submitting thread.
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, get_service_loop())
+    future.add_done_callback(_log_failure)
+    return future
+
+
+async def run_on_service_loop(coro):
+    """Await *coro* on the service loop from any event loop, itself included.
+
+    Unlike ``submit`` the result or exception is the caller's, and
+    cancelling the caller cancels *coro*.
+    """
+    return await asyncio.wrap_future(
+        asyncio.run_coroutine_threadsafe(coro, get_service_loop())
+    )
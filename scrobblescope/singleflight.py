@@ -0,0 +1,122 @@
+"""Process-wide single-flight registry for upstream calls.
+
+Two jobs for users with overlapping taste ask Spotify about the same albums
+at about the same time, and each request costs a throttle slot.
+``SingleFlight`` keeps one in-flight entry per key for the whole process:
+the first caller (the leader) makes the call and every caller that asks for
+the same key while it is running awaits the leader's result instead of
+issuing its own request.  Nothing is kept once a call completes -- caching
+results is the job of the request cache and ``spotify_cache``.
+
+Each job runs on its own thread and event loop, so the registry is guarded
+by a ``threading.Lock`` and followers wait on futures of their own loop,
+resolved with ``call_soon_threadsafe`` -- the same cross-loop approach as
+``utils._GlobalThrottle`` and ``concurrency.AdaptiveConcurrencyLimit``.  If
+a leader fails or is cancelled its followers are released to make the call
+themselves, so one job's cancellation never fails another.
+
+This module is a leaf -- it imports nothing from the scrobblescope package.
+"""
+
+import asyncio
+import threading
+
+# Resolved into followers whose leader gave up: they must fetch themselves.
+_RETRY = object()
+
+
+def _set_result(fut, value):
+    """Runs on the follower's loop; a follower that left is skipped."""
+    if not fut.done():
+        fut.set_result(value)
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls per key across threads and event loops.
+
+    ``do(key, fn)`` runs ``await fn()`` once per key at a time.
+    ``do_many(keys, fetch)`` is the batched form: ``await fetch(owned)``
+    fetches only the keys no other caller is already fetching and returns a
+    dict of their values; the rest are awaited from their leaders.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        # key -> [(loop, future)] of followers; presence means "in flight".
+        self._waiters: dict = {}
+        self._led = 0
+        self._shared = 0
+
+    def _claim(self, keys):
+        """Claim every key nobody is fetching; return ``(owned, waiting)``."""
+        loop = asyncio.get_running_loop()
+        owned, waiting = [], {}
+        with self._lock:
+            for key in keys:
+                waiters = self._waiters.get(key)
+                if waiters is None:
+                    self._waiters[key] = []
+                    owned.append(key)
+                else:
+                    fut = loop.create_future()
+                    waiters.append((loop, fut))
+                    waiting[key] = fut
+            self._led += len(owned)
+            self._shared += len(waiting)
+        return owned, waiting
+
+    def _complete(self, items):
+        """Drop the keys of *items* and hand each value to its followers."""
+        with self._lock:
+            released = [(self._waiters.pop(key, []), value) for key, value in items]
+        for waiters, value in released:
+            for loop, fut in waiters:
+                try:
+                    loop.call_soon_threadsafe(_set_result, fut, value)
+                except RuntimeError:
+                    pass  # the follower's loop has already been closed
+
+    async def do_many(self, keys, fetch):
+        """Return ``{key: value}`` for *keys*, sharing in-flight fetches.
+
+        A key *fetch* left out of its result maps to None.
+        """
+        results = {}
+        pending = list(dict.fromkeys(keys))
+        while pending:
+            owned, waiting = self._claim(pending)
+            if owned:
+                try:
+                    fetched = await fetch(owned)
+                except BaseException:
+                    self._complete((key, _RETRY) for key in owned)
+                    raise
+                values = {key: fetched.get(key) for key in owned}
+                self._complete(values.items())
+                results.update(values)
+            pending = []
+            for key, fut in waiting.items():
+                value = await fut
+                if value is _RETRY:
+                    pending.append(key)
+                else:
+                    results[key] = value
+        return results
+
+    async def do(self, key, fn):
+        """Return ``await fn()``, or the result of an identical call in flight."""
+
+        async def fetch(owned):
+            return {key: await fn()}
+
+        return (await self.do_many([key], fetch))[key]
+
+    def stats(self):
+        """Return calls made (led), calls shared and keys in flight."""
+        with self._lock:
+            return {
+                "led": self._led,
+                "shared": self._shared,
+                "in_flight": len(self._waiters),
+            }
@@ -1,27 +1,105 @@
 import asyncio
 import logging
+import threading
 import time
 
 import aiohttp
 
+from scrobblescope.cache import (
+    _get_db_connection,
+    _load_spotify_token,
+    _persist_spotify_token,
+)
 from scrobblescope.config import (
+    SPOTIFY_ARTIST_CATALOG_MAX_PAGES,
     SPOTIFY_BATCH_RETRIES,
     SPOTIFY_CLIENT_ID,
     SPOTIFY_CLIENT_SECRET,
     SPOTIFY_SEARCH_RETRIES,
+    SPOTIFY_TOKEN_PERSIST,
+    SPOTIFY_TOKEN_REFRESH_AHEAD_SECONDS,
     spotify_token_cache,
 )
+from scrobblescope.domain import normalize_name, normalize_track_name
+from scrobblescope.service_loop import submit
+from scrobblescope.singleflight import SingleFlight
 from scrobblescope.utils import (
     create_optimized_session,
+    get_spotify_batch_concurrency,
     get_spotify_limiter,
+    get_spotify_search_concurrency,
     retry_with_semaphore,
 )
 
+# Concurrent jobs asking for the same album share one request: searches are
+# keyed by the normalized (artist, album), detail fetches by Spotify ID.
+_SEARCH_FLIGHTS = SingleFlight("Spotify search")
+_DETAIL_FLIGHTS = SingleFlight("Spotify album details")
+_CATALOG_FLIGHTS = SingleFlight("Spotify artist catalog")
+_TOKEN_FLIGHTS = SingleFlight("Spotify token")
+
+# The refresh-ahead task on the service loop (see ``warm_spotify_token``).
+_token_refresher = None
+_TOKEN_REFRESHER_LOCK = threading.Lock()
+_TOKEN_RETRY_SECONDS = 60
+
+_SEARCH_URL = "https://api.spotify.com/v1/search"
+_CATALOG_PAGE_SIZE = 50  # the artist-albums endpoint's maximum
+
 
 async def fetch_spotify_access_token():
-    """Return a valid Spotify access token, refreshing from the API if expired."""
-    if spotify_token_cache["expires_at"] > time.time():
+    """Return a valid Spotify access token, refreshing it if expired.
+
+    Every caller that finds the token expired -- on any job's thread --
+    awaits one shared refresh instead of requesting its own token.
+    """
+    if _token_seconds_left() > 0:
         return spotify_token_cache["token"]
+    return await _TOKEN_FLIGHTS.do("token", _refresh_spotify_token)
+
+
+def _token_seconds_left():
+    return spotify_token_cache["expires_at"] - time.time()
+
+
+async def _refresh_spotify_token():
+    """Replace a token due for refresh; return the token now cached.
+
+    A token another process stored in Postgres is reused while it is not
+    itself due; otherwise a new one is requested (and stored).  Database
+    errors are logged and only cost the sharing, never the token.
+    """
+    if _token_seconds_left() > SPOTIFY_TOKEN_REFRESH_AHEAD_SECONDS:
+        return spotify_token_cache["token"]  # refreshed while we queued
+    conn = await _get_db_connection() if SPOTIFY_TOKEN_PERSIST else None
+    try:
+        if conn is not None:
+            try:
+                stored = await _load_spotify_token(conn)
+            except Exception as exc:
+                logging.warning(f"Shared Spotify token lookup failed: {exc}")
+                stored = None
+            if stored and stored[1] - time.time() > SPOTIFY_TOKEN_REFRESH_AHEAD_SECONDS:
+                token, expires_at = stored
+                spotify_token_cache.update({"token": token, "expires_at": expires_at})
+                logging.info("Reusing the shared Spotify token from the database")
+                return token
+        token = await _request_spotify_token()
+        if token and conn is not None:
+            try:
+                await _persist_spotify_token(
+                    conn, token, spotify_token_cache["expires_at"]
+                )
+            except Exception as exc:
+                logging.warning(f"Sharing the Spotify token failed: {exc}")
+        return token
+    finally:
+        if conn is not None:
+            await conn.close()
+
+
+async def _request_spotify_token():
+    """Request a new token from Spotify and cache it; None on failure."""
     url = "https://accounts.spotify.com/api/token"
     assert SPOTIFY_CLIENT_ID is not None, "SPOTIFY_CLIENT_ID not set"
     assert SPOTIFY_CLIENT_SECRET is not None, "SPOTIFY_CLIENT_SECRET not set"
@@ -42,23 +120,77 @@ async def fetch_spotify_access_token():
     return None
 
 
-async def search_for_spotify_album_id(session, artist, album, token, semaphore=None):
+async def _keep_spotify_token_fresh():
+    """Refresh the token ahead of its expiry, forever (runs on the service loop)."""
+    while True:
+        delay = _token_seconds_left() - SPOTIFY_TOKEN_REFRESH_AHEAD_SECONDS
+        if delay > 0:
+            await asyncio.sleep(delay)
+        try:
+            token = await _TOKEN_FLIGHTS.do("token", _refresh_spotify_token)
+        except Exception as exc:
+            logging.warning(f"Background Spotify token refresh failed: {exc}")
+            token = None
+        if not token:
+            await asyncio.sleep(_TOKEN_RETRY_SECONDS)
+
+
+def warm_spotify_token():
+    """Start keeping the Spotify token fresh in the background.
+
+    Called at the start of each album job: the first job's token request
+    then overlaps its Last.fm fetch, and later jobs find a valid token.
+    Non-blocking and idempotent; a no-op without Spotify credentials or
+    with SPOTIFY_TOKEN_REFRESH_AHEAD_SECONDS set to 0.
+    """
+    global _token_refresher
+    if SPOTIFY_TOKEN_REFRESH_AHEAD_SECONDS <= 0:
+        return
+    if not (SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET):
+        return
+    with _TOKEN_REFRESHER_LOCK:
+        if _token_refresher is None or _token_refresher.done():
+            _token_refresher = submit(_keep_spotify_token_fresh())
+
+
+async def search_for_spotify_album(session, artist, album, token, semaphore=None):
     """
-    Searches Spotify for a single album and returns its Spotify ID.
+    Searches Spotify for a single album and returns the top search hit.
     Optimized: Uses relaxed query first (faster, higher success rate).
+    In-flight searches are capped by *semaphore*, defaulting to the shared
+    adaptive search limit.  A search for an (artist, album) another job is
+    already running awaits that request instead of sending its own.
+
+    The hit is Spotify's simplified album object (``id``, ``release_date``,
+    ``images``, ...) -- everything the results page needs except track
+    durations.  Returns an empty dict when Spotify answered with no match
+    (a result worth caching) and None when the search itself failed.
     """
+    return await _SEARCH_FLIGHTS.do(
+        (artist, album),
+        lambda: _search_spotify_album(session, artist, album, token, semaphore),
+    )
+
+
+async def _search_spotify_album(session, artist, album, token, semaphore):
+    """Send one album search (with retries); see ``search_for_spotify_album``."""
     headers = {"Authorization": f"Bearer {token}"}
     # Use relaxed query directly - it has better success rate and avoids double-search
     params = {"q": f"{artist} {album}", "type": "album", "limit": 3}
     limiter = get_spotify_limiter()
+    concurrency = get_spotify_search_concurrency()
+    if semaphore is None:
+        semaphore = concurrency
 
     async def search_once():
         async with limiter:
             async with session.get(
-                "https://api.spotify.com/v1/search", params=params, headers=headers
+                _SEARCH_URL, params=params, headers=headers
             ) as response:
                 if response.status == 429:
                     retry_after = int(response.headers.get("Retry-After", "1"))
+                    concurrency.note_throttled()
+                    limiter.back_off(retry_after)
                     logging.warning(
                         f"Spotify 429 on '{album}' by '{artist}'. Retry in {retry_after}s"
                     )
@@ -69,10 +201,10 @@ async def search_for_spotify_album_id(session, artist, album, token, semaphore=N
 
                 data = await response.json()
                 items = data.get("albums", {}).get("items", [])
-                if items:
-                    return items[0].get("id"), None, True
+                if items and items[0].get("id"):
+                    return items[0], None, True
 
-                return None, None, True
+                return {}, None, True
 
     return await retry_with_semaphore(
         search_once,
@@ -88,21 +220,146 @@ async def search_for_spotify_album_id(session, artist, album, token, semaphore=N
     )
 
 
+async def _get_spotify_json(session, url, params, token, label):
+    """GET a Spotify endpoint with retries; return the JSON body or None."""
+    headers = {"Authorization": f"Bearer {token}"}
+    limiter = get_spotify_limiter()
+    concurrency = get_spotify_search_concurrency()
+
+    async def get_once():
+        async with limiter:
+            async with session.get(url, params=params, headers=headers) as response:
+                if response.status == 429:
+                    retry_after = int(response.headers.get("Retry-After", "1"))
+                    concurrency.note_throttled()
+                    limiter.back_off(retry_after)
+                    logging.warning(f"Spotify 429 on {label}. Retry in {retry_after}s")
+                    return None, retry_after, False
+                if response.status != 200:
+                    return None, None, True
+                return await response.json(), None, True
+
+    return await retry_with_semaphore(
+        get_once,
+        retries=SPOTIFY_SEARCH_RETRIES,
+        semaphore=concurrency,
+        is_done=lambda t: t[2],
+        get_retry_after=lambda t: t[1],
+        extract_result=lambda t: t[0],
+        default=None,
+        backoff=1,
+        jitter=lambda a: (abs(hash((label, a))) % 200) / 1000.0,
+        error_label=label,
+    )
+
+
+async def fetch_spotify_artist_catalog(session, artist, token):
+    """Return an artist's Spotify albums keyed by normalized album name.
+
+    *artist* is a normalized artist name.  The artist is resolved with one
+    search; its albums, singles and compilations are then paged from the
+    artist-albums endpoint, at most SPOTIFY_ARTIST_CATALOG_MAX_PAGES pages.
+    Values are simplified album objects, the same shape as an album search
+    hit.  Returns None when the artist cannot be resolved to a Spotify
+    artist of the same normalized name; a page failing midway returns the
+    albums read so far.  Concurrent calls for one artist share the work.
+    """
+    return await _CATALOG_FLIGHTS.do(
+        artist, lambda: _fetch_artist_catalog(session, artist, token)
+    )
+
+
+async def _fetch_artist_catalog(session, artist, token):
+    data = await _get_spotify_json(
+        session,
+        _SEARCH_URL,
+        {"q": artist, "type": "artist", "limit": 1},
+        token,
+        f"Spotify artist search for '{artist}'",
+    )
+    items = (data or {}).get("artists", {}).get("items", [])
+    if not items or not items[0].get("id"):
+        return None
+    found = items[0]
+    if normalize_name(found.get("name", ""), "")[0] != artist:
+        return None
+
+    url = f"https://api.spotify.com/v1/artists/{found['id']}/albums"
+    catalog = {}
+    for page in range(SPOTIFY_ARTIST_CATALOG_MAX_PAGES):
+        data = await _get_spotify_json(
+            session,
+            url,
+            {
+                "include_groups": "album,single,compilation",
+                "limit": _CATALOG_PAGE_SIZE,
+                "offset": page * _CATALOG_PAGE_SIZE,
+            },
+            token,
+            f"Spotify albums of '{artist}' (page {page + 1})",
+        )
+        if data is None:
+            break
+        for album in data.get("items") or []:
+            if album and album.get("id"):
+                _, album_norm = normalize_name(found["name"], album.get("name", ""))
+                # Editions normalize to one title; keep the first listed.
+                catalog.setdefault(album_norm, album)
+        if not data.get("next"):
+            break
+    return catalog
+
+
+async def search_for_spotify_album_id(session, artist, album, token, semaphore=None):
+    """Search Spotify for a single album and return its Spotify ID, or None."""
+    hit = await search_for_spotify_album(session, artist, album, token, semaphore)
+    return hit["id"] if hit else None
+
+
+def _album_image_url(album):
+    """Return the largest image URL of a Spotify album object, or None."""
+    images = album.get("images")
+    return images[0].get("url") if images else None
+
+
+def _album_track_durations(album):
+    """Map normalized track names to seconds for a full Spotify album object."""
+    return {
+        normalize_track_name(t.get("name", "")): t.get("duration_ms", 0) // 1000
+        for t in album.get("tracks", {}).get("items", [])
+    }
+
+
 async def fetch_spotify_album_details_batch(
     session, album_ids, token, semaphore=None, retries=SPOTIFY_BATCH_RETRIES
 ):
     """
     Fetches full album details for a list of up to 50 Spotify album IDs
-    in a single API call.
+    in a single API call.  In-flight batches are capped by *semaphore*,
+    defaulting to the shared adaptive batch limit.  IDs already being
+    fetched by another job are awaited from that request and left out of
+    this one.
     """
     if not album_ids:
         return {}
 
+    async def fetch(owned):
+        return await _fetch_album_details(session, owned, token, semaphore, retries)
+
+    details = await _DETAIL_FLIGHTS.do_many(album_ids, fetch)
+    return {album_id: album for album_id, album in details.items() if album}
+
+
+async def _fetch_album_details(session, album_ids, token, semaphore, retries):
+    """Send one album-details request (with retries) for *album_ids*."""
     url = "https://api.spotify.com/v1/albums"
     headers = {"Authorization": f"Bearer {token}"}
     # Spotify API takes a comma-separated string of IDs
     params = {"ids": ",".join(album_ids)}
     limiter = get_spotify_limiter()
+    concurrency = get_spotify_batch_concurrency()
+    if semaphore is None:
+        semaphore = concurrency
 
     async def fetch_once():
         async with limiter:
@@ -122,6 +379,8 @@ async def fetch_spotify_album_details_batch(
                     )
                 if response.status == 429:
                     retry_after = int(response.headers.get("Retry-After", "1"))
+                    concurrency.note_throttled()
+                    limiter.back_off(retry_after)
                     logging.warning(
                         f"⚠️ Batch fetch 429 hit. Retrying after {retry_after}s."
                     )
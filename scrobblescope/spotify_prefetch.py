@@ -0,0 +1,165 @@
+"""Spotify enrichment that overlaps the Last.fm fetch.
+
+The album pipeline used to start its ``spotify_cache`` lookup and Spotify
+searches only after the last Last.fm page had been folded into the counters.
+During a scan an album's play count and distinct-track count only ever grow,
+so an album whose running counts already reach ``min_plays`` and
+``min_tracks`` is certain to pass the final filter.  ``SpotifyPrefetch``
+takes such albums the moment the accumulator sees them cross both thresholds
+and runs their DB lookup and Spotify search while later pages are still
+downloading.
+
+``finish`` waits for the work already started; ``process_albums`` then looks
+up and searches only the albums the prefetch did not cover.  A step that
+failed here is simply redone there, so prefetching changes when requests are
+made, not what the job returns.
+
+Dependency chain (leaf-ward):
+    spotify_prefetch <- cache, spotify, utils
+"""
+
+import asyncio
+import logging
+
+from scrobblescope.cache import (
+    _batch_lookup_metadata,
+    _batch_lookup_no_match,
+    _get_db_connection,
+    _lookup_hot_metadata,
+)
+from scrobblescope.spotify import fetch_spotify_access_token, search_for_spotify_album
+from scrobblescope.utils import create_optimized_session
+
+
+class SpotifyPrefetch:
+    """Background DB lookup and Spotify search for albums known to qualify.
+
+    ``add(key)`` is synchronous and cheap so the accumulator can call it from
+    its inner loop.  One worker task drains whatever keys queued up since its
+    last round, looks them up in a single query and starts a search for each
+    miss; searches are bounded by the shared adaptive search limit like any
+    other.  *search_limit* caps how many albums are searched (None for no
+    cap); lookups cost no API calls and are never capped.
+
+    Once finished, ``cached`` maps keys to their cached metadata rows,
+    ``no_match`` holds keys found in the negative cache (never searched),
+    ``looked_up`` holds every key whose DB lookup ran, and ``search_hits``
+    maps searched keys to their hit (``{}`` when nothing matched).  Failed
+    searches are left out so process_albums searches them again.
+    """
+
+    def __init__(self, search_limit=None):
+        self.search_limit = search_limit
+        self.taken = 0
+        self.cached = {}
+        self.no_match = set()
+        self.looked_up = set()
+        self.search_hits = {}
+        self._pending = []
+        self._wake = asyncio.Event()
+        self._closed = False
+        self._token_failed = False
+        self._searches: list[asyncio.Task] = []
+        self._worker = asyncio.ensure_future(self._run())
+
+    def add(self, key):
+        """Queue *key* (a normalized album key) unless closed."""
+        if self._closed:
+            return
+        self.taken += 1
+        self._pending.append(key)
+        self._wake.set()
+
+    async def _lookup(self, conn, keys):
+        """Look *keys* up in ``spotify_cache``; return the ones to search.
+
+        The in-memory hot tier answers first.  A failed DB lookup returns
+        nothing to search: ``process_albums`` looks those keys up again and
+        searches whatever is really missing.
+        """
+        hot = _lookup_hot_metadata(keys)
+        self.cached.update(hot)
+        self.looked_up.update(hot)
+        keys = [key for key in keys if key not in hot]
+        if conn is None or not keys:
+            return keys
+        try:
+            found = await _batch_lookup_metadata(conn, keys)
+            misses = [key for key in keys if key not in found]
+            no_match = await _batch_lookup_no_match(conn, misses)
+        except Exception as exc:
+            logging.warning(f"Prefetch DB lookup failed: {exc}")
+            return []
+        self.cached.update(found)
+        self.no_match |= no_match
+        self.looked_up.update(keys)
+        return [key for key in misses if key not in no_match]
+
+    async def _search(self, session, key, token):
+        artist, album = key
+        hit = await search_for_spotify_album(session, artist, album, token)
+        # None is a failed search, not "no match": leave it to process_albums.
+        if hit is not None:
+            self.search_hits[key] = hit
+
+    async def _start_searches(self, session, keys):
+        if self.search_limit is not None:
+            keys = keys[: max(0, self.search_limit - len(self._searches))]
+        if self._token_failed or not keys:
+            return
+        token = await fetch_spotify_access_token()
+        if not token:
+            self._token_failed = True
+            return
+        self._searches.extend(
+            asyncio.ensure_future(self._search(session, key, token)) for key in keys
+        )
+
+    async def _run(self):
+        conn = await _get_db_connection()
+        try:
+            async with create_optimized_session() as session:
+                while True:
+                    await self._wake.wait()
+                    self._wake.clear()
+                    keys, self._pending = self._pending, []
+                    misses = await self._lookup(conn, keys) if keys else []
+                    if misses:
+                        await self._start_searches(session, misses)
+                    if self._closed and not self._pending:
+                        break
+                await asyncio.gather(*self._searches)
+        finally:
+            for task in self._searches:
+                task.cancel()
+            if conn is not None:
+                await conn.close()
+
+    async def finish(self):
+        """Stop taking albums and wait for every started lookup and search.
+
+        Returns self.  A worker failure is logged, not raised: whatever
+        completed before it is still valid.
+        """
+        self._closed = True
+        self._wake.set()
+        try:
+            await self._worker
+        except Exception as exc:
+            logging.warning(f"Spotify prefetch failed (non-fatal): {exc}")
+        logging.info(
+            f"Spotify prefetch: {self.taken} albums taken, "
+            f"{len(self.cached)} DB hits, {len(self.search_hits)} searched"
+        )
+        return self
+
+    async def aclose(self):
+        """Cancel whatever is still running; a no-op after ``finish``."""
+        self._closed = True
+        if self._worker.done():
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except (asyncio.CancelledError, Exception):
+            pass
@@ -1,23 +1,45 @@
 import asyncio
+import contextvars
+import json
 import logging
 import math
+import sys
 import threading
 import time
 import traceback
+import zlib
+from collections import OrderedDict, deque
 from weakref import WeakKeyDictionary
 
 import aiohttp
 from aiolimiter import AsyncLimiter
 
+from scrobblescope.concurrency import AdaptiveConcurrencyLimit
 from scrobblescope.config import (
+    LASTFM_AVERAGE_REQUESTS_PER_SECOND,
+    LASTFM_CONCURRENCY_CEILING,
+    LASTFM_RATE_WINDOW_SECONDS,
     LASTFM_REQUESTS_PER_SECOND,
+    MAX_CONCURRENT_LASTFM,
+    REQUEST_CACHE_MAX_MB,
     REQUEST_CACHE_TIMEOUT,
+    SPOTIFY_BATCH_CONCURRENCY,
+    SPOTIFY_BATCH_CONCURRENCY_CEILING,
+    SPOTIFY_RATE_WINDOW_SECONDS,
     SPOTIFY_REQUESTS_PER_SECOND,
+    SPOTIFY_SEARCH_CONCURRENCY,
+    SPOTIFY_SEARCH_CONCURRENCY_CEILING,
 )
+from scrobblescope.lru import LRUCache
 
 # Global state tracking
-REQUEST_CACHE = {}  # Cache for API responses
-_cache_lock = threading.Lock()  # Guards all REQUEST_CACHE read/write/cleanup ops
+# Cache for API responses: thread-safe, TTL-expired and LRU-evicted once its
+# approximate size passes REQUEST_CACHE_MAX_MB.
+REQUEST_CACHE = LRUCache(REQUEST_CACHE_MAX_MB * 1024 * 1024, REQUEST_CACHE_TIMEOUT)
+
+# Job id of the background job issuing requests, bound once per job thread so
+# the global throttles can queue each job's requests separately.
+_CURRENT_JOB_ID = contextvars.ContextVar("current_job_id", default=None)
 
 # Rate limiters are scoped per running event loop.
 # AsyncLimiter instances cannot be safely reused across loops.
@@ -26,60 +48,307 @@ _SPOTIFY_LIMITERS = WeakKeyDictionary()
 _LIMITER_LOCK = threading.Lock()
 
 
+class _MinIntervalPolicy:
+    """Rate policy: consecutive slots at least ``period / max_rate`` apart."""
+
+    def __init__(self, max_rate, period=1.0):
+        self._min_interval = period / max_rate
+        self._next_allowed = 0.0
+
+    def delay(self, now):
+        return max(0.0, self._next_allowed - now)
+
+    def consume(self, now):
+        self._next_allowed = now + self._min_interval
+        return now
+
+    def refund(self, token):
+        """Strict spacing has nothing to give back once time has passed."""
+
+
+class _SlidingWindowPolicy:
+    """Rate policy: an averaged budget over a sliding window, plus a burst cap.
+
+    At most ``avg_rate * window`` slots are granted in any ``window``
+    seconds, and at most ``burst_rate`` in any one second.  A job with a few
+    pages can therefore use them at the burst rate while the long-run rate
+    stays at the average -- how Last.fm states its limit ("5 requests per
+    second, averaged over a 5 minute period").  Refunded slots leave both
+    windows, so a cancelled request costs nothing.
+    """
+
+    def __init__(self, avg_rate, window, burst_rate):
+        self._window = window
+        self._window_budget = max(1, int(avg_rate * window))
+        self._burst = max(1, int(burst_rate))
+        self._grants = deque()  # grant times within the long window
+        self._recent = deque()  # grant times within the last second
+
+    def _prune(self, now):
+        while self._grants and self._grants[0] <= now - self._window:
+            self._grants.popleft()
+        while self._recent and self._recent[0] <= now - 1.0:
+            self._recent.popleft()
+
+    def delay(self, now):
+        self._prune(now)
+        wait = 0.0
+        if len(self._grants) >= self._window_budget:
+            wait = self._grants[0] + self._window - now
+        if len(self._recent) >= self._burst:
+            wait = max(wait, self._recent[0] + 1.0 - now)
+        return max(0.0, wait)
+
+    def consume(self, now):
+        self._grants.append(now)
+        self._recent.append(now)
+        return now
+
+    def refund(self, token):
+        for window in (self._grants, self._recent):
+            try:
+                window.remove(token)
+            except ValueError:
+                pass  # already slid out of this window
+
+
 class _GlobalThrottle:
-    """Thread-safe throttle enforcing a global rate limit across all event loops.
+    """Thread-safe throttle enforcing a global, per-job fair rate limit.
 
     Each background job creates its own asyncio event loop, which means
     per-loop AsyncLimiter instances are independent. This throttle sits
     above them to cap aggregate throughput from all concurrent jobs within
     the configured API rate.
-    """
 
-    def __init__(self, max_rate, period=1.0):
-        self._lock = threading.Lock()
-        self._min_interval = period / max_rate
-        self._next_allowed = 0.0
-
-    def next_wait(self):
-        """Return seconds to wait before the next call is allowed.
+    Slots are handed out as the rate *policy* allows (default: a strict
+    ``period / max_rate`` minimum interval), round-robin across per-job
+    queues (requests are tagged with the job id bound by
+    ``tag_requests_with_job``), so a 3-page job waits behind at most one
+    request per other active job instead of behind a 150-page job's whole
+    backlog.  A daemon dispatcher thread serves the queues and wakes each
+    waiter on its own loop.  Waiters cancelled before they are served never
+    take a slot, and a slot granted to a request that then does not go out
+    can be handed back with ``refund``.
+
+    ``back_off`` is the shared back-off gate: after a 429 it pauses every
+    request through the throttle, from every job, until the advertised
+    Retry-After instead of letting the other requests collect 429s of their
+    own.  Once the pause ends, grants are spaced at least
+    ``resume_interval`` apart for as long as the pause lasted (at most
+    ``_RESUME_RAMP_MAX_SECONDS``) so the queued backlog does not go out as
+    one burst.  Paused time is counted in ``stats()``.
+    """
 
-        Thread-safe. Advances the internal clock so concurrent callers
-        are serialized at the configured rate.
+    _RESUME_RAMP_MAX_SECONDS = 5.0
+
+    def __init__(
+        self, max_rate=None, period=1.0, policy=None, name="API", resume_interval=0.0
+    ):
+        self.name = name
+        self._cond = threading.Condition()
+        self._policy = policy or _MinIntervalPolicy(max_rate, period)
+        self._queues = OrderedDict()  # job key -> deque of waiter futures
+        self._dispatcher = None
+        self._resume_interval = resume_interval
+        self._paused_until = 0.0
+        self._resume_until = 0.0
+        self._last_grant = 0.0
+        self._pauses = 0
+        self._penalty_seconds = 0.0
+
+    def queued_jobs(self):
+        """Return ``{job_key: waiting_requests}`` for logging and tests."""
+        with self._cond:
+            return {key: len(queue) for key, queue in self._queues.items()}
+
+    def stats(self):
+        """Return back-off counters: pauses, total paused seconds, time left."""
+        with self._cond:
+            return {
+                "pauses": self._pauses,
+                "penalty_seconds": round(self._penalty_seconds, 3),
+                "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 3),
+            }
+
+    def back_off(self, seconds):
+        """Pause every request through this throttle for *seconds*.
+
+        Called with a 429's Retry-After.  Overlapping pauses merge: only the
+        part that extends the current pause adds penalty time.
+        """
+        with self._cond:
+            now = time.monotonic()
+            until = now + seconds
+            if until <= self._paused_until:
+                return
+            if self._paused_until <= now:
+                self._pauses += 1
+                logging.warning(
+                    f"{self.name} back-off: pausing all requests for {seconds:.1f}s"
+                )
+            self._penalty_seconds += until - max(now, self._paused_until)
+            self._paused_until = until
+            self._resume_until = until + min(seconds, self._RESUME_RAMP_MAX_SECONDS)
+            self._cond.notify()
+
+    def _delay_locked(self, now):
+        """Seconds until the next slot: rate policy, back-off and ramp-up."""
+        wait = max(self._policy.delay(now), self._paused_until - now)
+        if now < self._resume_until:
+            wait = max(wait, self._last_grant + self._resume_interval - now)
+        return max(0.0, wait)
+
+    def _consume_locked(self, now):
+        self._last_grant = now
+        return self._policy.consume(now)
+
+    async def acquire(self, job_key=None):
+        """Wait for this job's turn at the next free slot; return its token.
+
+        Returns immediately when nothing is queued and the rate allows it.
         """
-        with self._lock:
-            now = time.time()
-            if now >= self._next_allowed:
-                self._next_allowed = now + self._min_interval
-                return 0.0
-            wait = self._next_allowed - now
-            self._next_allowed += self._min_interval
-            return wait
+        with self._cond:
+            now = time.monotonic()
+            if not self._queues and self._delay_locked(now) == 0:
+                return self._consume_locked(now)
+            fut = asyncio.get_running_loop().create_future()
+            self._queues.setdefault(job_key, deque()).append(fut)
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(
+                    target=self._dispatch_forever, daemon=True
+                )
+                self._dispatcher.start()
+            self._cond.notify()
+        try:
+            return await fut
+        except asyncio.CancelledError:
+            # Served just before the cancellation landed: give the slot back.
+            if fut.done() and not fut.cancelled():
+                self.refund(fut.result())
+            raise
+
+    def refund(self, token):
+        """Return a granted slot that was never used for a request."""
+        with self._cond:
+            self._policy.refund(token)
+            self._cond.notify()
+
+    def _resolve(self, fut, token):
+        """Runs on the waiter's loop; refunds the slot if the waiter left."""
+        if fut.done():
+            self.refund(token)
+        else:
+            fut.set_result(token)
+
+    def _next_waiter_locked(self):
+        """Pop the next live waiter round-robin, or return None."""
+        while self._queues:
+            job_key, queue = next(iter(self._queues.items()))
+            fut = queue.popleft()
+            if queue:
+                self._queues.move_to_end(job_key)
+            else:
+                del self._queues[job_key]
+            if not fut.cancelled():
+                return fut
+        return None
+
+    def _dispatch_forever(self):
+        with self._cond:
+            while True:
+                if not self._queues:
+                    self._cond.wait()
+                    continue
+                wait = self._delay_locked(time.monotonic())
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                fut = self._next_waiter_locked()
+                if fut is None:
+                    continue
+                token = self._consume_locked(time.monotonic())
+                try:
+                    fut.get_loop().call_soon_threadsafe(self._resolve, fut, token)
+                except RuntimeError:
+                    # The waiter's event loop is already closed.
+                    self._policy.refund(token)
+
+
+# Token of the global-throttle slot held by the current task's request.
+_THROTTLE_TOKEN = contextvars.ContextVar("throttle_token", default=None)
 
 
 class _ThrottledLimiter:
     """Async context manager combining a global throttle with a per-loop limiter.
 
     The global throttle enforces the aggregate rate across all threads, then
-    the per-loop AsyncLimiter handles intra-loop concurrency as before.
+    the per-loop AsyncLimiter handles intra-loop concurrency as before.  A
+    slot is refunded when the request never reaches the upstream: the task
+    is cancelled while waiting on the per-loop limiter, or the connection
+    cannot be established.
     """
 
     def __init__(self, throttle, limiter):
         self._throttle = throttle
         self._limiter = limiter
 
+    def back_off(self, seconds):
+        """Pause this API's requests from every job (see ``_GlobalThrottle``)."""
+        self._throttle.back_off(seconds)
+
     async def __aenter__(self):
-        wait = self._throttle.next_wait()
-        if wait > 0:
-            await asyncio.sleep(wait)
-        await self._limiter.__aenter__()
+        token = await self._throttle.acquire(_CURRENT_JOB_ID.get())
+        try:
+            await self._limiter.__aenter__()
+        except asyncio.CancelledError:
+            self._throttle.refund(token)
+            raise
+        _THROTTLE_TOKEN.set(token)
         return self
 
-    async def __aexit__(self, *args):
-        await self._limiter.__aexit__(*args)
+    async def __aexit__(self, exc_type, exc, tb):
+        token = _THROTTLE_TOKEN.get()
+        _THROTTLE_TOKEN.set(None)
+        if exc_type is not None and issubclass(exc_type, aiohttp.ClientConnectorError):
+            self._throttle.refund(token)
+        await self._limiter.__aexit__(exc_type, exc, tb)
+
+
+_LASTFM_THROTTLE = _GlobalThrottle(
+    policy=_SlidingWindowPolicy(
+        LASTFM_AVERAGE_REQUESTS_PER_SECOND,
+        LASTFM_RATE_WINDOW_SECONDS,
+        LASTFM_REQUESTS_PER_SECOND,
+    ),
+    name="Last.fm",
+    resume_interval=1.0 / LASTFM_AVERAGE_REQUESTS_PER_SECOND,
+)
+_SPOTIFY_THROTTLE = _GlobalThrottle(
+    policy=_SlidingWindowPolicy(
+        SPOTIFY_REQUESTS_PER_SECOND,
+        SPOTIFY_RATE_WINDOW_SECONDS,
+        SPOTIFY_REQUESTS_PER_SECOND,
+    ),
+    name="Spotify",
+    resume_interval=1.0 / SPOTIFY_REQUESTS_PER_SECOND,
+)
 
 
-_LASTFM_THROTTLE = _GlobalThrottle(LASTFM_REQUESTS_PER_SECOND)
-_SPOTIFY_THROTTLE = _GlobalThrottle(SPOTIFY_REQUESTS_PER_SECOND)
+# Process-wide adaptive in-flight limits, one per upstream call type. Unlike
+# AsyncLimiter they are loop-agnostic, so every job shares the same limit.
+_LASTFM_CONCURRENCY = AdaptiveConcurrencyLimit(
+    "Last.fm", MAX_CONCURRENT_LASTFM, maximum=LASTFM_CONCURRENCY_CEILING
+)
+_SPOTIFY_SEARCH_CONCURRENCY = AdaptiveConcurrencyLimit(
+    "Spotify search",
+    SPOTIFY_SEARCH_CONCURRENCY,
+    maximum=SPOTIFY_SEARCH_CONCURRENCY_CEILING,
+)
+_SPOTIFY_BATCH_CONCURRENCY = AdaptiveConcurrencyLimit(
+    "Spotify batch",
+    SPOTIFY_BATCH_CONCURRENCY,
+    maximum=SPOTIFY_BATCH_CONCURRENCY_CEILING,
+)
 
 
 def _get_loop_limiter(cache, rate, period):
@@ -93,11 +362,23 @@ def _get_loop_limiter(cache, rate, period):
     return limiter
 
 
+def tag_requests_with_job(job_id):
+    """Bind *job_id* to API requests issued from the current context.
+
+    Call in the job thread before starting its event loop: tasks copy the
+    context at creation, so every request of the job inherits the tag and
+    gets its own fair-queuing lane in the global throttles.
+    """
+    _CURRENT_JOB_ID.set(job_id)
+
+
 def get_lastfm_limiter():
     """Return a throttled rate limiter for Last.fm API calls.
 
     Official limit: 5 requests/second per IP (averaged over 5 minutes).
-    Runtime value comes from LASTFM_REQUESTS_PER_SECOND.
+    Runtime values: LASTFM_AVERAGE_REQUESTS_PER_SECOND over a sliding
+    LASTFM_RATE_WINDOW_SECONDS window, bursting up to
+    LASTFM_REQUESTS_PER_SECOND.
     Source: https://www.last.fm/api/tos
 
     Returns a _ThrottledLimiter that enforces a global cross-thread rate
@@ -111,7 +392,8 @@ def get_spotify_limiter():
     """Return a throttled rate limiter for Spotify API calls.
 
     Official limit: Undisclosed, based on 30-second rolling window.
-    Runtime value comes from SPOTIFY_REQUESTS_PER_SECOND.
+    Runtime value: SPOTIFY_REQUESTS_PER_SECOND, averaged over a sliding
+    SPOTIFY_RATE_WINDOW_SECONDS window.
     Source: https://developer.spotify.com/documentation/web-api/concepts/rate-limits
 
     Returns a _ThrottledLimiter that enforces a global cross-thread rate
@@ -121,6 +403,21 @@ def get_spotify_limiter():
     return _ThrottledLimiter(_SPOTIFY_THROTTLE, loop_limiter)
 
 
+def get_lastfm_concurrency():
+    """Return the shared adaptive in-flight limit for Last.fm page fetches."""
+    return _LASTFM_CONCURRENCY
+
+
+def get_spotify_search_concurrency():
+    """Return the shared adaptive in-flight limit for Spotify album searches."""
+    return _SPOTIFY_SEARCH_CONCURRENCY
+
+
+def get_spotify_batch_concurrency():
+    """Return the shared adaptive in-flight limit for Spotify batch details."""
+    return _SPOTIFY_BATCH_CONCURRENCY
+
+
 def run_async_in_thread(coro):
     """Run an async coroutine synchronously in a short-lived thread.
 
@@ -197,49 +494,106 @@ def get_cache_key(url, params=None):
     return key
 
 
+class _CompressedPayload:
+    """zlib-compressed JSON of a cached response, decoded on each hit."""
+
+    __slots__ = ("blob",)
+
+    def __init__(self, blob):
+        self.blob = blob
+
+
+def _compress_payload(data):
+    """Encode *data* as compact JSON and zlib-compress it (fast level)."""
+    raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return _CompressedPayload(zlib.compress(raw, 1))
+
+
+def _decompress_payload(payload):
+    """Inverse of ``_compress_payload``; returns a fresh object."""
+    return json.loads(zlib.decompress(payload.blob))
+
+
 def get_cached_response(url, params=None):
     """Get cached response if available and not expired.
 
-    Returns a direct reference to the cached object — callers must not mutate it.
+    Returns a direct reference to the cached object — callers must not mutate
+    it — except for compressed entries, which decode to a fresh copy.
+    """
+    key = get_cache_key(url, params)
+    data = REQUEST_CACHE.get(key)
+    if data is None:
+        return None
+    logging.debug(f"Cache hit for {key}")
+    if isinstance(data, _CompressedPayload):
+        return _decompress_payload(data)
+    return data
+
+
+def set_cached_response(url, data, params=None, compress=False, ttl=None):
+    """Cache a response with current timestamp.
+
+    With *compress*, the response is stored as zlib-compressed JSON and only
+    decoded on a hit.  Worth it for large, repetitive payloads such as
+    Last.fm recent-track pages, whose decoded dicts are roughly ten times
+    their wire size.  *ttl* overrides REQUEST_CACHE_TIMEOUT for responses
+    known to be immutable.  Least recently used entries are evicted once
+    REQUEST_CACHE is over its memory budget.
     """
     key = get_cache_key(url, params)
-    with _cache_lock:
-        if key in REQUEST_CACHE:
-            timestamp, data = REQUEST_CACHE[key]
-            if time.time() - timestamp < REQUEST_CACHE_TIMEOUT:
-                logging.debug(f"Cache hit for {key}")
-                return data
-    return None
+    if compress:
+        payload = _compress_payload(data)
+        stored = REQUEST_CACHE.set(
+            key,
+            payload,
+            size=sys.getsizeof(payload) + sys.getsizeof(payload.blob),
+            ttl=ttl,
+        )
+    else:
+        stored = REQUEST_CACHE.set(key, data, ttl=ttl)
+    if not stored:
+        logging.debug(f"Response for {key} exceeds the cache budget; not cached")
 
 
-def set_cached_response(url, data, params=None):
-    """Cache a response with current timestamp"""
-    key = get_cache_key(url, params)
-    with _cache_lock:
-        REQUEST_CACHE[key] = (time.time(), data)
+def get_request_cache_stats():
+    """Return REQUEST_CACHE size and hit/miss/eviction counters."""
+    return REQUEST_CACHE.stats()
+
+
+def get_throttle_stats():
+    """Return the global throttles' back-off counters, keyed by API."""
+    return {
+        "lastfm": _LASTFM_THROTTLE.stats(),
+        "spotify": _SPOTIFY_THROTTLE.stats(),
+    }
 
 
 def cleanup_expired_cache():
     """
-    Remove expired entries from REQUEST_CACHE to prevent memory leaks.
+    Remove expired entries from REQUEST_CACHE.
 
-    Called at the start of each background task to maintain bounded memory.
-    This is critical for production deployment on Fly.io to avoid OOM errors.
+    Called at the start of each background task.  Memory is bounded by the
+    LRU budget regardless; this just returns expired entries' bytes early
+    and logs the cache counters, plus the APIs' back-off penalty so far.
     """
-    current_time = time.time()
-    with _cache_lock:
-        expired_keys = [
-            key
-            for key, (timestamp, _) in REQUEST_CACHE.items()
-            if current_time - timestamp >= REQUEST_CACHE_TIMEOUT
-        ]
-        for key in expired_keys:
-            REQUEST_CACHE.pop(key, None)
-        cache_count = len(REQUEST_CACHE)
-
-    if expired_keys:
-        logging.info(f"Cleaned up {len(expired_keys)} expired cache entries")
-    logging.debug(f"Cache status: {cache_count} entries")
+    expired_count = REQUEST_CACHE.purge_expired()
+    stats = REQUEST_CACHE.stats()
+
+    if expired_count:
+        logging.info(f"Cleaned up {expired_count} expired cache entries")
+    logging.info(
+        f"Request cache: {stats['entries']} entries, "
+        f"{stats['bytes'] / (1024 * 1024):.1f}/"
+        f"{stats['max_bytes'] / (1024 * 1024):.0f} MB, "
+        f"{stats['hits']} hits, {stats['misses']} misses, "
+        f"{stats['evictions']} evictions"
+    )
+    for api, backoff in get_throttle_stats().items():
+        if backoff["pauses"]:
+            logging.info(
+                f"{api} back-off: {backoff['pauses']} pauses, "
+                f"{backoff['penalty_seconds']:.1f}s penalty"
+            )
 
 
 def format_seconds(seconds):
@@ -0,0 +1,290 @@
+"""Write-behind persistence of new Spotify metadata and no-match answers.
+
+``process_albums`` used to upsert what it learnt from Spotify before
+building its results, so a slow or waking Postgres delayed the user's
+results although only future jobs benefit from the rows.  Jobs now hand
+the rows to ``queue_metadata_rows``/``queue_no_match`` and carry on; the
+rows go to the hot tier at once, so the next job already sees them.
+
+A persister on the service loop upserts the queued rows every
+``WRITE_BEHIND_FLUSH_SECONDS``, ``WRITE_BEHIND_BATCH_SIZE`` per statement.
+Rows queued for the same album by several jobs in the meantime are
+coalesced into one.  A failed flush puts its rows back and the persister
+retries with exponential backoff; at most ``WRITE_BEHIND_MAX_PENDING``
+albums wait, further ones are dropped (they are only cache).  Rows of a
+batch Postgres rejected for its data are retried one per statement, and a
+row (or no-match batch) rejected ``_MAX_FLUSH_ATTEMPTS`` times is dropped
+and logged, so one bad row cannot keep the queue failing forever.  Outages
+(lost connections, a restarting server) never count against a row.
+Without a configured DB only the hot tier is filled.  What is still queued
+when the process exits is flushed by an ``atexit`` hook.
+
+Dependency chain (leaf-ward):
+    write_behind <- cache, service_loop
+"""
+
+import asyncio
+import atexit
+import logging
+import threading
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+from scrobblescope.cache import (
+    _batch_persist_metadata,
+    _batch_persist_no_match,
+    _db_configured,
+    _get_db_connection,
+    _remember_persisted_metadata,
+)
+from scrobblescope.config import (
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_FLUSH_SECONDS,
+    WRITE_BEHIND_MAX_PENDING,
+)
+from scrobblescope.service_loop import get_service_loop, submit
+
+# Longest wait between two flush attempts while the DB keeps failing.
+_MAX_RETRY_DELAY_SECONDS = 60
+# How long the exit hook waits for the final flush.
+_SHUTDOWN_FLUSH_TIMEOUT_SECONDS = 10
+# Upserts rejected for their data after which a row (or the queued no-match
+# keys) is dropped.
+_MAX_FLUSH_ATTEMPTS = 3
+# Postgres error classes that say nothing about the rows: connection loss,
+# shutdown/cancel (57), resources (53), system (58), deadlock/serialization
+# (40).  Rows failing with these are retried without limit.
+_TRANSIENT_DB_ERRORS = (
+    (
+        asyncpg.PostgresConnectionError,
+        asyncpg.exceptions.OperatorInterventionError,
+        asyncpg.exceptions.InsufficientResourcesError,
+        asyncpg.exceptions.PostgresSystemError,
+        asyncpg.exceptions.TransactionRollbackError,
+    )
+    if asyncpg is not None
+    else ()
+)
+
+_LOCK = threading.Lock()
+_pending_metadata: dict = {}
+_pending_no_match: set = set()
+_dropped = 0
+# Failed upserts so far, per album key and for the no-match keys (None).
+_attempts: dict = {}
+_persister = None
+_exit_hook_registered = False
+# Serializes flushes on the service loop (created there on first use).
+_flush_lock = None
+
+
+def queue_metadata_rows(rows):
+    """Queue rows shaped for ``_batch_persist_metadata``; returns at once.
+
+    A row whose track_durations is None keeps durations already queued for
+    the same album (same spotify_id), as the upsert keeps stored ones.
+    """
+    global _dropped
+    if not rows:
+        return
+    _remember_persisted_metadata(rows)
+    if not _db_configured():
+        return
+    with _LOCK:
+        for row in rows:
+            key = (row[0], row[1])
+            queued = _pending_metadata.get(key)
+            if queued is None and len(_pending_metadata) >= WRITE_BEHIND_MAX_PENDING:
+                _dropped += 1
+                continue
+            if _keeps_durations(row, queued):
+                row = row[:5] + (queued[5],)
+            _pending_metadata[key] = row
+        _ensure_persister()
+
+
+def _keeps_durations(row, older):
+    """True when lite *row* should take *older*'s durations for its album."""
+    return (
+        row[5] is None
+        and older is not None
+        and older[5] is not None
+        and older[2] == row[2]
+    )
+
+
+def queue_no_match(keys):
+    """Queue (artist_norm, album_norm) keys for ``_batch_persist_no_match``."""
+    if not keys or not _db_configured():
+        return
+    with _LOCK:
+        _pending_no_match.update(keys)
+        _ensure_persister()
+
+
+def _ensure_persister():
+    """Start the persister and the exit hook once (call with _LOCK held)."""
+    global _persister, _exit_hook_registered
+    if _persister is None or _persister.done():
+        _persister = submit(_persist_forever())
+    if not _exit_hook_registered:
+        atexit.register(flush_on_exit)
+        _exit_hook_registered = True
+
+
+def _take_pending():
+    global _pending_metadata, _pending_no_match, _dropped
+    with _LOCK:
+        rows, _pending_metadata = list(_pending_metadata.values()), {}
+        keys, _pending_no_match = _pending_no_match, set()
+        dropped, _dropped = _dropped, 0
+    if dropped:
+        logging.warning(
+            f"Write-behind queue full: {dropped} metadata rows dropped "
+            f"(WRITE_BEHIND_MAX_PENDING={WRITE_BEHIND_MAX_PENDING})"
+        )
+    return rows, keys
+
+
+def _requeue(rows, keys):
+    """Put back rows a failed flush did not write, under newer queued ones."""
+    with _LOCK:
+        for row in rows:
+            key = (row[0], row[1])
+            newer = _pending_metadata.get(key)
+            if newer is None:
+                _pending_metadata[key] = row
+            elif _keeps_durations(newer, row):
+                _pending_metadata[key] = newer[:5] + (row[5],)
+        _pending_no_match.update(keys)
+
+
+def _is_data_error(exc):
+    """True when Postgres rejected the statement for its data.
+
+    A retry would fail the same way.  Anything else -- a lost connection, a
+    restarting server, a timeout -- says nothing about the rows.
+    """
+    return (
+        asyncpg is not None
+        and isinstance(exc, asyncpg.PostgresError)
+        and not isinstance(exc, _TRANSIENT_DB_ERRORS)
+    )
+
+
+def _charge_failure(keys):
+    """Count a failed upsert against *keys*; return those now given up on."""
+    given_up = []
+    with _LOCK:
+        for key in keys:
+            _attempts[key] = _attempts.get(key, 0) + 1
+            if _attempts[key] >= _MAX_FLUSH_ATTEMPTS:
+                del _attempts[key]
+                given_up.append(key)
+    return given_up
+
+
+def _batches(rows):
+    """Split *rows* into upsert batches; rows that failed before go alone."""
+    with _LOCK:
+        retried = [row for row in rows if (row[0], row[1]) in _attempts]
+    fresh = [row for row in rows if (row[0], row[1]) not in _attempts]
+    batches = [[row] for row in retried]
+    for start in range(0, len(fresh), WRITE_BEHIND_BATCH_SIZE):
+        batches.append(fresh[start : start + WRITE_BEHIND_BATCH_SIZE])
+    return batches
+
+
+async def flush_pending():
+    """Upsert everything queued; return the number of metadata rows written.
+
+    Runs on the service loop.  On failure the unwritten rows are queued
+    again and the exception is raised; rows of a batch (or no-match keys)
+    Postgres has rejected for their data ``_MAX_FLUSH_ATTEMPTS`` times are
+    dropped instead.
+    """
+    global _flush_lock
+    if _flush_lock is None:
+        _flush_lock = asyncio.Lock()
+    async with _flush_lock:
+        rows, keys = _take_pending()
+        if not rows and not keys:
+            return 0
+        conn = await _get_db_connection()
+        if conn is None:
+            _requeue(rows, keys)
+            raise RuntimeError("DB cache unavailable")
+        written = set()
+        batch = []
+        try:
+            for batch in _batches(rows):
+                await _batch_persist_metadata(conn, batch)
+                with _LOCK:
+                    for row in batch:
+                        written.add((row[0], row[1]))
+                        _attempts.pop((row[0], row[1]), None)
+            batch = []
+            await _batch_persist_no_match(conn, keys)
+            with _LOCK:
+                _attempts.pop(None, None)
+        except Exception as exc:
+            if not _is_data_error(exc):
+                _requeue([r for r in rows if (r[0], r[1]) not in written], keys)
+                raise
+            # Charge the statement that failed: the batch, or the no-match keys.
+            failed = [(row[0], row[1]) for row in batch] if batch else [None]
+            given_up = set(_charge_failure(failed))
+            if None in given_up:
+                logging.error(
+                    f"Write-behind: dropping {len(keys)} no-match keys after "
+                    f"{_MAX_FLUSH_ATTEMPTS} failed upserts"
+                )
+                keys = set()
+            elif given_up:
+                logging.error(
+                    f"Write-behind: dropping metadata rows {sorted(given_up)} "
+                    f"after {_MAX_FLUSH_ATTEMPTS} failed upserts"
+                )
+            skip = written | given_up
+            _requeue([row for row in rows if (row[0], row[1]) not in skip], keys)
+            raise
+        except BaseException:
+            _requeue([row for row in rows if (row[0], row[1]) not in written], keys)
+            raise
+        finally:
+            await conn.close()
+        logging.info(
+            f"Write-behind: persisted {len(written)} metadata rows and "
+            f"{len(keys)} no-match keys"
+        )
+        return len(written)
+
+
+async def _persist_forever():
+    """Flush every WRITE_BEHIND_FLUSH_SECONDS, backing off while the DB fails."""
+    delay = WRITE_BEHIND_FLUSH_SECONDS
+    while True:
+        await asyncio.sleep(delay)
+        try:
+            await flush_pending()
+            delay = WRITE_BEHIND_FLUSH_SECONDS
+        except Exception as exc:
+            delay = min(max(delay, 1) * 2, _MAX_RETRY_DELAY_SECONDS)
+            logging.warning(
+                f"Write-behind flush failed (retrying in {delay:.0f}s): {exc}"
+            )
+
+
+def flush_on_exit():
+    """Write what is still queued before the process exits (``atexit``)."""
+    with _LOCK:
+        if not _pending_metadata and not _pending_no_match:
+            return
+    future = asyncio.run_coroutine_threadsafe(flush_pending(), get_service_loop())
+    try:
+        future.result(_SHUTDOWN_FLUSH_TIMEOUT_SECONDS)
+    except Exception as exc:
+        logging.warning(f"Write-behind flush at exit failed: {exc}")
@@ -43,6 +43,75 @@ def fresh_job_slots():
     worker._active_jobs_semaphore = original
 
 
+@pytest.fixture(autouse=True)
+def fresh_concurrency_limits(monkeypatch):
+    """Give every test fresh adaptive concurrency limits.
+
+    The limits are process-wide and react to 429s, so a retry test that
+    serves a mocked 429 would otherwise shrink the limit for later tests.
+    """
+    from scrobblescope import config, utils
+    from scrobblescope.concurrency import AdaptiveConcurrencyLimit
+
+    monkeypatch.setattr(
+        utils,
+        "_LASTFM_CONCURRENCY",
+        AdaptiveConcurrencyLimit("Last.fm", config.MAX_CONCURRENT_LASTFM),
+    )
+    monkeypatch.setattr(
+        utils,
+        "_SPOTIFY_SEARCH_CONCURRENCY",
+        AdaptiveConcurrencyLimit("Spotify search", config.SPOTIFY_SEARCH_CONCURRENCY),
+    )
+    monkeypatch.setattr(
+        utils,
+        "_SPOTIFY_BATCH_CONCURRENCY",
+        AdaptiveConcurrencyLimit("Spotify batch", config.SPOTIFY_BATCH_CONCURRENCY),
+    )
+
+
+@pytest.fixture(autouse=True)
+def fresh_metadata_hot_tier(monkeypatch):
+    """Give every test an empty in-memory metadata tier.
+
+    Lookup and persist tests fill the process-wide tier, which would
+    otherwise answer later tests' lookups before their mocked DB does.
+    """
+    from scrobblescope import cache
+    from scrobblescope.lru import LRUCache
+
+    monkeypatch.setattr(
+        cache,
+        "_METADATA_HOT",
+        LRUCache(cache._METADATA_HOT.max_bytes, cache._METADATA_TTL_SECONDS),
+    )
+
+
+@pytest.fixture(autouse=True)
+def no_metadata_refresher(monkeypatch):
+    """Keep album-pipeline tests from reporting hits to the refresh-ahead sweep.
+
+    The hot-key set and its service-loop sweeper are process-wide; tests
+    of metadata_refresh drive them directly.
+    """
+    from scrobblescope import orchestrator
+
+    monkeypatch.setattr(orchestrator, "note_cache_hits", lambda keys: None)
+
+
+@pytest.fixture(autouse=True)
+def no_write_behind(monkeypatch):
+    """Keep album-pipeline tests from queueing rows for the write-behind persister.
+
+    The queue and its service-loop persister are process-wide; tests of
+    write_behind drive them directly.
+    """
+    from scrobblescope import orchestrator
+
+    monkeypatch.setattr(orchestrator, "queue_metadata_rows", lambda rows: None)
+    monkeypatch.setattr(orchestrator, "queue_no_match", lambda keys: None)
+
+
 @pytest.fixture
 def client():
     """Create a test client for the Flask application."""
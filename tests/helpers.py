@@ -1,5 +1,7 @@
 from unittest.mock import AsyncMock
 
+from scrobblescope.scrobbles import ScrobbleBatch
+
 # Standard form data for POST /results_loading tests (year as string, flounder14).
 # Use {**VALID_FORM_DATA, "year": "2015"} to override individual fields.
 VALID_FORM_DATA = {
@@ -26,7 +28,14 @@ TEST_JOB_PARAMS = {
 
 
 class NoopAsyncContext:
-    """A no-op async context manager for patching rate limiters in tests."""
+    """A no-op async context manager for patching rate limiters in tests.
+
+    Records ``back_off`` calls (the limiters' shared 429 gate) in
+    ``back_offs``.
+    """
+
+    def __init__(self):
+        self.back_offs = []
 
     async def __aenter__(self):
         return None
@@ -34,9 +43,33 @@ class NoopAsyncContext:
     async def __aexit__(self, exc_type, exc, tb):
         return False
 
+    def back_off(self, seconds):
+        self.back_offs.append(seconds)
+
 
 def make_response_context(response):
     """Build an async context manager whose __aenter__ returns response."""
     cm = AsyncMock()
     cm.__aenter__.return_value = response
     return cm
+
+
+def streamed_fetch(pages, metadata):
+    """Build a fake scrobble fetch honouring the ``scrobbles_cb`` contract.
+
+    Use as ``AsyncMock(side_effect=streamed_fetch(pages, meta))`` in place of
+    ``fetch_recent_tracks_incremental``: each raw page is appended to a
+    ``ScrobbleBatch`` and the new row range reported to ``scrobbles_cb``,
+    exactly like the real fetch.
+    """
+
+    async def _fetch(username, from_ts, to_ts, progress_cb=None, scrobbles_cb=None):
+        batch = ScrobbleBatch()
+        for page in pages:
+            start = len(batch)
+            batch.extend_page(page)
+            if scrobbles_cb is not None and len(batch) > start:
+                scrobbles_cb(batch, start, len(batch))
+        return batch, metadata
+
+    return _fetch
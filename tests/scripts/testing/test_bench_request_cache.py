@@ -0,0 +1,44 @@
+"""Unit tests for scripts.testing.bench_request_cache.
+
+Runs the benchmark on a tiny synthetic user so the suite stays fast.
+"""
+
+from __future__ import annotations
+
+from scripts.testing.bench_request_cache import (
+    bench_compressed,
+    bench_plain,
+    main,
+    make_pages,
+)
+
+
+def test_make_pages_shapes_like_recenttracks():
+    pages = make_pages(2, 5)
+    assert len(pages) == 2
+    tracks = pages[1]["recenttracks"]["track"]
+    assert len(tracks) == 5
+    assert len(tracks[0]["image"]) == 4
+    assert pages[1]["recenttracks"]["@attr"]["page"] == "2"
+
+
+def test_compressed_pages_take_less_memory_than_plain():
+    """
+    GIVEN a small synthetic user
+    WHEN both encodings are benchmarked
+    THEN the compressed cache is smaller and reports a decode cost.
+    """
+    pages = make_pages(3, 50)
+    plain = bench_plain(pages)
+    compressed = bench_compressed(pages, repeat=1)
+
+    assert compressed.traced_bytes < plain.traced_bytes
+    assert compressed.budget_bytes < plain.budget_bytes
+    assert compressed.decode_ms_per_page > 0
+
+
+def test_main_prints_both_encodings(capsys):
+    assert main(["--pages", "2", "--tracks-per-page", "10", "--repeat", "1"]) == 0
+    out = capsys.readouterr().out
+    assert "plain:" in out
+    assert "compressed:" in out
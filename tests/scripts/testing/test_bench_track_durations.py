@@ -0,0 +1,42 @@
+"""Unit tests for scripts.testing.bench_track_durations.
+
+Runs the benchmark on a small batch so the suite stays fast.
+"""
+
+from __future__ import annotations
+
+from scripts.testing.bench_track_durations import (
+    bench_arrays,
+    bench_jsonb,
+    main,
+    make_albums,
+)
+
+
+def test_make_albums_maps_track_names_to_seconds():
+    albums = make_albums(3, 10)
+    assert len(albums) == 3
+    assert all(albums)
+    assert all(90 <= s <= 480 for d in albums for s in d.values())
+
+
+def test_arrays_are_smaller_than_jsonb():
+    """
+    GIVEN a small synthetic batch
+    WHEN both formats are benchmarked
+    THEN the arrays are estimated smaller and both report a decode cost.
+    """
+    albums = make_albums(20, 12)
+    jsonb = bench_jsonb(albums, repeat=1)
+    arrays = bench_arrays(albums, repeat=1)
+
+    assert arrays.stored_bytes < jsonb.stored_bytes
+    assert jsonb.decode_ms_per_batch > 0
+    assert arrays.decode_ms_per_batch > 0
+
+
+def test_main_prints_both_formats(capsys):
+    assert main(["--albums", "5", "--repeat", "1"]) == 0
+    out = capsys.readouterr().out
+    assert "jsonb:" in out
+    assert "arrays:" in out
@@ -0,0 +1,90 @@
+"""Tests for scrobblescope.cache_janitor -- scheduled stale-row deletion.
+
+Covers:
+- A sweep deletes each table in batches until a short batch, then logs.
+- A worker that finds the advisory lock taken yields the sweep.
+- start_cache_janitor starts one janitor and is a no-op when disabled.
+"""
+
+import logging
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from scrobblescope.cache_janitor import run_cache_janitor, start_cache_janitor
+
+
+@pytest.mark.asyncio
+async def test_sweep_deletes_in_batches_and_logs_reclaimed_rows(caplog):
+    """
+    GIVEN 2 500 stale metadata rows and 10 stale no-match rows, batch size 1 000
+    WHEN a sweep runs
+    THEN metadata is deleted in three batches, no-match in one, with a pause
+    between full batches, and the total is logged.
+    """
+    conn = AsyncMock()
+    delete = AsyncMock(side_effect=[1000, 1000, 500, 10])
+    with (
+        patch(
+            "scrobblescope.cache_janitor._get_db_connection",
+            new=AsyncMock(return_value=conn),
+        ),
+        patch("scrobblescope.cache_janitor._delete_stale_batch", new=delete),
+        patch("scrobblescope.cache_janitor.CACHE_JANITOR_BATCH_SIZE", 1000),
+        patch(
+            "scrobblescope.cache_janitor.asyncio.sleep", new_callable=AsyncMock
+        ) as mock_sleep,
+        caplog.at_level(logging.INFO),
+    ):
+        reclaimed = await run_cache_janitor()
+
+    assert reclaimed == {"spotify_cache": 2500, "spotify_no_match": 10}
+    assert [c[0][1] for c in delete.await_args_list] == [
+        "spotify_cache",
+        "spotify_cache",
+        "spotify_cache",
+        "spotify_no_match",
+    ]
+    assert mock_sleep.await_count == 2
+    assert "Cache janitor reclaimed 2510 rows" in caplog.text
+    conn.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_sweep_yields_when_another_worker_holds_the_lock():
+    conn = AsyncMock()
+    delete = AsyncMock(return_value=None)
+    with (
+        patch(
+            "scrobblescope.cache_janitor._get_db_connection",
+            new=AsyncMock(return_value=conn),
+        ),
+        patch("scrobblescope.cache_janitor._delete_stale_batch", new=delete),
+    ):
+        reclaimed = await run_cache_janitor()
+
+    assert reclaimed == {}
+    delete.assert_awaited_once()
+    conn.close.assert_awaited_once()
+
+
+def test_start_cache_janitor_starts_one_janitor():
+    future = MagicMock()
+    future.done.return_value = False
+
+    def fake_submit(coro):
+        coro.close()
+        return future
+
+    submit = MagicMock(side_effect=fake_submit)
+    with (
+        patch("scrobblescope.cache_janitor.submit", new=submit),
+        patch("scrobblescope.cache_janitor._janitor", None),
+        patch("scrobblescope.cache_janitor._db_configured", return_value=True),
+    ):
+        with patch("scrobblescope.cache_janitor.CACHE_JANITOR_INTERVAL_SECONDS", 0):
+            start_cache_janitor()
+        start_cache_janitor()
+        start_cache_janitor()
+
+    assert submit.call_count == 1
@@ -0,0 +1,342 @@
+"""Tests for scrobblescope.charts -- the weekly-chart ingestion path.
+
+Covers:
+- Week planning: whole weeks inside the range, edge and gap scan windows.
+- Track attribution: certain tracks for a sole album with matching plays,
+  possible tracks otherwise, and min_tracks decisions from the bounds.
+- fetch_albums_from_charts: edge scans merged exactly, fallback (None) on a
+  failed chart week, and the auto probe preferring a scan for light users.
+- Auto mode overhead: when the scan wins it costs one chart-list request on
+  top of the scan (the probe is the scan's first page), and none at all
+  when the scrobble store covers the range.
+"""
+
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from scrobblescope.charts import ChartTally, _plan_chart_weeks, fetch_albums_from_charts
+from scrobblescope.domain import normalize_name
+from scrobblescope.orchestrator import _AlbumAccumulator, fetch_top_albums_async
+from tests.helpers import make_response_context
+
+_WEEK = 7 * 24 * 60 * 60
+
+
+def _recent_page(artist, album, names, ts):
+    """Wrap tracks scrobbled at *ts* in a recenttracks page envelope."""
+    return {
+        "recenttracks": {
+            "track": [
+                {
+                    "artist": {"#text": artist},
+                    "album": {"#text": album},
+                    "name": name,
+                    "date": {"uts": str(ts)},
+                }
+                for name in names
+            ]
+        }
+    }
+
+
+def test_plan_chart_weeks_scans_edges_and_gaps():
+    """
+    GIVEN chart weeks overhanging both ends of the range with one missing week
+    WHEN _plan_chart_weeks runs
+    THEN only whole weeks are kept and the edges plus the gap are scanned.
+    """
+    chart_weeks = [(0, 100), (100, 200), (200, 300), (400, 500), (500, 600)]
+
+    weeks, windows = _plan_chart_weeks(chart_weeks, 50, 549)
+
+    assert weeks == [(100, 200), (200, 300), (400, 500)]
+    assert windows == [(50, 99), (300, 399), (500, 549)]
+
+
+def test_chart_tally_attributes_sole_album_tracks():
+    """
+    GIVEN a week where the artist's only album has as many plays as the
+    artist's tracks
+    WHEN the week is folded and resolved with min_tracks=3
+    THEN the tracks are certain and the album passes with exact counts.
+    """
+    tally = ChartTally()
+    tally.add_week(
+        [("Radiohead", "OK Computer", 12)],
+        [("Radiohead", "Airbag", 5), ("Radiohead", "Karma Police", 4)]
+        + [("Radiohead", "Lucky", 3)],
+    )
+
+    filtered, undecided = tally.resolve(min_plays=10, min_tracks=3)
+
+    assert undecided == 0
+    album = filtered[("radiohead", "ok computer")]
+    assert album["play_count"] == 12
+    assert dict(album["track_counts"]) == {"airbag": 5, "karma police": 4, "lucky": 3}
+    assert tally.total_scrobbles == 12
+
+
+def test_chart_tally_bounds_decide_or_defer_ambiguous_albums():
+    """
+    GIVEN a week with two albums by one artist and two tracks in total
+    WHEN resolved with min_tracks=3 and then min_tracks=2
+    THEN min_tracks=3 is decided (dropped by the upper bound) but
+    min_tracks=2 cannot be decided.
+    """
+    tally = ChartTally()
+    tally.add_week(
+        [("Artist", "First", 10), ("Artist", "Second", 10)],
+        [("Artist", "Song A", 12), ("Artist", "Song B", 8)],
+    )
+
+    assert tally.resolve(min_plays=10, min_tracks=3) == ({}, 0)
+    assert tally.resolve(min_plays=10, min_tracks=2) == ({}, 2)
+
+
+def test_chart_tally_marks_album_unbounded_when_charts_disagree():
+    tally = ChartTally()
+    tally.add_week([("Artist", "Album", 10)], [("Other Artist", "Song", 10)])
+
+    _, undecided = tally.resolve(min_plays=10, min_tracks=5)
+
+    assert undecided == 1
+
+
+def test_chart_tally_keeps_album_and_track_artist_keys_apart():
+    """
+    GIVEN a chart week crediting a compilation to its album artist and an
+    edge-window scan of the same album keyed by its track artist
+    WHEN the scan data is merged with add_exact
+    THEN the two artist keys stay separate entries (the documented
+    difference), while a scan key matching the album artist merges.
+    """
+    tally = ChartTally()
+    tally.add_week(
+        [("Various Artists", "Now Hits", 10)],
+        [("Singer", "Song", 10)],
+    )
+    scan_key = normalize_name("Singer", "Now Hits")
+    tally.add_exact(
+        scan_key,
+        {
+            "play_count": 3,
+            "track_counts": {"song": 3},
+            "original_artist": "Singer",
+            "original_album": "Now Hits",
+        },
+    )
+    chart_key = normalize_name("Various Artists", "Now Hits")
+    tally.add_exact(
+        chart_key,
+        {
+            "play_count": 2,
+            "track_counts": {"intro": 2},
+            "original_artist": "Various Artists",
+            "original_album": "Now Hits",
+        },
+    )
+
+    assert set(tally.albums) == {chart_key, scan_key}
+    assert tally.albums[chart_key]["play_count"] == 12
+    assert tally.albums[chart_key]["original_artist"] == "Various Artists"
+    assert tally.albums[scan_key]["play_count"] == 3
+    assert dict(tally.albums[scan_key]["track_counts"]) == {"song": 3}
+
+
+@pytest.mark.asyncio
+async def test_fetch_albums_from_charts_merges_edge_scan():
+    """
+    GIVEN one whole chart week inside 2023 and scrobbles in the edge window
+    WHEN fetch_albums_from_charts runs without the probe
+    THEN edge plays are added exactly and metadata reports the chart path.
+    """
+    from_ts = int(datetime(2023, 1, 1, tzinfo=timezone.utc).timestamp())
+    to_ts = from_ts + 2 * _WEEK - 1
+    week = (from_ts + _WEEK, from_ts + 2 * _WEEK)
+
+    async def fake_chart(session, username, kind, week_from, week_to):
+        if kind == "album":
+            return [("Artist", "Album", 9)]
+        return [("Artist", "One", 5), ("Artist", "Two", 4)]
+
+    async def fake_scan(username, win_from, win_to, page_cb=None):
+        page_cb(_recent_page("Artist", "Album", ["Three"], win_from + 10))
+        return [], {"status": "ok", "pages_expected": 1, "pages_received": 1}
+
+    progress = []
+    with (
+        patch(
+            "scrobblescope.charts.fetch_weekly_chart_list_async",
+            new=AsyncMock(return_value=[week]),
+        ),
+        patch("scrobblescope.charts.fetch_weekly_chart_async", new=fake_chart),
+        patch("scrobblescope.charts.fetch_all_recent_tracks_async", new=fake_scan),
+    ):
+        filtered, metadata = await fetch_albums_from_charts(
+            "user",
+            from_ts,
+            to_ts,
+            min_plays=10,
+            min_tracks=3,
+            accumulator=_AlbumAccumulator(from_ts, to_ts),
+            probe=False,
+            progress_cb=lambda done, total: progress.append((done, total)),
+        )
+
+    album = filtered[("artist", "album")]
+    assert album["play_count"] == 10
+    assert set(album["track_counts"]) == {"one", "two", "three"}
+    assert metadata["ingest_mode"] == "charts"
+    assert metadata["pages_expected"] == 4  # list + 2 charts + 1 edge page
+    assert metadata["stats"]["total_scrobbles"] == 10
+    assert progress[-1] == (2, 2)
+
+
+@pytest.mark.asyncio
+async def test_fetch_albums_from_charts_falls_back_when_a_week_fails():
+    from_ts = 0
+    weeks = [(0, _WEEK), (_WEEK, 2 * _WEEK)]
+
+    async def flaky_chart(session, username, kind, week_from, week_to):
+        return None if week_from else []
+
+    with (
+        patch(
+            "scrobblescope.charts.fetch_weekly_chart_list_async",
+            new=AsyncMock(return_value=weeks),
+        ),
+        patch("scrobblescope.charts.fetch_weekly_chart_async", new=flaky_chart),
+    ):
+        result = await fetch_albums_from_charts(
+            "user",
+            from_ts,
+            2 * _WEEK - 1,
+            10,
+            3,
+            _AlbumAccumulator(0, 2 * _WEEK - 1),
+            probe=False,
+        )
+
+    assert result is None
+
+
+@pytest.mark.asyncio
+async def test_auto_probe_prefers_scan_for_light_user():
+    """
+    GIVEN 52 chart weeks and a user with 1,000 scrobbles in the year
+    WHEN fetch_albums_from_charts probes (auto mode)
+    THEN the 5-page scan wins and no chart is requested.
+    """
+    weeks = [(i * _WEEK, (i + 1) * _WEEK) for i in range(52)]
+    chart = AsyncMock()
+
+    with (
+        patch(
+            "scrobblescope.charts.fetch_weekly_chart_list_async",
+            new=AsyncMock(return_value=weeks),
+        ),
+        patch(
+            "scrobblescope.charts.plan_store_windows", new=AsyncMock(return_value=None)
+        ),
+        patch(
+            "scrobblescope.charts.fetch_scrobble_total_async",
+            new=AsyncMock(return_value=1000),
+        ),
+        patch("scrobblescope.charts.fetch_weekly_chart_async", new=chart),
+    ):
+        result = await fetch_albums_from_charts(
+            "user", 0, 52 * _WEEK - 1, 10, 3, _AlbumAccumulator(0, 52 * _WEEK - 1)
+        )
+
+    assert result is None
+    chart.assert_not_called()
+
+
+def _counting_session(weeks, total, per_page=200):
+    """Fake Last.fm session; returns ``(session_ctx, calls)``.
+
+    *calls* lists the ``(method, page)`` of every request that reached the
+    network, i.e. was not served from the request cache.
+    """
+    calls = []
+    total_pages = max(1, -(-total // per_page))
+
+    def get(url, params):
+        calls.append((params["method"], params.get("page")))
+        if params["method"] == "user.getweeklychartlist":
+            data = {
+                "weeklychartlist": {
+                    "chart": [{"from": str(f), "to": str(t)} for f, t in weeks]
+                }
+            }
+        else:
+            data = _recent_page("Artist", "Album", ["song"], int(params["from"]))
+            data["recenttracks"]["@attr"] = {
+                "total": str(total),
+                "totalPages": str(total_pages),
+                "page": str(params["page"]),
+            }
+        resp = MagicMock(status=200)
+        resp.json = AsyncMock(return_value=data)
+        return make_response_context(resp)
+
+    session = MagicMock()
+    session.get.side_effect = get
+    session_ctx = MagicMock()
+    session_ctx.__aenter__ = AsyncMock(return_value=session)
+    session_ctx.__aexit__ = AsyncMock(return_value=False)
+    return session_ctx, calls
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "store_windows, chart_path_calls, scan_calls",
+    [
+        (
+            None,
+            [("user.getweeklychartlist", None), ("user.getrecenttracks", 1)],
+            [("user.getrecenttracks", page) for page in range(2, 6)],
+        ),
+        # The scan then plans its own shards; only the chart path is pinned.
+        ([], [], None),
+    ],
+    ids=["no_store", "store_covers_range"],
+)
+async def test_auto_mode_scan_wins_costs_no_extra_scan_requests(
+    store_windows, chart_path_calls, scan_calls
+):
+    """
+    GIVEN a light user (1,000 scrobbles: a 5-page scan) in auto ingest mode
+    WHEN fetch_top_albums_async runs the playcount pipeline
+    THEN the chart path's probe is the scan's first page, so only the chart
+    list is extra, and a range the store covers makes the chart path send
+    no request at all.
+    """
+    year = 2021
+    from_ts = int(datetime(year, 1, 1).timestamp())
+    weeks = [(from_ts + i * _WEEK, from_ts + (i + 1) * _WEEK) for i in range(52)]
+    chart_ctx, chart_calls = _counting_session(weeks, total=1000)
+    scan_ctx, calls = _counting_session(weeks, total=1000)
+
+    with (
+        patch("scrobblescope.charts.create_optimized_session", return_value=chart_ctx),
+        patch("scrobblescope.lastfm.create_optimized_session", return_value=scan_ctx),
+        patch(
+            "scrobblescope.charts.plan_store_windows",
+            new=AsyncMock(return_value=store_windows),
+        ),
+        patch("scrobblescope.scrobble_store.SCROBBLE_STORE_ENABLED", False),
+    ):
+        _, meta = await fetch_top_albums_async(
+            f"light-user-{len(chart_path_calls)}",
+            year,
+            sort_mode="playcount",
+            ingest_mode="auto",
+        )
+
+    assert meta.get("ingest_mode") != "charts"
+    assert chart_calls == chart_path_calls
+    if scan_calls is not None:
+        assert calls == scan_calls
@@ -12,6 +12,7 @@ from unittest.mock import AsyncMock, patch
 import pytest
 
 from scrobblescope.orchestrator import fetch_top_albums_async
+from tests.helpers import streamed_fetch
 
 # ---------------------------------------------------------------------------
 # Helpers
@@ -61,8 +62,8 @@ async def test_fetch_top_albums_aggregates_play_counts():
 
     with (
         patch(
-            "scrobblescope.orchestrator.fetch_all_recent_tracks_async",
-            new=AsyncMock(return_value=(pages, fetch_meta)),
+            "scrobblescope.orchestrator.fetch_recent_tracks_incremental",
+            new=AsyncMock(side_effect=streamed_fetch(pages, fetch_meta)),
         ),
     ):
         result, _ = await fetch_top_albums_async("testuser", 2023)
@@ -87,8 +88,8 @@ async def test_fetch_top_albums_min_plays_filter():
 
     with (
         patch(
-            "scrobblescope.orchestrator.fetch_all_recent_tracks_async",
-            new=AsyncMock(return_value=(pages, fetch_meta)),
+            "scrobblescope.orchestrator.fetch_recent_tracks_incremental",
+            new=AsyncMock(side_effect=streamed_fetch(pages, fetch_meta)),
         ),
     ):
         result, _ = await fetch_top_albums_async("testuser", 2023)
@@ -115,8 +116,8 @@ async def test_fetch_top_albums_min_tracks_filter():
 
     with (
         patch(
-            "scrobblescope.orchestrator.fetch_all_recent_tracks_async",
-            new=AsyncMock(return_value=(pages, fetch_meta)),
+            "scrobblescope.orchestrator.fetch_recent_tracks_incremental",
+            new=AsyncMock(side_effect=streamed_fetch(pages, fetch_meta)),
         ),
     ):
         result, _ = await fetch_top_albums_async("testuser", 2023)
@@ -142,8 +143,8 @@ async def test_fetch_top_albums_skips_out_of_bounds_timestamps():
 
     with (
         patch(
-            "scrobblescope.orchestrator.fetch_all_recent_tracks_async",
-            new=AsyncMock(return_value=(pages, fetch_meta)),
+            "scrobblescope.orchestrator.fetch_recent_tracks_incremental",
+            new=AsyncMock(side_effect=streamed_fetch(pages, fetch_meta)),
         ),
     ):
         result, _ = await fetch_top_albums_async("testuser", 2023, min_plays=5)
@@ -177,8 +178,8 @@ async def test_fetch_top_albums_skips_now_playing_track():
 
     with (
         patch(
-            "scrobblescope.orchestrator.fetch_all_recent_tracks_async",
-            new=AsyncMock(return_value=(pages, fetch_meta)),
+            "scrobblescope.orchestrator.fetch_recent_tracks_incremental",
+            new=AsyncMock(side_effect=streamed_fetch(pages, fetch_meta)),
         ),
     ):
         result, _ = await fetch_top_albums_async(
@@ -216,8 +217,8 @@ async def test_fetch_top_albums_non_latin_tracks_counted_distinctly():
 
     with (
         patch(
-            "scrobblescope.orchestrator.fetch_all_recent_tracks_async",
-            new=AsyncMock(return_value=(pages, fetch_meta)),
+            "scrobblescope.orchestrator.fetch_recent_tracks_incremental",
+            new=AsyncMock(side_effect=streamed_fetch(pages, fetch_meta)),
         ),
     ):
         result, _ = await fetch_top_albums_async(
@@ -246,8 +247,8 @@ async def test_fetch_top_albums_returns_stats_in_metadata():
 
     with (
         patch(
-            "scrobblescope.orchestrator.fetch_all_recent_tracks_async",
-            new=AsyncMock(return_value=(pages, fetch_meta)),
+            "scrobblescope.orchestrator.fetch_recent_tracks_incremental",
+            new=AsyncMock(side_effect=streamed_fetch(pages, fetch_meta)),
         ),
     ):
         _, metadata = await fetch_top_albums_async(
@@ -258,3 +259,30 @@ async def test_fetch_top_albums_returns_stats_in_metadata():
     assert stats["total_scrobbles"] == 18
     assert stats["unique_albums"] == 1
     assert stats["albums_passing_filter"] == 1
+
+
+@pytest.mark.asyncio
+async def test_fetch_top_albums_falls_back_to_scan_when_charts_decline():
+    """
+    GIVEN a playcount job whose chart path returns None (fallback)
+    WHEN fetch_top_albums_async runs with ingest_mode="charts"
+    THEN the charts are tried first and the full scan produces the result.
+    """
+    tracks = [_track("Artist A", "Album A", f"Track {i}") for i in range(3)] * 4
+    pages = [_page(tracks)]
+    charts = AsyncMock(return_value=None)
+
+    with (
+        patch("scrobblescope.orchestrator.fetch_albums_from_charts", new=charts),
+        patch(
+            "scrobblescope.orchestrator.fetch_recent_tracks_incremental",
+            new=AsyncMock(side_effect=streamed_fetch(pages, {"status": "ok"})),
+        ),
+    ):
+        result, _ = await fetch_top_albums_async(
+            "testuser", 2023, sort_mode="playcount", ingest_mode="charts"
+        )
+
+    charts.assert_awaited_once()
+    assert charts.await_args.kwargs["probe"] is False
+    assert result[("artist a", "album a")]["play_count"] == 12
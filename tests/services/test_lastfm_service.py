@@ -2,10 +2,14 @@ from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
+from scrobblescope.concurrency import AdaptiveConcurrencyLimit
 from scrobblescope.lastfm import (
+    _plan_time_shards,
+    _shard_cache_ttl,
     check_user_exists,
     fetch_all_recent_tracks_async,
     fetch_recent_tracks_page_async,
+    fetch_weekly_chart_async,
 )
 from tests.helpers import NoopAsyncContext, make_response_context
 
@@ -72,12 +76,11 @@ async def test_fetch_recent_tracks_page_retries_429_then_succeeds():
         make_response_context(resp_429),
         make_response_context(resp_200),
     ]
+    limiter = NoopAsyncContext()
 
     with (
         patch("scrobblescope.lastfm.get_cached_response", return_value=None),
-        patch(
-            "scrobblescope.lastfm.get_lastfm_limiter", return_value=NoopAsyncContext()
-        ),
+        patch("scrobblescope.lastfm.get_lastfm_limiter", return_value=limiter),
         patch("asyncio.sleep", new_callable=AsyncMock) as mock_sleep,
     ):
         result = await fetch_recent_tracks_page_async(
@@ -87,6 +90,42 @@ async def test_fetch_recent_tracks_page_retries_429_then_succeeds():
     assert result == payload
     assert session.get.call_count == 2
     assert mock_sleep.await_count >= 1
+    assert limiter.back_offs == [1]  # the 429 paused Last.fm for every job
+
+
+@pytest.mark.asyncio
+async def test_fetch_recent_tracks_page_429_shrinks_shared_concurrency():
+    """
+    GIVEN the shared adaptive Last.fm limit at 8
+    WHEN a page fetch is answered with 429 before succeeding
+    THEN the limit is halved for every job.
+    """
+    session = MagicMock()
+    resp_429 = AsyncMock()
+    resp_429.status = 429
+    resp_429.headers = {"Retry-After": "1"}
+    resp_200 = AsyncMock()
+    resp_200.status = 200
+    resp_200.json = AsyncMock(return_value={"recenttracks": {"track": []}})
+    session.get.side_effect = [
+        make_response_context(resp_429),
+        make_response_context(resp_200),
+    ]
+    limit = AdaptiveConcurrencyLimit("Last.fm", 8)
+
+    with (
+        patch("scrobblescope.lastfm.get_cached_response", return_value=None),
+        patch("scrobblescope.lastfm.set_cached_response"),
+        patch(
+            "scrobblescope.lastfm.get_lastfm_limiter", return_value=NoopAsyncContext()
+        ),
+        patch("scrobblescope.lastfm.get_lastfm_concurrency", return_value=limit),
+        patch("asyncio.sleep", new_callable=AsyncMock),
+    ):
+        await fetch_recent_tracks_page_async(session, "user", 1, 2, page=1)
+
+    assert limit.limit == 4
+    assert limit.snapshot()["in_flight"] == 0
 
 
 @pytest.mark.asyncio
@@ -113,6 +152,43 @@ async def test_fetch_recent_tracks_page_404_raises_user_not_found():
             )
 
 
+@pytest.mark.asyncio
+async def test_fetch_weekly_chart_parses_single_entry_object():
+    """
+    GIVEN a weekly album chart whose only entry is serialized as a bare object
+    WHEN fetch_weekly_chart_async runs
+    THEN it returns one (artist, name, playcount) row.
+    """
+    session = MagicMock()
+    resp = AsyncMock()
+    resp.status = 200
+    resp.json = AsyncMock(
+        return_value={
+            "weeklyalbumchart": {
+                "album": {
+                    "artist": {"#text": "Radiohead"},
+                    "name": "Kid A",
+                    "playcount": "7",
+                }
+            }
+        }
+    )
+    session.get.return_value = make_response_context(resp)
+
+    with (
+        patch("scrobblescope.lastfm.get_cached_response", return_value=None),
+        patch("scrobblescope.lastfm.set_cached_response"),
+        patch(
+            "scrobblescope.lastfm.get_lastfm_limiter", return_value=NoopAsyncContext()
+        ),
+    ):
+        rows = await fetch_weekly_chart_async(session, "user", "album", 0, 604800)
+
+    assert rows == [("Radiohead", "Kid A", 7)]
+    params = session.get.call_args.kwargs["params"]
+    assert params["method"] == "user.getweeklyalbumchart"
+
+
 @pytest.mark.asyncio
 async def test_check_user_exists_missing_registration_data():
     """
@@ -267,3 +343,220 @@ async def test_progress_cb_counts_failed_pages():
     assert meta["pages_dropped"] == 1
     # Only 2 successful pages collected
     assert len(pages) == 2
+
+
+@pytest.mark.asyncio
+async def test_page_cb_streams_pages_without_retaining_them():
+    """
+    GIVEN a 3-page fetch with page_cb provided and no progress_cb
+    WHEN fetch_all_recent_tracks_async runs
+    THEN every page reaches page_cb, the returned list is empty, and
+    metadata still counts all received pages.
+    """
+    page_payload = _make_page(3)
+    consumed = []
+
+    with (
+        patch(
+            "scrobblescope.lastfm.fetch_recent_tracks_page_async",
+            new_callable=AsyncMock,
+            return_value=page_payload,
+        ),
+        patch("scrobblescope.lastfm.create_optimized_session") as mock_session,
+        patch(
+            "scrobblescope.lastfm.fetch_pages_batch_async", new_callable=AsyncMock
+        ) as mock_batch,
+    ):
+        mock_session.return_value.__aenter__ = AsyncMock(return_value=MagicMock())
+        mock_session.return_value.__aexit__ = AsyncMock(return_value=False)
+
+        pages, meta = await fetch_all_recent_tracks_async(
+            "user", 0, 1, page_cb=consumed.append
+        )
+
+    assert pages == []
+    assert len(consumed) == 3
+    assert meta == {"status": "ok", "pages_expected": 3, "pages_received": 3}
+    # Streaming needs per-page completion, so the gather path is not used.
+    mock_batch.assert_not_called()
+
+
+# --- time-sharded fetch ---
+
+JAN_15_2024 = 1705276800  # 2024-01-15T00:00:00Z
+MAR_1_2024 = 1709251200  # 2024-03-01T00:00:00Z
+MAR_10_2024 = 1710028800  # 2024-03-10T00:00:00Z
+
+
+def test_plan_time_shards_splits_on_utc_months_newest_first():
+    shards = _plan_time_shards(JAN_15_2024, MAR_10_2024)
+
+    assert len(shards) == 3
+    assert shards[0] == (MAR_1_2024, MAR_10_2024)
+    assert shards[-1][0] == JAN_15_2024
+    # Contiguous, non-overlapping, and whole-month in the middle.
+    for newer, older in zip(shards, shards[1:]):
+        assert older[1] + 1 == newer[0]
+    assert shards[1][1] == MAR_1_2024 - 1
+
+
+def test_shard_cache_ttl_extends_only_closed_shards():
+    now = MAR_10_2024
+    assert _shard_cache_ttl(MAR_1_2024 - 1, now) is not None
+    assert _shard_cache_ttl(now - 60, now) is None
+
+
+def _sharded(fake_page):
+    """Patch the page fetch with *fake_page* and shard any multi-page range."""
+    session = patch("scrobblescope.lastfm.create_optimized_session")
+    return (
+        patch(
+            "scrobblescope.lastfm.fetch_recent_tracks_page_async",
+            side_effect=fake_page,
+        ),
+        session,
+        patch("scrobblescope.lastfm.LASTFM_SHARD_MIN_PAGES", 1),
+    )
+
+
+@pytest.mark.asyncio
+async def test_sharded_fetch_requests_every_first_page_before_fan_out():
+    """
+    GIVEN a 3-month range of more pages than the shard threshold, where the
+    newest month has 2 pages
+    WHEN fetch_all_recent_tracks_async runs without callbacks
+    THEN the newest month's first page (the probe) is kept as its data, the
+    other first pages are requested before any page 2, and the pages come
+    back newest shard first.
+    """
+    calls = []
+
+    async def fake_page(session, username, from_ts, to_ts, page, **kwargs):
+        calls.append((from_ts, page))
+        total = 2 if from_ts == MAR_1_2024 else 1
+        return _make_page(total, tracks=[{"shard": from_ts, "page": page}])
+
+    p1, p2, p3 = _sharded(fake_page)
+    with p1, p2 as mock_session, p3:
+        mock_session.return_value.__aenter__ = AsyncMock(return_value=MagicMock())
+        mock_session.return_value.__aexit__ = AsyncMock(return_value=False)
+
+        pages, meta = await fetch_all_recent_tracks_async(
+            "user", JAN_15_2024, MAR_10_2024
+        )
+
+    assert calls[0] == (MAR_1_2024, 1)
+    assert [page for _, page in calls[1:3]] == [1, 1]
+    assert calls[3] == (MAR_1_2024, 2)
+    assert calls.count((MAR_1_2024, 1)) == 1
+    order = [p["recenttracks"]["track"][0] for p in pages]
+    assert order[:2] == [
+        {"shard": MAR_1_2024, "page": 1},
+        {"shard": MAR_1_2024, "page": 2},
+    ]
+    assert order[-1]["shard"] == JAN_15_2024
+    assert meta == {"status": "ok", "pages_expected": 4, "pages_received": 4}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("cached_whole_range", [False, True])
+async def test_light_range_is_not_sharded(cached_whole_range):
+    """
+    GIVEN a 3-month range of a light user (50 scrobbles in the newest month)
+    WHEN fetch_all_recent_tracks_async runs
+    THEN the newest month's first page is kept and the rest of the range is
+    fetched in one piece -- or, when the whole range's first page is already
+    cached, that page decides and is reused without a probe request.
+    """
+    calls = []
+    light_page = _make_page(1)
+    light_page["recenttracks"]["@attr"]["total"] = "50"
+
+    async def fake_page(session, username, from_ts, to_ts, page, **kwargs):
+        calls.append((from_ts, to_ts, page))
+        return light_page
+
+    cached = _make_page(2) if cached_whole_range else None
+    with (
+        patch(
+            "scrobblescope.lastfm.fetch_recent_tracks_page_async",
+            side_effect=fake_page,
+        ),
+        patch("scrobblescope.lastfm.get_cached_response", return_value=cached),
+        patch("scrobblescope.lastfm.create_optimized_session") as mock_session,
+    ):
+        mock_session.return_value.__aenter__ = AsyncMock(return_value=MagicMock())
+        mock_session.return_value.__aexit__ = AsyncMock(return_value=False)
+
+        _, meta = await fetch_all_recent_tracks_async(
+            "user", JAN_15_2024, MAR_10_2024, page_cb=lambda page: None
+        )
+
+    if cached_whole_range:
+        assert calls == [(JAN_15_2024, MAR_10_2024, 2)]
+    else:
+        assert calls == [
+            (MAR_1_2024, MAR_10_2024, 1),
+            (JAN_15_2024, MAR_1_2024 - 1, 1),
+        ]
+    assert meta == {"status": "ok", "pages_expected": 2, "pages_received": 2}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("streaming", [True, False])
+async def test_sharded_fetch_retries_a_failed_first_page(streaming):
+    """
+    GIVEN a shard whose first page fails once, then succeeds
+    WHEN fetch_all_recent_tracks_async runs (streaming or gathered)
+    THEN the page is requested again and no data is lost.
+    """
+    attempts = []
+
+    async def fake_page(session, username, from_ts, to_ts, page, **kwargs):
+        if from_ts == JAN_15_2024:
+            attempts.append(page)
+            if len(attempts) == 1:
+                return None
+        return _make_page(1)
+
+    kwargs = {"page_cb": lambda page: None} if streaming else {}
+    p1, p2, p3 = _sharded(fake_page)
+    with p1, p2 as mock_session, p3:
+        mock_session.return_value.__aenter__ = AsyncMock(return_value=MagicMock())
+        mock_session.return_value.__aexit__ = AsyncMock(return_value=False)
+
+        _, meta = await fetch_all_recent_tracks_async(
+            "user", JAN_15_2024, MAR_10_2024, **kwargs
+        )
+
+    assert attempts == [1, 1]
+    assert meta == {"status": "ok", "pages_expected": 3, "pages_received": 3}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("streaming", [True, False])
+async def test_sharded_fetch_lost_month_is_an_error(streaming, caplog):
+    """
+    GIVEN a shard whose first page fails on the retry too
+    WHEN fetch_all_recent_tracks_async runs
+    THEN the fetch errors and names the missing month instead of reporting
+    one dropped page.
+    """
+
+    async def fake_page(session, username, from_ts, to_ts, page, **kwargs):
+        if from_ts == JAN_15_2024:
+            return None
+        return _make_page(1)
+
+    kwargs = {"page_cb": lambda page: None} if streaming else {}
+    p1, p2, p3 = _sharded(fake_page)
+    with p1, p2 as mock_session, p3:
+        mock_session.return_value.__aenter__ = AsyncMock(return_value=MagicMock())
+        mock_session.return_value.__aexit__ = AsyncMock(return_value=False)
+
+        _, meta = await fetch_all_recent_tracks_async(
+            "user", JAN_15_2024, MAR_10_2024, **kwargs
+        )
+
+    assert meta == {"status": "error", "reason": "lastfm_unavailable"}
+    assert "2024-01" in caplog.text
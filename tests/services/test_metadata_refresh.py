@@ -0,0 +1,156 @@
+"""Tests for scrobblescope.metadata_refresh -- refresh-ahead of cached albums.
+
+Covers:
+- A sweep records hits, re-fetches due rows by Spotify ID and upserts what
+  Spotify returns.
+- Detail requests are batched and paced at the refresher's rate share.
+- note_cache_hits starts one sweeper and is a no-op when disabled.
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from scrobblescope import metadata_refresh
+from scrobblescope.metadata_refresh import note_cache_hits, refresh_expiring_metadata
+
+_ALBUM = {
+    "release_date": "1997-06-16",
+    "images": [{"url": "https://img/ok.jpg"}],
+    "tracks": {"items": [{"name": "Airbag", "duration_ms": 284000}]},
+}
+
+
+def _patches(conn, due, details):
+    session_ctx = MagicMock()
+    session_ctx.__aenter__ = AsyncMock(return_value=AsyncMock())
+    session_ctx.__aexit__ = AsyncMock(return_value=False)
+    return (
+        patch(
+            "scrobblescope.metadata_refresh._get_db_connection",
+            new=AsyncMock(return_value=conn),
+        ),
+        patch(
+            "scrobblescope.metadata_refresh._batch_record_hits",
+            new=AsyncMock(),
+        ),
+        patch(
+            "scrobblescope.metadata_refresh._batch_lookup_expiring",
+            new=AsyncMock(return_value=due),
+        ),
+        patch(
+            "scrobblescope.metadata_refresh.fetch_spotify_access_token",
+            new=AsyncMock(return_value="tok"),
+        ),
+        patch(
+            "scrobblescope.metadata_refresh.create_optimized_session",
+            return_value=session_ctx,
+        ),
+        patch(
+            "scrobblescope.metadata_refresh.fetch_spotify_album_details_batch",
+            new=details,
+        ),
+    )
+
+
+@pytest.mark.asyncio
+async def test_sweep_refreshes_due_rows_by_spotify_id():
+    """
+    GIVEN two hot keys whose rows are due, one of them deleted on Spotify
+    WHEN a sweep runs
+    THEN their hits are recorded, the live album is upserted with fresh durations, the deleted one is
+    left to expire and the hot keys are consumed.
+    """
+    conn = AsyncMock()
+    due = {("radiohead", "ok computer"): "sp1", ("radiohead", "gone"): "sp2"}
+    details = AsyncMock(return_value={"sp1": _ALBUM})
+    persist = AsyncMock()
+
+    p1, p2, p3, p4, p5, p6 = _patches(conn, due, details)
+    with (
+        p1,
+        p2 as record_hits,
+        p3,
+        p4,
+        p5,
+        p6,
+        patch("scrobblescope.metadata_refresh._batch_persist_metadata", new=persist),
+        patch("scrobblescope.metadata_refresh._hot_keys", set(due)),
+    ):
+        refreshed = await refresh_expiring_metadata()
+        assert metadata_refresh._hot_keys == set()
+
+    assert refreshed == 1
+    assert sorted(record_hits.await_args[0][1]) == sorted(due)
+    assert sorted(details.await_args[0][1]) == ["sp1", "sp2"]
+    persist.assert_awaited_once_with(
+        conn,
+        [
+            (
+                "radiohead",
+                "ok computer",
+                "sp1",
+                "1997-06-16",
+                "https://img/ok.jpg",
+                {"airbag": 284},
+            )
+        ],
+    )
+    conn.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_sweep_batches_and_paces_detail_requests():
+    """
+    GIVEN 25 due rows and a 10 req/s Spotify rate with a 0.1 share
+    WHEN a sweep runs
+    THEN two detail requests are sent, one second apart.
+    """
+    due = {("a", f"album {i}"): f"sp{i}" for i in range(25)}
+    details = AsyncMock(return_value={})
+
+    p1, p2, p3, p4, p5, p6 = _patches(AsyncMock(), due, details)
+    with (
+        p1,
+        p2,
+        p3,
+        p4,
+        p5,
+        p6,
+        patch("scrobblescope.metadata_refresh._batch_persist_metadata", AsyncMock()),
+        patch("scrobblescope.metadata_refresh._hot_keys", set(due)),
+        patch("scrobblescope.metadata_refresh.SPOTIFY_REQUESTS_PER_SECOND", 10),
+        patch("scrobblescope.metadata_refresh.METADATA_REFRESH_RATE_SHARE", 0.1),
+        patch(
+            "scrobblescope.metadata_refresh.asyncio.sleep", new_callable=AsyncMock
+        ) as mock_sleep,
+    ):
+        await refresh_expiring_metadata()
+
+    assert [len(call[0][1]) for call in details.await_args_list] == [20, 5]
+    assert [call[0][0] for call in mock_sleep.await_args_list] == [pytest.approx(1.0)]
+
+
+def test_note_cache_hits_starts_one_sweeper():
+    future = MagicMock()
+    future.done.return_value = False
+
+    def fake_submit(coro):
+        coro.close()
+        return future
+
+    submit = MagicMock(side_effect=fake_submit)
+    with (
+        patch("scrobblescope.metadata_refresh.submit", new=submit),
+        patch("scrobblescope.metadata_refresh._refresher", None),
+        patch("scrobblescope.metadata_refresh._hot_keys", set()),
+    ):
+        with patch("scrobblescope.metadata_refresh.METADATA_REFRESH_AHEAD_DAYS", 0):
+            note_cache_hits([("a", "x")])
+        assert metadata_refresh._hot_keys == set()
+
+        note_cache_hits([("a", "b")])
+        note_cache_hits([("a", "c")])
+        assert metadata_refresh._hot_keys == {("a", "b"), ("a", "c")}
+
+    assert submit.call_count == 1
@@ -3,9 +3,9 @@ from unittest.mock import AsyncMock, patch
 
 import pytest
 
+from scrobblescope.config import PLAYTIME_SPOTIFY_MISS_BUDGET
 from scrobblescope.errors import SpotifyUnavailableError
 from scrobblescope.orchestrator import (
-    _PLAYTIME_ALBUM_CAP,
     _fetch_and_process,
     background_task,
 )
@@ -274,18 +274,16 @@ async def test_playtime_limit_does_not_preslice():
 
 
 @pytest.mark.asyncio
-async def test_playtime_cap_fires_and_warns_when_album_count_exceeds_limit(caplog):
+async def test_playtime_albums_over_the_miss_budget_all_reach_process_albums():
     """
-    GIVEN filtered_albums has _PLAYTIME_ALBUM_CAP + 1 entries and sort_mode="playtime"
+    GIVEN filtered_albums has PLAYTIME_SPOTIFY_MISS_BUDGET + 1 entries and
+    sort_mode="playtime"
     WHEN _fetch_and_process runs
-    THEN process_albums should receive exactly _PLAYTIME_ALBUM_CAP albums (the highest
-    by raw play_count) and a WARNING must be logged identifying the cap as the cause.
-
-    The cap is the only protection against unbounded Spotify API load for playtime
-    sorts. A regression that removes it would make the test fail on the album count
-    assertion; a regression that silences the log would fail on the caplog assertion.
+    THEN process_albums should receive every album: the budget bounds only
+    Spotify misses and is applied after the DB cache partition, so cached
+    albums are never culled.
     """
-    over_limit = _PLAYTIME_ALBUM_CAP + 1
+    over_limit = PLAYTIME_SPOTIFY_MISS_BUDGET + 1
     filtered = {
         (f"artist{i}", f"album{i}"): {
             "play_count": i,
@@ -308,28 +306,19 @@ async def test_playtime_cap_fires_and_warns_when_album_count_exceeds_limit(caplo
             new_callable=AsyncMock,
             return_value=[],
         ) as mock_process,
-        caplog.at_level(logging.WARNING),
     ):
         await _fetch_and_process(job_id, "testuser", 2025, "playtime", "all")
 
     called_albums = mock_process.call_args[0][1]
-    assert len(called_albums) == _PLAYTIME_ALBUM_CAP, (
-        f"process_albums should receive exactly {_PLAYTIME_ALBUM_CAP} albums "
-        f"when the input exceeds the playtime cap, got {len(called_albums)}"
-    )
-    # The cap should keep the highest play_count entries.
-    assert (f"artist{over_limit}", f"album{over_limit}") in called_albums
-    assert ("artist1", "album1") not in called_albums
-    assert "Playtime album cap applied" in caplog.text
+    assert len(called_albums) == over_limit
 
 
 @pytest.mark.asyncio
 async def test_playtime_cap_does_not_fire_below_limit():
     """
-    GIVEN filtered_albums has fewer than _PLAYTIME_ALBUM_CAP entries
+    GIVEN filtered_albums has fewer than PLAYTIME_SPOTIFY_MISS_BUDGET entries
     WHEN _fetch_and_process runs with sort_mode="playtime"
-    THEN process_albums should receive all albums unchanged -- the cap must not
-    interfere with normal-sized requests.
+    THEN process_albums should receive all albums unchanged.
     """
     filtered = {
         (f"artist{i}", f"album{i}"): {
@@ -4,9 +4,8 @@ from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from scrobblescope.cache import _cleanup_stale_metadata
 from scrobblescope.orchestrator import (
-    _run_spotify_batch_detail_phase,
+    _AlbumDetailBatcher,
     _run_spotify_search_phase,
 )
 from scrobblescope.repositories import create_job
@@ -14,46 +13,6 @@ from scrobblescope.repositories import set_job_progress as real_set
 from tests.helpers import TEST_JOB_PARAMS
 
 
-@pytest.mark.asyncio
-async def test_cleanup_stale_metadata_issues_delete():
-    """
-    GIVEN a live DB connection
-    WHEN _cleanup_stale_metadata is called
-    THEN it should execute a DELETE statement parameterised with the TTL value.
-    """
-    mock_conn = AsyncMock()
-    mock_conn.execute.return_value = "DELETE 3"
-
-    await _cleanup_stale_metadata(mock_conn)
-
-    mock_conn.execute.assert_awaited_once()
-    sql, ttl = mock_conn.execute.call_args[0]
-    assert "DELETE FROM spotify_cache" in sql
-    assert "updated_at" in sql
-    assert isinstance(ttl, int) and ttl > 0
-
-
-@pytest.mark.asyncio
-async def test_cleanup_stale_metadata_nonfatal(caplog):
-    """
-    GIVEN conn.execute raises an exception
-    WHEN _cleanup_stale_metadata is called
-    THEN no exception should propagate and a warning must be logged.
-
-    Previously this test had no assertion at all: it passed vacuously and would
-    have passed even if the function body was empty.  The logging.warning call is
-    the only observable production side-effect when cleanup fails, so asserting on
-    it is the minimum meaningful check for this path.
-    """
-    mock_conn = AsyncMock()
-    mock_conn.execute.side_effect = RuntimeError("DB gone away")
-
-    with caplog.at_level(logging.WARNING):
-        await _cleanup_stale_metadata(mock_conn)  # must not raise
-
-    assert "Stale cache cleanup failed" in caplog.text
-
-
 @pytest.mark.asyncio
 async def test_fetch_spotify_misses_malformed_album_details():
     """When Spotify returns album details missing the 'tracks' key or with
@@ -93,7 +52,7 @@ async def test_fetch_spotify_misses_malformed_album_details():
     # Use a side_effect function (not list) to ensure ID assignment is
     # deterministic regardless of asyncio.as_completed scheduling order.
     async def _search_by_artist(session, artist, album, token, semaphore=None):
-        return {"artist1": "sp1", "artist2": "sp2"}[artist]
+        return {"id": {"artist1": "sp1", "artist2": "sp2"}[artist]}
 
     with (
         patch(
@@ -106,7 +65,7 @@ async def test_fetch_spotify_misses_malformed_album_details():
             return_value=mock_session_ctx,
         ),
         patch(
-            "scrobblescope.orchestrator.search_for_spotify_album_id",
+            "scrobblescope.orchestrator.search_for_spotify_album",
             new_callable=AsyncMock,
             side_effect=_search_by_artist,
         ),
@@ -171,7 +130,7 @@ async def test_fetch_spotify_misses_reports_search_progress():
     mock_session_ctx.__aexit__ = AsyncMock(return_value=False)
 
     # All 5 searches return IDs; batch detail returns minimal data
-    spotify_ids = [f"sp{i}" for i in range(5)]
+    spotify_ids = [{"id": f"sp{i}"} for i in range(5)]
 
     def _batch_details(session, batch_ids, token, semaphore=None):
         return {
@@ -200,7 +159,7 @@ async def test_fetch_spotify_misses_reports_search_progress():
             return_value=mock_session_ctx,
         ),
         patch(
-            "scrobblescope.orchestrator.search_for_spotify_album_id",
+            "scrobblescope.orchestrator.search_for_spotify_album",
             new_callable=AsyncMock,
             side_effect=spotify_ids,
         ),
@@ -236,12 +195,13 @@ async def test_fetch_spotify_misses_reports_search_progress():
 async def test_fetch_spotify_misses_reports_batch_progress():
     """
     GIVEN _fetch_spotify_misses processes 2 batches of Spotify album details
-    WHEN each batch completes via asyncio.as_completed
-    THEN set_job_progress is called with values in the 40%-60% range
-    and messages like "Enriched N/T albums from Spotify...".
+    WHEN each batch completes
+    THEN set_job_progress reports on the shared search + detail scale
+    with messages like "Enriched N/T albums from Spotify...".
 
-    Arithmetic: pct = 40 + int(20 * batches_done / num_batches)
-    For 2 batches: batch 1 -> 50, batch 2 -> 60.
+    Arithmetic: 25 searches + 25 detail units = 50 units over 20%-60%,
+    pct = 20 + int(40 * units_done / 50).
+    Batch 1 (20 IDs) -> 20 + int(40 * 45/50) = 56; batch 2 -> 60.
     """
     from scrobblescope.orchestrator import _fetch_spotify_misses
 
@@ -265,7 +225,7 @@ async def test_fetch_spotify_misses_reports_batch_progress():
     mock_session_ctx.__aexit__ = AsyncMock(return_value=False)
 
     # All 25 searches succeed
-    spotify_ids = [f"sp{i}" for i in range(25)]
+    spotify_ids = [{"id": f"sp{i}"} for i in range(25)]
 
     # Batch detail responses: batch 1 (20 albums), batch 2 (5 albums)
     def _batch_details(session, batch_ids, token, semaphore=None):
@@ -295,7 +255,7 @@ async def test_fetch_spotify_misses_reports_batch_progress():
             return_value=mock_session_ctx,
         ),
         patch(
-            "scrobblescope.orchestrator.search_for_spotify_album_id",
+            "scrobblescope.orchestrator.search_for_spotify_album",
             new_callable=AsyncMock,
             side_effect=spotify_ids,
         ),
@@ -318,9 +278,7 @@ async def test_fetch_spotify_misses_reports_batch_progress():
         if "message" in c and "albums from Spotify" in c["message"]
     ]
     assert len(enrich_calls) == 2
-    # Batch 1: 40 + int(20 * 1/2) = 50
-    assert enrich_calls[0]["progress"] == 50
-    # Batch 2: 40 + int(20 * 2/2) = 60
+    assert enrich_calls[0]["progress"] == 56
     assert enrich_calls[1]["progress"] == 60
     # Both messages should reference total album count
     assert "/25 albums from Spotify..." in enrich_calls[0]["message"]
@@ -334,7 +292,7 @@ async def test_fetch_spotify_misses_reports_batch_progress():
 
 @pytest.mark.asyncio
 async def test_run_spotify_search_phase_all_misses_returns_empty_maps():
-    """All search_for_spotify_album_id calls return None: both dicts empty,
+    """All search_for_spotify_album calls return None: both dicts empty,
     every album registered as unmatched."""
     job_id = create_job(TEST_JOB_PARAMS)
     cache_misses = {
@@ -352,11 +310,10 @@ async def test_run_spotify_search_phase_all_misses_returns_empty_maps():
         },
     }
     session = AsyncMock()
-    semaphore = asyncio.Semaphore(5)
 
     with (
         patch(
-            "scrobblescope.orchestrator.search_for_spotify_album_id",
+            "scrobblescope.orchestrator.search_for_spotify_album",
             new_callable=AsyncMock,
             return_value=None,
         ),
@@ -364,7 +321,7 @@ async def test_run_spotify_search_phase_all_misses_returns_empty_maps():
         patch("scrobblescope.orchestrator.add_job_unmatched") as mock_unmatched,
     ):
         id_to_key, id_to_data = await _run_spotify_search_phase(
-            job_id, session, cache_misses, "fake_token", semaphore
+            job_id, session, cache_misses, "fake_token"
         )
 
     assert id_to_key == {}
@@ -389,7 +346,7 @@ async def test_run_spotify_batch_detail_phase_empty_id_list_skips_api_call():
             return_value=AsyncMock(),
         ),
         patch(
-            "scrobblescope.orchestrator.search_for_spotify_album_id",
+            "scrobblescope.orchestrator.search_for_spotify_album",
             new_callable=AsyncMock,
             return_value=None,
         ),
@@ -431,7 +388,6 @@ async def test_run_spotify_search_phase_progress_stays_in_20_to_40_range():
         for i in range(5)
     }
     session = AsyncMock()
-    semaphore = asyncio.Semaphore(5)
 
     progress_values = []
 
@@ -441,19 +397,253 @@ async def test_run_spotify_search_phase_progress_stays_in_20_to_40_range():
 
     with (
         patch(
-            "scrobblescope.orchestrator.search_for_spotify_album_id",
+            "scrobblescope.orchestrator.search_for_spotify_album",
             new_callable=AsyncMock,
-            return_value="some_id",
+            return_value={"id": "some_id"},
         ),
         patch(
             "scrobblescope.orchestrator.set_job_progress",
             side_effect=capture_progress,
         ),
     ):
-        await _run_spotify_search_phase(
-            job_id, session, cache_misses, "fake_token", semaphore
-        )
+        await _run_spotify_search_phase(job_id, session, cache_misses, "fake_token")
 
     assert len(progress_values) == 5
     for pct in progress_values:
         assert 20 <= pct <= 40, f"Progress {pct} outside [20, 40] range"
+
+
+@pytest.mark.asyncio
+async def test_fetch_spotify_misses_lite_path_skips_batch_detail():
+    """
+    GIVEN one cache miss and a search hit carrying release date and artwork
+    WHEN _fetch_spotify_misses runs with need_durations=False
+    THEN no album details are fetched and the miss is promoted with
+    track_durations=None ("not yet fetched").
+    """
+    from scrobblescope.orchestrator import _fetch_spotify_misses
+
+    job_id = create_job(TEST_JOB_PARAMS)
+    cache_misses = {
+        ("artist", "album"): {
+            "play_count": 10,
+            "track_counts": {"song": 10},
+            "original_artist": "Artist",
+            "original_album": "Album",
+        }
+    }
+    cache_hits = {}
+    mock_session_ctx = MagicMock()
+    mock_session_ctx.__aenter__ = AsyncMock(return_value=AsyncMock())
+    mock_session_ctx.__aexit__ = AsyncMock(return_value=False)
+    hit = {
+        "id": "sp1",
+        "release_date": "2024-03-01",
+        "images": [{"url": "https://img.example.com/big.jpg"}],
+    }
+
+    with (
+        patch(
+            "scrobblescope.orchestrator.fetch_spotify_access_token",
+            new_callable=AsyncMock,
+            return_value="tok",
+        ),
+        patch(
+            "scrobblescope.orchestrator.create_optimized_session",
+            return_value=mock_session_ctx,
+        ),
+        patch(
+            "scrobblescope.orchestrator.search_for_spotify_album",
+            new_callable=AsyncMock,
+            return_value=hit,
+        ),
+        patch(
+            "scrobblescope.orchestrator.fetch_spotify_album_details_batch",
+            new_callable=AsyncMock,
+        ) as mock_batch,
+    ):
+        rows = await _fetch_spotify_misses(
+            job_id, cache_misses, cache_hits, need_durations=False
+        )
+
+    mock_batch.assert_not_called()
+    assert cache_hits[("artist", "album")]["cached"] == {
+        "spotify_id": "sp1",
+        "release_date": "2024-03-01",
+        "album_image_url": "https://img.example.com/big.jpg",
+        "track_durations": None,
+    }
+    assert rows == [
+        (
+            "artist",
+            "album",
+            "sp1",
+            "2024-03-01",
+            "https://img.example.com/big.jpg",
+            None,
+        )
+    ]
+
+
+@pytest.mark.asyncio
+async def test_album_detail_batcher_caps_batches_at_20_ids():
+    calls = []
+
+    async def fake_batch(session, batch_ids, token, semaphore=None):
+        return {sid: {} for sid in batch_ids}
+
+    with patch(
+        "scrobblescope.orchestrator.fetch_spotify_album_details_batch",
+        new=fake_batch,
+    ):
+        batcher = _AlbumDetailBatcher(
+            None, "tok", lambda ids, details: calls.append(ids), linger=5
+        )
+        for i in range(45):
+            batcher.put(f"sp{i}")
+        await batcher.close()
+
+    assert batcher.batch_sizes == [20, 20, 5]
+    assert sorted(sid for ids in calls for sid in ids) == sorted(
+        f"sp{i}" for i in range(45)
+    )
+
+
+@pytest.mark.asyncio
+async def test_album_detail_batcher_linger_flushes_partial_batch():
+    """
+    GIVEN a batcher with a 10 ms linger
+    WHEN 3 IDs are queued and nothing else arrives
+    THEN the partial batch is dispatched before close() is called.
+    """
+    dispatched = asyncio.Event()
+
+    async def fake_batch(session, batch_ids, token, semaphore=None):
+        dispatched.set()
+        return {}
+
+    with patch(
+        "scrobblescope.orchestrator.fetch_spotify_album_details_batch",
+        new=fake_batch,
+    ):
+        batcher = _AlbumDetailBatcher(None, "tok", lambda ids, d: None, linger=0.01)
+        for i in range(3):
+            batcher.put(f"sp{i}")
+        await asyncio.wait_for(dispatched.wait(), timeout=2)
+        await batcher.close()
+
+    assert batcher.batch_sizes == [3]
+
+
+@pytest.mark.asyncio
+async def test_fetch_spotify_misses_overlaps_details_with_searches():
+    """
+    GIVEN 21 misses whose last search only returns once a detail batch ran
+    WHEN _fetch_spotify_misses runs the pipelined stage
+    THEN the first full batch of 20 is fetched while that search is still
+    pending (a phase barrier would deadlock here).
+    """
+    from scrobblescope.orchestrator import _fetch_spotify_misses
+
+    job_id = create_job(TEST_JOB_PARAMS)
+    cache_misses = {
+        (f"artist{i}", f"album{i}"): {
+            "play_count": 10,
+            "track_counts": {"song": 3},
+            "original_artist": f"Artist{i}",
+            "original_album": f"Album{i}",
+        }
+        for i in range(21)
+    }
+    first_batch_fetched = asyncio.Event()
+
+    async def fake_search(session, artist, album, token, semaphore=None):
+        if artist == "artist20":
+            await first_batch_fetched.wait()
+        return {"id": f"sp-{artist}"}
+
+    async def fake_batch(session, batch_ids, token, semaphore=None):
+        first_batch_fetched.set()
+        return {sid: {"release_date": "2025", "tracks": {}} for sid in batch_ids}
+
+    mock_session_ctx = MagicMock()
+    mock_session_ctx.__aenter__ = AsyncMock(return_value=AsyncMock())
+    mock_session_ctx.__aexit__ = AsyncMock(return_value=False)
+    cache_hits = {}
+
+    with (
+        patch(
+            "scrobblescope.orchestrator.fetch_spotify_access_token",
+            new_callable=AsyncMock,
+            return_value="tok",
+        ),
+        patch(
+            "scrobblescope.orchestrator.create_optimized_session",
+            return_value=mock_session_ctx,
+        ),
+        patch("scrobblescope.orchestrator.search_for_spotify_album", new=fake_search),
+        patch(
+            "scrobblescope.orchestrator.fetch_spotify_album_details_batch",
+            new=fake_batch,
+        ),
+    ):
+        rows = await asyncio.wait_for(
+            _fetch_spotify_misses(job_id, cache_misses, cache_hits), timeout=5
+        )
+
+    assert len(rows) == 21
+    assert len(cache_hits) == 21
+
+
+@pytest.mark.asyncio
+async def test_search_phase_resolves_heavy_artist_from_catalog():
+    """
+    GIVEN three misses by one artist and one by another
+    WHEN the artist's catalog contains two of the three albums
+    THEN those two match without a search; only the leftover and the other
+    artist's album are searched.
+    """
+    job_id = create_job(TEST_JOB_PARAMS)
+
+    def miss(artist, album):
+        return {
+            "original_artist": artist,
+            "original_album": album,
+            "play_count": 10,
+            "track_counts": {"t": 10},
+        }
+
+    cache_misses = {
+        ("beatles", "abbey road"): miss("Beatles", "Abbey Road"),
+        ("beatles", "help"): miss("Beatles", "Help"),
+        ("beatles", "bootleg"): miss("Beatles", "Bootleg"),
+        ("solo", "album"): miss("Solo", "Album"),
+    }
+    catalog = {"abbey road": {"id": "sp-ar"}, "help": {"id": "sp-help"}}
+    searched = []
+
+    async def search(session, artist, album, token):
+        searched.append((artist, album))
+        return {"id": f"sp-{album}"}
+
+    with (
+        patch(
+            "scrobblescope.orchestrator.fetch_spotify_artist_catalog",
+            new=AsyncMock(return_value=catalog),
+        ) as mock_catalog,
+        patch("scrobblescope.orchestrator.search_for_spotify_album", new=search),
+        patch("scrobblescope.orchestrator.SPOTIFY_ARTIST_CATALOG_MIN_MISSES", 3),
+        patch("scrobblescope.orchestrator.set_job_progress"),
+    ):
+        id_to_key, _ = await _run_spotify_search_phase(
+            job_id, AsyncMock(), cache_misses, "tok"
+        )
+
+    assert mock_catalog.await_args[0][1] == "beatles"
+    assert sorted(searched) == [("beatles", "bootleg"), ("solo", "album")]
+    assert id_to_key == {
+        "sp-ar": ("beatles", "abbey road"),
+        "sp-help": ("beatles", "help"),
+        "sp-bootleg": ("beatles", "bootleg"),
+        "sp-album": ("solo", "album"),
+    }
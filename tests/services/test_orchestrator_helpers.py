@@ -4,7 +4,8 @@ from unittest.mock import patch
 import pytest
 
 from scrobblescope.orchestrator import (
-    _PLAYTIME_ALBUM_CAP,
+    _AlbumAccumulator,
+    _apply_playtime_miss_budget,
     _apply_post_slice,
     _apply_pre_slice,
     _build_results,
@@ -12,8 +13,11 @@ from scrobblescope.orchestrator import (
     _detect_spotify_total_failure,
     _get_user_friendly_reason,
     _matches_release_criteria,
+    _resolve_ingest_mode,
+    _start_spotify_prefetch,
 )
 from scrobblescope.repositories import create_job
+from scrobblescope.scrobbles import ScrobbleBatch
 from tests.helpers import TEST_JOB_PARAMS
 
 # =====================================================================
@@ -127,17 +131,54 @@ def test_apply_pre_slice_playcount_scoped_release_no_slice():
     assert len(result) == 5
 
 
-def test_apply_pre_slice_playtime_cap_fires():
-    """501 albums, sort_mode='playtime' -> capped at _PLAYTIME_ALBUM_CAP."""
+def test_apply_pre_slice_never_caps_playtime():
+    """501 albums, sort_mode='playtime' -> all kept (the budget is per miss)."""
     albums = {
         (f"a{i}", f"b{i}"): {"play_count": 1000 - i, "track_counts": {}}
         for i in range(501)
     }
     result = _apply_pre_slice(albums, "playtime", "all", "all")
-    assert len(result) == _PLAYTIME_ALBUM_CAP
+    assert len(result) == 501
 
 
-def test_apply_pre_slice_playtime_below_cap_unchanged():
+def test_playtime_miss_budget_keeps_prefetched_then_top_play_counts(caplog):
+    """
+    GIVEN four misses, a budget of 2 and one low-play miss already prefetched
+    WHEN _apply_playtime_miss_budget runs
+    THEN the prefetched miss and the highest-play miss are kept, two are
+    skipped and the cut is logged as a warning.
+    """
+    misses = {("a", f"b{i}"): {"play_count": i} for i in range(4)}
+    with (
+        patch("scrobblescope.orchestrator.PLAYTIME_SPOTIFY_MISS_BUDGET", 2),
+        caplog.at_level(logging.WARNING),
+    ):
+        kept, _, skipped = _apply_playtime_miss_budget(misses, {("a", "b0"): {}})
+
+    assert set(kept) == {("a", "b0"), ("a", "b3")}
+    assert skipped == (2, 0)
+    assert "Playtime miss budget applied" in caplog.text
+    assert _apply_playtime_miss_budget(kept, {}) == (kept, {}, (0, 0))
+
+
+def test_playtime_miss_budget_counts_duration_backfills():
+    """
+    GIVEN two misses and three lite hits needing durations, a budget of 3
+    WHEN _apply_playtime_miss_budget runs
+    THEN misses and backfills share it by play count: both misses and the
+    most-played backfill are kept.
+    """
+    misses = {("a", "m1"): {"play_count": 50}, ("a", "m2"): {"play_count": 5}}
+    lite = {("a", f"l{i}"): {"play_count": i} for i in range(3)}
+    with patch("scrobblescope.orchestrator.PLAYTIME_SPOTIFY_MISS_BUDGET", 3):
+        kept, backfill, skipped = _apply_playtime_miss_budget(misses, {}, lite)
+
+    assert set(kept) == {("a", "m1"), ("a", "m2")}
+    assert set(backfill) == {("a", "l2")}
+    assert skipped == (0, 2)
+
+
+def test_apply_pre_slice_playtime_below_budget_unchanged():
     """5 albums, sort_mode='playtime' -> all 5 returned."""
     albums = {
         (f"a{i}", f"b{i}"): {"play_count": 10, "track_counts": {}} for i in range(5)
@@ -216,3 +257,38 @@ def test_detect_spotify_total_failure_does_not_fire_partial_match():
         },
     ):
         assert _detect_spotify_total_failure(job_id, [], filtered) is False
+
+
+def test_resolve_ingest_mode_only_charts_play_counts():
+    """Charts only apply to playcount sorting; bad overrides use the default."""
+    assert _resolve_ingest_mode("playtime", "charts") == "scan"
+    assert _resolve_ingest_mode("playcount", "charts") == "charts"
+    with patch("scrobblescope.orchestrator.LASTFM_INGEST_MODE", "auto"):
+        assert _resolve_ingest_mode("playcount", None) == "auto"
+        assert _resolve_ingest_mode("playcount", "bogus") == "auto"
+
+
+def test_accumulator_reports_album_once_when_it_qualifies():
+    """
+    GIVEN min_plays=3 and min_tracks=2
+    WHEN an album's third play and second distinct track arrive, followed by
+    more plays
+    THEN on_qualified is called exactly once, at the crossing scrobble.
+    """
+    qualified = []
+    acc = _AlbumAccumulator(0, 100, 3, 2, qualified.append)
+    batch = ScrobbleBatch()
+    for ts, track in [(1, "One"), (2, "One"), (3, "One"), (4, "Two"), (5, "Two")]:
+        batch.append(ts, "Artist", "Album", track)
+        acc.add(batch, len(batch) - 1, len(batch))
+        if ts == 3:
+            assert qualified == []
+
+    assert qualified == [("artist", "album")]
+    assert set(acc.filtered(3, 2)) == set(qualified)
+
+
+def test_start_spotify_prefetch_skips_preslice_and_disabled():
+    assert _start_spotify_prefetch("playcount", "10", "all") is None
+    with patch("scrobblescope.orchestrator.SPOTIFY_PREFETCH_ENABLED", False):
+        assert _start_spotify_prefetch("playtime", "all", "all") is None
@@ -1,10 +1,11 @@
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
 from scrobblescope.errors import SpotifyUnavailableError
 from scrobblescope.orchestrator import process_albums
-from scrobblescope.repositories import create_job, get_job_progress
+from scrobblescope.repositories import create_job, get_job_context, get_job_progress
 from tests.helpers import TEST_JOB_PARAMS
 
 
@@ -13,8 +14,9 @@ async def test_process_albums_cache_hit_skips_spotify():
     """
     GIVEN all albums exist in the DB cache
     WHEN process_albums is called
-    THEN it should NOT call fetch_spotify_access_token and should
-    build results from cached metadata only.
+    THEN it should NOT call fetch_spotify_access_token, should
+    build results from cached metadata only and report the hits to the
+    refresh-ahead sweep.
     """
     job_id = create_job(TEST_JOB_PARAMS)
     filtered = {
@@ -47,18 +49,18 @@ async def test_process_albums_cache_hit_skips_spotify():
             new_callable=AsyncMock,
             return_value=mock_cached,
         ),
-        patch(
-            "scrobblescope.orchestrator._batch_persist_metadata", new_callable=AsyncMock
-        ),
+        patch("scrobblescope.orchestrator.queue_metadata_rows"),
         patch(
             "scrobblescope.orchestrator.fetch_spotify_access_token",
             new_callable=AsyncMock,
         ) as mock_token,
+        patch("scrobblescope.orchestrator.note_cache_hits") as mock_note,
     ):
         results = await process_albums(job_id, filtered, 1997, "playcount", "same")
 
     mock_token.assert_not_awaited()
     mock_conn.close.assert_awaited_once()
+    assert list(mock_note.call_args[0][0]) == [("radiohead", "ok computer")]
 
     progress = get_job_progress(job_id)
     assert progress is not None
@@ -76,7 +78,7 @@ async def test_process_albums_cache_miss_fetches_and_persists():
     GIVEN no albums exist in the DB cache
     WHEN process_albums is called
     THEN it should call Spotify search + detail fetch, build results,
-    and persist the new metadata to DB.
+    and queue the new metadata for the DB cache.
     """
     job_id = create_job(TEST_JOB_PARAMS)
     filtered = {
@@ -105,10 +107,7 @@ async def test_process_albums_cache_miss_fetches_and_persists():
             new_callable=AsyncMock,
             return_value={},
         ),
-        patch(
-            "scrobblescope.orchestrator._batch_persist_metadata",
-            new_callable=AsyncMock,
-        ) as mock_persist,
+        patch("scrobblescope.orchestrator.queue_metadata_rows") as mock_queue,
         patch(
             "scrobblescope.orchestrator.fetch_spotify_access_token",
             new_callable=AsyncMock,
@@ -119,9 +118,13 @@ async def test_process_albums_cache_miss_fetches_and_persists():
             return_value=mock_session_ctx,
         ),
         patch(
-            "scrobblescope.orchestrator.search_for_spotify_album_id",
+            "scrobblescope.orchestrator.search_for_spotify_album",
             new_callable=AsyncMock,
-            return_value="sp1",
+            return_value={
+                "id": "sp1",
+                "release_date": "2025-01-01",
+                "images": [{"url": "https://img.example.com/a.jpg"}],
+            },
         ),
         patch(
             "scrobblescope.orchestrator.fetch_spotify_album_details_batch",
@@ -137,8 +140,8 @@ async def test_process_albums_cache_miss_fetches_and_persists():
     ):
         results = await process_albums(job_id, filtered, 2025, "playcount", "same")
 
-    mock_persist.assert_awaited_once()
-    persist_rows = mock_persist.call_args[0][1]
+    mock_queue.assert_called_once()
+    persist_rows = mock_queue.call_args[0][0]
     assert len(persist_rows) == 1
     assert persist_rows[0][2] == "sp1"
 
@@ -190,9 +193,13 @@ async def test_process_albums_db_unavailable_falls_back():
             return_value=mock_session_ctx,
         ),
         patch(
-            "scrobblescope.orchestrator.search_for_spotify_album_id",
+            "scrobblescope.orchestrator.search_for_spotify_album",
             new_callable=AsyncMock,
-            return_value="sp1",
+            return_value={
+                "id": "sp1",
+                "release_date": "2025-01-01",
+                "images": [{"url": "https://img.example.com/a.jpg"}],
+            },
         ),
         patch(
             "scrobblescope.orchestrator.fetch_spotify_album_details_batch",
@@ -250,9 +257,7 @@ async def test_process_albums_conn_always_closed():
             new_callable=AsyncMock,
             return_value={},
         ),
-        patch(
-            "scrobblescope.orchestrator._batch_persist_metadata", new_callable=AsyncMock
-        ),
+        patch("scrobblescope.orchestrator.queue_metadata_rows"),
         patch(
             "scrobblescope.orchestrator.fetch_spotify_access_token",
             new_callable=AsyncMock,
@@ -263,7 +268,7 @@ async def test_process_albums_conn_always_closed():
             return_value=mock_session_ctx,
         ),
         patch(
-            "scrobblescope.orchestrator.search_for_spotify_album_id",
+            "scrobblescope.orchestrator.search_for_spotify_album",
             new_callable=AsyncMock,
             side_effect=RuntimeError("Spotify exploded"),
         ),
@@ -295,9 +300,7 @@ async def test_process_albums_empty_input():
             new_callable=AsyncMock,
             return_value={},
         ),
-        patch(
-            "scrobblescope.orchestrator._batch_persist_metadata", new_callable=AsyncMock
-        ),
+        patch("scrobblescope.orchestrator.queue_metadata_rows"),
     ):
         results = await process_albums(job_id, {}, 2025, "playcount", "same")
 
@@ -406,3 +409,488 @@ async def test_process_albums_partial_cache_token_failure_uses_cached_results():
     assert progress["stats"]["db_cache_enabled"] is True
     mock_token.assert_awaited_once()
     mock_conn.close.assert_awaited_once()
+
+
+def _lite_cached_album():
+    """A cache row written by the lite path: no durations fetched yet."""
+    return {
+        ("radiohead", "ok computer"): {
+            "spotify_id": "abc123",
+            "release_date": "1997-06-16",
+            "album_image_url": "https://img.example.com/ok.jpg",
+            "track_durations": None,
+        }
+    }
+
+
+_OK_COMPUTER = {
+    ("radiohead", "ok computer"): {
+        "play_count": 18,
+        "track_counts": {"paranoid android": 10, "karma police": 8},
+        "original_artist": "Radiohead",
+        "original_album": "OK Computer",
+    }
+}
+
+
+@pytest.mark.asyncio
+async def test_process_albums_playtime_backfills_missing_durations():
+    """
+    GIVEN a cache hit whose durations were never fetched
+    WHEN a playtime job processes it
+    THEN album details are fetched for the stored Spotify ID without a new
+    search, playtime is computed, and the durations are persisted.
+    """
+    job_id = create_job(TEST_JOB_PARAMS)
+    mock_conn = AsyncMock()
+    mock_session_ctx = MagicMock()
+    mock_session_ctx.__aenter__ = AsyncMock(return_value=AsyncMock())
+    mock_session_ctx.__aexit__ = AsyncMock(return_value=False)
+
+    with (
+        patch(
+            "scrobblescope.orchestrator._get_db_connection",
+            new_callable=AsyncMock,
+            return_value=mock_conn,
+        ),
+        patch(
+            "scrobblescope.orchestrator._batch_lookup_metadata",
+            new_callable=AsyncMock,
+            return_value=_lite_cached_album(),
+        ),
+        patch("scrobblescope.orchestrator.queue_metadata_rows") as mock_queue,
+        patch(
+            "scrobblescope.orchestrator.fetch_spotify_access_token",
+            new_callable=AsyncMock,
+            return_value="tok",
+        ),
+        patch(
+            "scrobblescope.orchestrator.create_optimized_session",
+            return_value=mock_session_ctx,
+        ),
+        patch(
+            "scrobblescope.orchestrator.search_for_spotify_album",
+            new_callable=AsyncMock,
+        ) as mock_search,
+        patch(
+            "scrobblescope.orchestrator.fetch_spotify_album_details_batch",
+            new_callable=AsyncMock,
+            return_value={
+                "abc123": {
+                    "release_date": "1997-06-16",
+                    "images": [{"url": "https://img.example.com/ok.jpg"}],
+                    "tracks": {
+                        "items": [
+                            {"name": "Paranoid Android", "duration_ms": 383000},
+                            {"name": "Karma Police", "duration_ms": 264000},
+                        ]
+                    },
+                }
+            },
+        ) as mock_batch,
+    ):
+        results = await process_albums(job_id, _OK_COMPUTER, 1997, "playtime", "same")
+
+    mock_search.assert_not_called()
+    assert mock_batch.call_args[0][1] == ["abc123"]
+    assert results[0]["play_time_seconds"] == 383 * 10 + 264 * 8
+    persisted = mock_queue.call_args[0][0]
+    assert persisted[0][5] == {"paranoid android": 383, "karma police": 264}
+
+
+@pytest.mark.asyncio
+async def test_process_albums_playcount_uses_lite_hit_without_spotify():
+    job_id = create_job(TEST_JOB_PARAMS)
+
+    with (
+        patch(
+            "scrobblescope.orchestrator._get_db_connection",
+            new_callable=AsyncMock,
+            return_value=AsyncMock(),
+        ),
+        patch(
+            "scrobblescope.orchestrator._batch_lookup_metadata",
+            new_callable=AsyncMock,
+            return_value=_lite_cached_album(),
+        ),
+        patch(
+            "scrobblescope.orchestrator.fetch_spotify_access_token",
+            new_callable=AsyncMock,
+        ) as mock_token,
+    ):
+        results = await process_albums(job_id, _OK_COMPUTER, 1997, "playcount", "same")
+
+    mock_token.assert_not_awaited()
+    assert results[0]["play_count"] == 18
+    assert results[0]["play_time_seconds"] == 0
+
+
+@pytest.mark.asyncio
+async def test_process_albums_reuses_prefetched_lookups_and_searches():
+    """
+    GIVEN a prefetch that found one album in the DB cache and searched
+    another, plus one album it never saw
+    WHEN process_albums runs with it
+    THEN only the unseen album is looked up and searched, and all three
+    reach the results.
+    """
+    job_id = create_job(TEST_JOB_PARAMS)
+
+    def album(name):
+        return {
+            "play_count": 20,
+            "track_counts": {"song": 20},
+            "original_artist": "Artist",
+            "original_album": name,
+        }
+
+    filtered = {("artist", n): album(n) for n in ["cached", "searched", "late"]}
+    prefetched = SimpleNamespace(
+        cached={
+            ("artist", "cached"): {
+                "spotify_id": "sp-cached",
+                "release_date": "1997-01-01",
+                "album_image_url": None,
+                "track_durations": None,
+            }
+        },
+        no_match=set(),
+        looked_up={("artist", "cached"), ("artist", "searched")},
+        search_hits={("artist", "searched"): {"id": "sp-searched"}},
+    )
+    session_ctx = MagicMock()
+    session_ctx.__aenter__ = AsyncMock(return_value=AsyncMock())
+    session_ctx.__aexit__ = AsyncMock(return_value=False)
+
+    with (
+        patch(
+            "scrobblescope.orchestrator._get_db_connection",
+            new_callable=AsyncMock,
+            return_value=AsyncMock(),
+        ),
+        patch(
+            "scrobblescope.orchestrator._batch_lookup_metadata",
+            new_callable=AsyncMock,
+            return_value={},
+        ) as mock_lookup,
+        patch("scrobblescope.orchestrator.queue_metadata_rows"),
+        patch(
+            "scrobblescope.orchestrator.fetch_spotify_access_token",
+            new_callable=AsyncMock,
+            return_value="tok",
+        ),
+        patch(
+            "scrobblescope.orchestrator.create_optimized_session",
+            return_value=session_ctx,
+        ),
+        patch(
+            "scrobblescope.orchestrator.search_for_spotify_album",
+            new_callable=AsyncMock,
+            return_value={"id": "sp-late"},
+        ) as mock_search,
+    ):
+        results = await process_albums(
+            job_id, filtered, 1997, "playcount", "all", prefetched=prefetched
+        )
+
+    assert mock_lookup.call_args[0][1] == [("artist", "late")]
+    mock_search.assert_awaited_once()
+    assert mock_search.call_args[0][1:3] == ("artist", "late")
+    assert {r["spotify_id"] for r in results} == {"sp-cached", "sp-searched", "sp-late"}
+    stats = get_job_progress(job_id)["stats"]
+    assert stats["spotify_prefetched"] == 1
+
+
+@pytest.mark.asyncio
+async def test_process_albums_negative_cache_skips_and_records_no_match():
+    """
+    GIVEN one album in the no-match cache, one Spotify answers with no match
+    and one whose search fails
+    WHEN process_albums runs
+    THEN the cached album is not searched, only the real no match is
+    persisted, and all three are reported unmatched.
+    """
+    job_id = create_job(TEST_JOB_PARAMS)
+    filtered = {
+        ("artist", name): {
+            "play_count": 20,
+            "track_counts": {"song": 20},
+            "original_artist": "Artist",
+            "original_album": name,
+        }
+        for name in ["known", "gone", "flaky"]
+    }
+    session_ctx = MagicMock()
+    session_ctx.__aenter__ = AsyncMock(return_value=AsyncMock())
+    session_ctx.__aexit__ = AsyncMock(return_value=False)
+
+    async def search(session, artist, album, token):
+        return {} if album == "gone" else None
+
+    with (
+        patch(
+            "scrobblescope.orchestrator._get_db_connection",
+            new_callable=AsyncMock,
+            return_value=AsyncMock(),
+        ),
+        patch(
+            "scrobblescope.orchestrator._batch_lookup_metadata",
+            new_callable=AsyncMock,
+            return_value={},
+        ),
+        patch(
+            "scrobblescope.orchestrator._batch_lookup_no_match",
+            new_callable=AsyncMock,
+            return_value={("artist", "known")},
+        ),
+        patch("scrobblescope.orchestrator.queue_no_match") as mock_queue_no_match,
+        patch(
+            "scrobblescope.orchestrator.fetch_spotify_access_token",
+            new_callable=AsyncMock,
+            return_value="tok",
+        ),
+        patch(
+            "scrobblescope.orchestrator.create_optimized_session",
+            return_value=session_ctx,
+        ),
+        patch("scrobblescope.orchestrator.search_for_spotify_album", new=search),
+    ):
+        results = await process_albums(job_id, filtered, 2025, "playcount", "all")
+
+    assert results == []
+    assert mock_queue_no_match.call_args[0][0] == {("artist", "gone")}
+    unmatched = get_job_context(job_id)["unmatched"]
+    assert {v["album"] for v in unmatched.values()} == {"known", "gone", "flaky"}
+    stats = get_job_progress(job_id)["stats"]
+    assert stats["db_no_match_hits"] == 1
+    assert stats["db_no_match_persisted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_process_albums_playtime_budget_bounds_only_misses():
+    """
+    GIVEN a playtime job with two cached albums, three misses and a miss
+    budget of one
+    WHEN process_albums runs
+    THEN both cached albums are ranked, only the most-played miss goes to
+    Spotify and the other two are counted as skipped, not unmatched.
+    """
+    job_id = create_job(TEST_JOB_PARAMS)
+    filtered = {
+        ("artist", name): {
+            "play_count": plays,
+            "track_counts": {"song": plays},
+            "original_artist": "Artist",
+            "original_album": name,
+        }
+        for name, plays in [
+            ("hit1", 1),
+            ("hit2", 2),
+            ("miss1", 10),
+            ("miss2", 30),
+            ("miss3", 20),
+        ]
+    }
+    cached = {
+        ("artist", name): {
+            "spotify_id": f"sp-{name}",
+            "release_date": "2025-01-01",
+            "album_image_url": None,
+            "track_durations": {"song": 200},
+        }
+        for name in ["hit1", "hit2"]
+    }
+
+    with (
+        patch(
+            "scrobblescope.orchestrator._get_db_connection",
+            new_callable=AsyncMock,
+            return_value=AsyncMock(),
+        ),
+        patch(
+            "scrobblescope.orchestrator._batch_lookup_metadata",
+            new_callable=AsyncMock,
+            return_value=cached,
+        ),
+        patch(
+            "scrobblescope.orchestrator._batch_lookup_no_match",
+            new_callable=AsyncMock,
+            return_value=set(),
+        ),
+        patch(
+            "scrobblescope.orchestrator._fetch_spotify_misses",
+            new_callable=AsyncMock,
+            return_value=[],
+        ) as mock_fetch,
+        patch("scrobblescope.orchestrator.PLAYTIME_SPOTIFY_MISS_BUDGET", 1),
+    ):
+        results = await process_albums(job_id, filtered, 2025, "playtime", "all")
+
+    assert list(mock_fetch.call_args[0][1]) == [("artist", "miss2")]
+    assert {r["spotify_id"] for r in results} == {"sp-hit1", "sp-hit2"}
+    stats = get_job_progress(job_id)["stats"]
+    assert stats["playtime_misses_skipped"] == 2
+    assert stats["spotify_unmatched"] == 1
+
+
+@pytest.mark.asyncio
+async def test_process_albums_playtime_budget_bounds_duration_backfill():
+    """
+    GIVEN a playtime job whose five albums are all lite cache hits (no
+    durations) and a budget of two
+    WHEN process_albums runs
+    THEN only the two most-played are backfilled from Spotify; the other
+    three are skipped, not ranked with zero play time.
+    """
+    job_id = create_job(TEST_JOB_PARAMS)
+    filtered = {
+        ("artist", f"lite{plays}"): {
+            "play_count": plays,
+            "track_counts": {"song": plays},
+            "original_artist": "Artist",
+            "original_album": f"lite{plays}",
+        }
+        for plays in range(1, 6)
+    }
+    cached = {
+        key: {
+            "spotify_id": f"sp-{key[1]}",
+            "release_date": "2025-01-01",
+            "album_image_url": None,
+            "track_durations": None,
+        }
+        for key in filtered
+    }
+
+    with (
+        patch(
+            "scrobblescope.orchestrator._get_db_connection",
+            new_callable=AsyncMock,
+            return_value=AsyncMock(),
+        ),
+        patch(
+            "scrobblescope.orchestrator._batch_lookup_metadata",
+            new_callable=AsyncMock,
+            return_value=cached,
+        ),
+        patch(
+            "scrobblescope.orchestrator._batch_lookup_no_match",
+            new_callable=AsyncMock,
+            return_value=set(),
+        ),
+        patch(
+            "scrobblescope.orchestrator._fetch_spotify_misses",
+            new_callable=AsyncMock,
+            return_value=[],
+        ) as mock_fetch,
+        patch("scrobblescope.orchestrator.PLAYTIME_SPOTIFY_MISS_BUDGET", 2),
+    ):
+        results = await process_albums(job_id, filtered, 2025, "playtime", "all")
+
+    backfill = mock_fetch.call_args[0][4]
+    assert set(backfill) == {("artist", "lite5"), ("artist", "lite4")}
+    assert {r["spotify_id"] for r in results} == {"sp-lite5", "sp-lite4"}
+    stats = get_job_progress(job_id)["stats"]
+    assert stats["playtime_backfill_skipped"] == 3
+    assert stats["spotify_unmatched"] == 0
+
+
+@pytest.mark.asyncio
+async def test_process_albums_hot_tier_serves_albums_while_db_is_down():
+    """
+    GIVEN an album in the in-memory hot tier and no DB connection
+    WHEN process_albums is called
+    THEN the album is served from memory without any Spotify call.
+    """
+    from scrobblescope import cache
+
+    job_id = create_job(TEST_JOB_PARAMS)
+    cache._METADATA_HOT.set(
+        ("artist", "album"),
+        {
+            "spotify_id": "sp1",
+            "release_date": "2025-01-01",
+            "album_image_url": "https://img.example.com/a.jpg",
+            "track_durations": {"track one": 240},
+        },
+    )
+    filtered = {
+        ("artist", "album"): {
+            "play_count": 20,
+            "track_counts": {"track one": 5},
+            "original_artist": "Artist",
+            "original_album": "Album",
+        }
+    }
+
+    with (
+        patch(
+            "scrobblescope.orchestrator._get_db_connection",
+            new_callable=AsyncMock,
+            return_value=None,
+        ),
+        patch(
+            "scrobblescope.orchestrator.fetch_spotify_access_token",
+            new_callable=AsyncMock,
+        ) as mock_token,
+    ):
+        results = await process_albums(job_id, filtered, 2025, "playtime", "same")
+
+    progress = get_job_progress(job_id)
+    assert [r["spotify_id"] for r in results] == ["sp1"]
+    assert progress["stats"]["memory_cache_hits"] == 1
+    mock_token.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_process_albums_queues_new_rows_while_db_is_down():
+    """
+    GIVEN no DB connection and two albums, one found on Spotify and one not
+    WHEN process_albums is called
+    THEN both answers are still handed to the write-behind queue, which has
+    its own connection and fills the hot tier.
+    """
+    job_id = create_job(TEST_JOB_PARAMS)
+    filtered = {
+        (artist, album): {
+            "play_count": 20,
+            "track_counts": {"song": 20},
+            "original_artist": artist,
+            "original_album": album,
+        }
+        for artist, album in [("artist", "found"), ("artist", "missing")]
+    }
+
+    async def search(session, artist, album, token):
+        return {"id": "sp1", "release_date": "2025-01-01"} if album == "found" else {}
+
+    session_ctx = MagicMock()
+    session_ctx.__aenter__ = AsyncMock(return_value=AsyncMock())
+    session_ctx.__aexit__ = AsyncMock(return_value=False)
+    queue_rows = MagicMock()
+    queue_keys = MagicMock()
+    with (
+        patch(
+            "scrobblescope.orchestrator._get_db_connection",
+            new_callable=AsyncMock,
+            return_value=None,
+        ),
+        patch(
+            "scrobblescope.orchestrator.fetch_spotify_access_token",
+            new=AsyncMock(return_value="tok"),
+        ),
+        patch(
+            "scrobblescope.orchestrator.create_optimized_session",
+            return_value=session_ctx,
+        ),
+        patch("scrobblescope.orchestrator.search_for_spotify_album", new=search),
+        patch("scrobblescope.orchestrator.queue_metadata_rows", new=queue_rows),
+        patch("scrobblescope.orchestrator.queue_no_match", new=queue_keys),
+    ):
+        results = await process_albums(job_id, filtered, 2025, "playcount", "all")
+
+    assert [r["spotify_id"] for r in results] == ["sp1"]
+    assert [row[:3] for row in queue_rows.call_args[0][0]] == [
+        ("artist", "found", "sp1")
+    ]
+    queue_keys.assert_called_once_with({("artist", "missing")})
@@ -0,0 +1,173 @@
+"""Tests for scrobblescope.spotify_prefetch -- enrichment overlapping the fetch.
+
+Covers:
+- DB hits are kept, misses are searched, and finish waits for the searches.
+- The search limit caps searches; adds after finish are ignored.
+- A failed DB lookup searches nothing and leaves the keys to process_albums.
+- A failed search is not recorded, so process_albums searches it again.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from scrobblescope.spotify_prefetch import SpotifyPrefetch
+
+_CACHED_ROW = {
+    "spotify_id": "cached1",
+    "release_date": "1997-06-16",
+    "album_image_url": None,
+    "track_durations": None,
+}
+
+
+def _patches(conn, lookup, search):
+    session_ctx = MagicMock()
+    session_ctx.__aenter__ = AsyncMock(return_value=AsyncMock())
+    session_ctx.__aexit__ = AsyncMock(return_value=False)
+    return (
+        patch(
+            "scrobblescope.spotify_prefetch._get_db_connection",
+            new=AsyncMock(return_value=conn),
+        ),
+        patch("scrobblescope.spotify_prefetch._batch_lookup_metadata", new=lookup),
+        patch(
+            "scrobblescope.spotify_prefetch.fetch_spotify_access_token",
+            new=AsyncMock(return_value="tok"),
+        ),
+        patch(
+            "scrobblescope.spotify_prefetch.create_optimized_session",
+            return_value=session_ctx,
+        ),
+        patch("scrobblescope.spotify_prefetch.search_for_spotify_album", new=search),
+    )
+
+
+@pytest.mark.asyncio
+async def test_prefetch_looks_up_then_searches_misses():
+    """
+    GIVEN one album in the DB cache and two that are not
+    WHEN the three keys are added and the prefetch is finished
+    THEN the hit is kept, both misses are searched (one without a match) and
+    the connection is closed.
+    """
+    conn = AsyncMock()
+    lookup = AsyncMock(return_value={("a", "cached"): _CACHED_ROW})
+
+    async def search(session, artist, album, token):
+        await asyncio.sleep(0)
+        return {"id": f"sp-{album}"} if album == "found" else {}
+
+    p1, p2, p3, p4, p5 = _patches(conn, lookup, search)
+    with p1, p2, p3, p4, p5:
+        prefetch = SpotifyPrefetch()
+        for key in [("a", "cached"), ("a", "found"), ("a", "missing")]:
+            prefetch.add(key)
+        await prefetch.finish()
+
+    assert prefetch.cached == {("a", "cached"): _CACHED_ROW}
+    assert prefetch.looked_up == {("a", "cached"), ("a", "found"), ("a", "missing")}
+    assert prefetch.search_hits == {
+        ("a", "found"): {"id": "sp-found"},
+        ("a", "missing"): {},
+    }
+    conn.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_prefetch_search_limit_and_adds_after_finish_are_ignored():
+    lookup = AsyncMock(return_value={})
+    search = AsyncMock(return_value={})
+
+    p1, p2, p3, p4, p5 = _patches(None, lookup, search)
+    with p1, p2, p3, p4, p5:
+        prefetch = SpotifyPrefetch(search_limit=2)
+        for name in ["one", "two", "three"]:
+            prefetch.add(("a", name))
+        await prefetch.finish()
+        prefetch.add(("a", "late"))
+
+    assert prefetch.taken == 3
+    assert set(prefetch.search_hits) == {("a", "one"), ("a", "two")}
+    lookup.assert_not_awaited()  # no DB: misses go straight to search
+    assert prefetch.looked_up == set()
+
+
+@pytest.mark.asyncio
+async def test_prefetch_db_failure_searches_nothing():
+    lookup = AsyncMock(side_effect=RuntimeError("db down"))
+    search = AsyncMock()
+
+    p1, p2, p3, p4, p5 = _patches(AsyncMock(), lookup, search)
+    with p1, p2, p3, p4, p5:
+        prefetch = SpotifyPrefetch()
+        prefetch.add(("a", "b"))
+        await prefetch.finish()
+
+    search.assert_not_awaited()
+    assert prefetch.looked_up == set()
+    assert prefetch.search_hits == {}
+
+
+@pytest.mark.asyncio
+async def test_failed_prefetch_search_is_searched_again_by_process_albums():
+    """
+    GIVEN a prefetch whose search for an album fails (None, not "no match")
+    WHEN process_albums runs with it and Spotify answers this time
+    THEN the album is searched again and matched.
+    """
+    from scrobblescope.orchestrator import process_albums
+    from scrobblescope.repositories import create_job
+    from tests.helpers import TEST_JOB_PARAMS
+
+    key = ("artist", "flaky")
+    failing_search = AsyncMock(return_value=None)
+    p1, p2, p3, p4, p5 = _patches(None, AsyncMock(), failing_search)
+    with p1, p2, p3, p4, p5:
+        prefetch = SpotifyPrefetch()
+        prefetch.add(key)
+        await prefetch.finish()
+    failing_search.assert_awaited_once()
+    assert prefetch.search_hits == {}
+
+    session_ctx = MagicMock()
+    session_ctx.__aenter__ = AsyncMock(return_value=AsyncMock())
+    session_ctx.__aexit__ = AsyncMock(return_value=False)
+    filtered = {
+        key: {
+            "play_count": 20,
+            "track_counts": {"song": 20},
+            "original_artist": "Artist",
+            "original_album": "Flaky",
+        }
+    }
+    with (
+        patch(
+            "scrobblescope.orchestrator._get_db_connection",
+            new=AsyncMock(return_value=None),
+        ),
+        patch(
+            "scrobblescope.orchestrator.fetch_spotify_access_token",
+            new=AsyncMock(return_value="tok"),
+        ),
+        patch(
+            "scrobblescope.orchestrator.create_optimized_session",
+            return_value=session_ctx,
+        ),
+        patch(
+            "scrobblescope.orchestrator.search_for_spotify_album",
+            new=AsyncMock(return_value={"id": "sp-flaky", "release_date": "1997"}),
+        ) as mock_search,
+    ):
+        results = await process_albums(
+            create_job(TEST_JOB_PARAMS),
+            filtered,
+            1997,
+            "playcount",
+            "all",
+            prefetched=prefetch,
+        )
+
+    mock_search.assert_awaited_once()
+    assert [r["spotify_id"] for r in results] == ["sp-flaky"]
@@ -1,3 +1,4 @@
+import asyncio
 import time
 from unittest.mock import AsyncMock, MagicMock, patch
 
@@ -6,7 +7,10 @@ import pytest
 from scrobblescope.spotify import (
     fetch_spotify_access_token,
     fetch_spotify_album_details_batch,
+    fetch_spotify_artist_catalog,
+    search_for_spotify_album,
     search_for_spotify_album_id,
+    warm_spotify_token,
 )
 from tests.helpers import NoopAsyncContext, make_response_context
 
@@ -35,10 +39,9 @@ async def test_search_for_spotify_album_id_retries_429_then_returns_id():
         make_response_context(resp_200),
     ]
 
+    limiter = NoopAsyncContext()
     with (
-        patch(
-            "scrobblescope.spotify.get_spotify_limiter", return_value=NoopAsyncContext()
-        ),
+        patch("scrobblescope.spotify.get_spotify_limiter", return_value=limiter),
         patch("asyncio.sleep", new_callable=AsyncMock) as mock_sleep,
     ):
         result = await search_for_spotify_album_id(session, "Artist", "Album", "token")
@@ -46,6 +49,7 @@ async def test_search_for_spotify_album_id_retries_429_then_returns_id():
     assert result == "spotify_album_123"
     assert session.get.call_count == 2
     assert mock_sleep.await_count >= 1
+    assert limiter.back_offs == [1]
 
 
 @pytest.mark.asyncio
@@ -219,6 +223,186 @@ async def test_fetch_spotify_access_token_asserts_on_missing_credentials():
         await fetch_spotify_access_token()
 
 
+def _token_session(access_token, delay=0.01):
+    """A session context whose token POST answers after *delay* seconds."""
+    resp_200 = AsyncMock()
+    resp_200.status = 200
+
+    async def slow_json():
+        if delay:
+            await asyncio.sleep(delay)
+        return {"access_token": access_token, "expires_in": 3600}
+
+    resp_200.json = slow_json
+    mock_session = MagicMock()
+    mock_session.post.return_value = make_response_context(resp_200)
+    mock_session_ctx = MagicMock()
+    mock_session_ctx.__aenter__ = AsyncMock(return_value=mock_session)
+    mock_session_ctx.__aexit__ = AsyncMock(return_value=False)
+    return mock_session, mock_session_ctx
+
+
+def _token_patches(fake_cache, session_ctx, conn=None):
+    return (
+        patch("scrobblescope.spotify.spotify_token_cache", fake_cache),
+        patch("scrobblescope.spotify.SPOTIFY_CLIENT_ID", "test_id"),
+        patch("scrobblescope.spotify.SPOTIFY_CLIENT_SECRET", "test_secret"),
+        patch(
+            "scrobblescope.spotify.create_optimized_session",
+            return_value=session_ctx,
+        ),
+        patch(
+            "scrobblescope.spotify._get_db_connection",
+            new=AsyncMock(return_value=conn),
+        ),
+    )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_expired_callers_share_one_token_request():
+    """
+    GIVEN an expired token and three callers asking at once
+    WHEN fetch_spotify_access_token runs for all of them
+    THEN one token request is made and every caller gets its token.
+    """
+    fake_cache = {"token": "old", "expires_at": 0}
+    mock_session, session_ctx = _token_session("fresh_tok")
+
+    p1, p2, p3, p4, p5 = _token_patches(fake_cache, session_ctx)
+    with p1, p2, p3, p4, p5:
+        tokens = await asyncio.gather(*(fetch_spotify_access_token() for _ in range(3)))
+
+    assert tokens == ["fresh_tok"] * 3
+    assert mock_session.post.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_token_reuses_the_shared_database_token():
+    """
+    GIVEN an expired local token and a fresh token stored in Postgres
+    WHEN fetch_spotify_access_token runs
+    THEN the stored token is used without asking Spotify.
+    """
+    fake_cache = {"token": None, "expires_at": 0}
+    mock_session, session_ctx = _token_session("unused")
+    conn = AsyncMock()
+    shared = ("shared_tok", time.time() + 3000)
+
+    p1, p2, p3, p4, p5 = _token_patches(fake_cache, session_ctx, conn)
+    with (
+        p1,
+        p2,
+        p3,
+        p4,
+        p5,
+        patch(
+            "scrobblescope.spotify._load_spotify_token",
+            new=AsyncMock(return_value=shared),
+        ),
+    ):
+        token = await fetch_spotify_access_token()
+
+    assert token == "shared_tok"
+    assert fake_cache["expires_at"] == shared[1]
+    mock_session.post.assert_not_called()
+    conn.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_stale_shared_token_is_replaced_and_persisted():
+    """
+    GIVEN the stored token is itself about to expire
+    WHEN fetch_spotify_access_token runs
+    THEN a new token is requested and written back for other processes.
+    """
+    fake_cache = {"token": None, "expires_at": 0}
+    mock_session, session_ctx = _token_session("fresh_tok")
+    persist = AsyncMock()
+
+    p1, p2, p3, p4, p5 = _token_patches(fake_cache, session_ctx, AsyncMock())
+    with (
+        p1,
+        p2,
+        p3,
+        p4,
+        p5,
+        patch(
+            "scrobblescope.spotify._load_spotify_token",
+            new=AsyncMock(return_value=("stale_tok", time.time() + 10)),
+        ),
+        patch("scrobblescope.spotify._persist_spotify_token", new=persist),
+    ):
+        token = await fetch_spotify_access_token()
+
+    assert token == "fresh_tok"
+    _, stored_token, stored_expiry = persist.await_args[0]
+    assert (stored_token, stored_expiry) == ("fresh_tok", fake_cache["expires_at"])
+
+
+@pytest.mark.asyncio
+async def test_refresher_sleeps_until_the_refresh_ahead_point():
+    """
+    GIVEN a token with 1000s left and a 300s refresh-ahead window
+    WHEN the background refresher runs
+    THEN it sleeps about 700s, then replaces the token before it expires.
+    """
+    from scrobblescope.spotify import _keep_spotify_token_fresh
+
+    fake_cache = {"token": "old", "expires_at": time.time() + 1000}
+    mock_session, session_ctx = _token_session("fresh_tok", delay=0)
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) > 1:
+            raise asyncio.CancelledError
+        fake_cache["expires_at"] -= seconds  # time passes
+
+    p1, p2, p3, p4, p5 = _token_patches(fake_cache, session_ctx)
+    with (
+        p1,
+        p2,
+        p3,
+        p4,
+        p5,
+        patch("scrobblescope.spotify.SPOTIFY_TOKEN_REFRESH_AHEAD_SECONDS", 300),
+        patch("scrobblescope.spotify.asyncio.sleep", new=fake_sleep),
+    ):
+        with pytest.raises(asyncio.CancelledError):
+            await _keep_spotify_token_fresh()
+
+    assert sleeps[0] == pytest.approx(700, abs=5)
+    assert fake_cache["token"] == "fresh_tok"
+    assert sleeps[1] == pytest.approx(3300, abs=5)
+
+
+def test_warm_spotify_token_starts_one_refresher_with_credentials():
+    future = MagicMock()
+    future.done.return_value = False
+
+    def fake_submit(coro):
+        coro.close()
+        return future
+
+    submit = MagicMock(side_effect=fake_submit)
+    with (
+        patch("scrobblescope.spotify.submit", new=submit),
+        patch("scrobblescope.spotify._token_refresher", None),
+    ):
+        with patch("scrobblescope.spotify.SPOTIFY_CLIENT_ID", None):
+            warm_spotify_token()
+        assert submit.call_count == 0
+
+        with (
+            patch("scrobblescope.spotify.SPOTIFY_CLIENT_ID", "test_id"),
+            patch("scrobblescope.spotify.SPOTIFY_CLIENT_SECRET", "test_secret"),
+        ):
+            warm_spotify_token()
+            warm_spotify_token()
+
+    assert submit.call_count == 1
+
+
 # ------------------------------------------------------------------ #
 # search_for_spotify_album_id unhappy-path tests                       #
 # ------------------------------------------------------------------ #
@@ -247,6 +431,64 @@ async def test_search_returns_none_on_empty_results():
     assert result is None
 
 
+@pytest.mark.asyncio
+async def test_search_tells_no_match_from_failure():
+    """
+    GIVEN one search answered 200 with no items and one answered 500
+    WHEN search_for_spotify_album runs for each
+    THEN the empty answer is {} (cacheable no match) and the failure None.
+    """
+    empty = AsyncMock()
+    empty.status = 200
+    empty.json = AsyncMock(return_value={"albums": {"items": []}})
+    failed = AsyncMock()
+    failed.status = 500
+    session = MagicMock()
+    session.get.side_effect = [
+        make_response_context(empty),
+        make_response_context(failed),
+    ]
+
+    with patch(
+        "scrobblescope.spotify.get_spotify_limiter", return_value=NoopAsyncContext()
+    ):
+        no_match = await search_for_spotify_album(session, "Artist", "A", "token")
+        failure = await search_for_spotify_album(session, "Artist", "B", "token")
+
+    assert no_match == {}
+    assert failure is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_searches_for_one_album_share_a_request():
+    """
+    GIVEN two searches for the same album started together
+    WHEN the first one's request is still in flight
+    THEN only one HTTP request is sent and both get its hit.
+    """
+
+    async def slow_json():
+        await asyncio.sleep(0.01)  # keep the first request in flight
+        return {"albums": {"items": [{"id": "shared"}]}}
+
+    resp_200 = AsyncMock()
+    resp_200.status = 200
+    resp_200.json = slow_json
+    session = MagicMock()
+    session.get.return_value = make_response_context(resp_200)
+
+    with patch(
+        "scrobblescope.spotify.get_spotify_limiter", return_value=NoopAsyncContext()
+    ):
+        first, second = await asyncio.gather(
+            search_for_spotify_album(session, "artist", "album", "token"),
+            search_for_spotify_album(session, "artist", "album", "token"),
+        )
+
+    assert first == second == {"id": "shared"}
+    assert session.get.call_count == 1
+
+
 @pytest.mark.asyncio
 async def test_search_returns_none_on_non_200_non_429():
     """
@@ -299,3 +541,63 @@ async def test_search_succeeds_on_first_try():
     assert result == "direct_hit_123"
     assert session.get.call_count == 1
     assert mock_sleep.await_count == 0
+
+
+def _json_response(payload):
+    response = AsyncMock()
+    response.status = 200
+    response.json = AsyncMock(return_value=payload)
+    return make_response_context(response)
+
+
+@pytest.mark.asyncio
+async def test_artist_catalog_pages_and_normalizes_titles():
+    """
+    GIVEN an artist search hit and two pages of that artist's albums
+    WHEN fetch_spotify_artist_catalog runs
+    THEN both pages are read (offsets 0 and 50) and albums are keyed by
+    normalized title, keeping the first edition of a title.
+    """
+    session = MagicMock()
+    session.get.side_effect = [
+        _json_response({"artists": {"items": [{"id": "ar1", "name": "The Band"}]}}),
+        _json_response(
+            {
+                "items": [
+                    {"id": "a1", "name": "First (Deluxe Edition)"},
+                    {"id": "a2", "name": "First"},
+                ],
+                "next": "https://api.spotify.com/next",
+            }
+        ),
+        _json_response({"items": [{"id": "a3", "name": "Second"}], "next": None}),
+    ]
+
+    with patch(
+        "scrobblescope.spotify.get_spotify_limiter", return_value=NoopAsyncContext()
+    ):
+        catalog = await fetch_spotify_artist_catalog(session, "the band", "tok")
+
+    assert {title: album["id"] for title, album in catalog.items()} == {
+        "first": "a1",
+        "second": "a3",
+    }
+    page_offsets = [
+        c.kwargs["params"]["offset"] for c in session.get.call_args_list[1:]
+    ]
+    assert page_offsets == [0, 50]
+
+
+@pytest.mark.asyncio
+async def test_artist_catalog_rejects_a_different_artist():
+    session = MagicMock()
+    session.get.return_value = _json_response(
+        {"artists": {"items": [{"id": "x", "name": "Somebody Else"}]}}
+    )
+
+    with patch(
+        "scrobblescope.spotify.get_spotify_limiter", return_value=NoopAsyncContext()
+    ):
+        assert await fetch_spotify_artist_catalog(session, "the band", "tok") is None
+
+    assert session.get.call_count == 1
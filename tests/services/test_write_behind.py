@@ -0,0 +1,260 @@
+"""Tests for scrobblescope.write_behind -- background persistence of new rows.
+
+Covers:
+- Queued rows are coalesced across jobs, served from the hot tier at once
+  and upserted in batches by one flush.
+- A failed flush re-queues its rows under newer ones and raises.
+- A row Postgres keeps rejecting is retried alone and dropped after
+  _MAX_FLUSH_ATTEMPTS, so the rest of its batch is still written; outage
+  errors never count against a row.
+- The exit hook flushes what is still queued on the service loop.
+"""
+
+from unittest.mock import AsyncMock, patch
+
+import asyncpg
+import pytest
+
+from scrobblescope import write_behind
+from scrobblescope.cache import _lookup_hot_metadata
+from scrobblescope.write_behind import (
+    flush_on_exit,
+    flush_pending,
+    queue_metadata_rows,
+    queue_no_match,
+)
+
+
+def _state():
+    return (
+        patch("scrobblescope.write_behind._pending_metadata", {}),
+        patch("scrobblescope.write_behind._pending_no_match", set()),
+        patch("scrobblescope.write_behind._attempts", {}),
+        patch("scrobblescope.write_behind._ensure_persister"),
+        patch("scrobblescope.write_behind._db_configured", return_value=True),
+    )
+
+
+@pytest.mark.asyncio
+async def test_queued_rows_are_coalesced_and_flushed_in_batches():
+    """
+    GIVEN two jobs queueing three albums, one of them twice (full, then lite)
+    WHEN the queue is flushed with a batch size of two
+    THEN the album is written once with its durations, in two batches, the
+    no-match keys follow, and the hot tier served the rows before the flush.
+    """
+    conn = AsyncMock()
+    persist = AsyncMock()
+    persist_no_match = AsyncMock()
+    p1, p2, p3, p4, p5 = _state()
+    with (
+        p1,
+        p2,
+        p3,
+        p4,
+        p5,
+        patch(
+            "scrobblescope.write_behind._get_db_connection",
+            new=AsyncMock(return_value=conn),
+        ),
+        patch("scrobblescope.write_behind._batch_persist_metadata", new=persist),
+        patch(
+            "scrobblescope.write_behind._batch_persist_no_match", new=persist_no_match
+        ),
+        patch("scrobblescope.write_behind.WRITE_BEHIND_BATCH_SIZE", 2),
+    ):
+        queue_metadata_rows(
+            [
+                ("a", "x", "sp1", "2001", None, {"t": 100}),
+                ("a", "y", "sp2", "", None, {}),
+            ]
+        )
+        queue_metadata_rows(
+            [("a", "x", "sp1", "2001", "img", None), ("b", "z", "sp3", "", None, None)]
+        )
+        queue_no_match({("c", "gone")})
+        hot = _lookup_hot_metadata([("a", "x")])
+
+        written = await flush_pending()
+        assert await flush_pending() == 0
+
+    assert hot[("a", "x")]["track_durations"] == {"t": 100}
+    assert written == 3
+    batches = [c[0][1] for c in persist.await_args_list]
+    assert [len(b) for b in batches] == [2, 1]
+    assert ("a", "x", "sp1", "2001", "img", {"t": 100}) in batches[0] + batches[1]
+    persist_no_match.assert_awaited_once_with(conn, {("c", "gone")})
+    conn.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_requeues_rows_under_newer_ones():
+    """
+    GIVEN queued albums whose upsert fails
+    WHEN newer lite rows for them were queued meanwhile, one re-matched to
+    another Spotify album
+    THEN the flush raises, and the albums stay queued with the newer rows'
+    fields; only the album still matched the same keeps the failed row's
+    durations.
+    """
+    conn = AsyncMock()
+
+    async def failing_persist(conn, rows):
+        queue_metadata_rows(
+            [
+                ("a", "x", "sp1", "2009", "img", None),
+                ("a", "y", "sp9", "2009", "img", None),
+            ]
+        )
+        raise RuntimeError("db down")
+
+    p1, p2, p3, p4, p5 = _state()
+    with (
+        p1,
+        p2,
+        p3,
+        p4,
+        p5,
+        patch(
+            "scrobblescope.write_behind._get_db_connection",
+            new=AsyncMock(return_value=conn),
+        ),
+        patch(
+            "scrobblescope.write_behind._batch_persist_metadata",
+            new=failing_persist,
+        ),
+    ):
+        queue_metadata_rows(
+            [
+                ("a", "x", "sp1", "2001", None, {"t": 100}),
+                ("a", "y", "sp2", "2001", None, {"t": 100}),
+            ]
+        )
+        with pytest.raises(RuntimeError):
+            await flush_pending()
+        pending = dict(write_behind._pending_metadata)
+
+    assert pending == {
+        ("a", "x"): ("a", "x", "sp1", "2009", "img", {"t": 100}),
+        ("a", "y"): ("a", "y", "sp9", "2009", "img", None),
+    }
+    conn.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_row_that_keeps_failing_is_dropped_and_its_batch_written():
+    """
+    GIVEN a batch of three rows, one of which the DB always rejects
+    WHEN the queue is flushed until it is empty
+    THEN the batch fails once, its rows are retried one per statement, the
+    bad row is dropped after _MAX_FLUSH_ATTEMPTS and the good ones written.
+    """
+    written = []
+
+    async def persist(conn, rows):
+        if any(row[1] == "bad" for row in rows):
+            raise asyncpg.exceptions.StringDataRightTruncationError("value too long")
+        written.extend(row[1] for row in rows)
+
+    p1, p2, p3, p4, p5 = _state()
+    with (
+        p1,
+        p2,
+        p3,
+        p4,
+        p5,
+        patch(
+            "scrobblescope.write_behind._get_db_connection",
+            new=AsyncMock(return_value=AsyncMock()),
+        ),
+        patch("scrobblescope.write_behind._batch_persist_metadata", new=persist),
+        patch("scrobblescope.write_behind._batch_persist_no_match", new=AsyncMock()),
+    ):
+        queue_metadata_rows(
+            [("a", name, "sp", "", None, None) for name in ["bad", "x", "y"]]
+        )
+        failures = 0
+        while write_behind._pending_metadata:
+            try:
+                await flush_pending()
+            except asyncpg.PostgresError:
+                failures += 1
+        attempts = dict(write_behind._attempts)
+
+    assert failures == write_behind._MAX_FLUSH_ATTEMPTS
+    assert sorted(written) == ["x", "y"]
+    assert attempts == {}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "outage",
+    [
+        asyncpg.exceptions.CannotConnectNowError("the database system is starting"),
+        asyncpg.exceptions.ConnectionDoesNotExistError("connection was closed"),
+        ConnectionResetError("reset by peer"),
+    ],
+    ids=["starting", "closed", "reset"],
+)
+async def test_outage_errors_never_drop_rows(outage):
+    """
+    GIVEN a Postgres restart failing many flushes with connection errors
+    WHEN the queue is flushed until the DB is back
+    THEN no row is charged or dropped and all of them are written.
+    """
+    written = []
+    outages = [outage] * (write_behind._MAX_FLUSH_ATTEMPTS + 2)
+
+    async def persist(conn, rows):
+        if outages:
+            raise outages.pop()
+        written.extend(row[1] for row in rows)
+
+    p1, p2, p3, p4, p5 = _state()
+    with (
+        p1,
+        p2,
+        p3,
+        p4,
+        p5,
+        patch(
+            "scrobblescope.write_behind._get_db_connection",
+            new=AsyncMock(return_value=AsyncMock()),
+        ),
+        patch("scrobblescope.write_behind._batch_persist_metadata", new=persist),
+        patch("scrobblescope.write_behind._batch_persist_no_match", new=AsyncMock()),
+    ):
+        queue_metadata_rows([("a", name, "sp", "", None, None) for name in "xy"])
+        while outages:
+            with pytest.raises(type(outage)):
+                await flush_pending()
+            assert write_behind._attempts == {}
+        await flush_pending()
+
+    assert sorted(written) == ["x", "y"]
+
+
+def test_flush_on_exit_writes_what_is_still_queued():
+    persist = AsyncMock()
+    p1, p2, p3, p4, p5 = _state()
+    with (
+        p1,
+        p2,
+        p3,
+        p4,
+        p5,
+        patch(
+            "scrobblescope.write_behind._get_db_connection",
+            new=AsyncMock(return_value=AsyncMock()),
+        ),
+        patch("scrobblescope.write_behind._batch_persist_metadata", new=persist),
+        patch("scrobblescope.write_behind._batch_persist_no_match", new=AsyncMock()),
+    ):
+        flush_on_exit()
+        persist.assert_not_awaited()
+
+        queue_metadata_rows([("a", "x", "sp1", "2001", None, {})])
+        flush_on_exit()
+        assert write_behind._pending_metadata == {}
+
+    persist.assert_awaited_once()
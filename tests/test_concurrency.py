@@ -0,0 +1,145 @@
+"""Tests for scrobblescope.concurrency -- the adaptive (AIMD) in-flight limit.
+
+Covers:
+- The limit caps concurrent holders.
+- A burst of 429s in one window halves the limit once; timeouts also cut.
+- Healthy, saturated completions grow the limit up to the ceiling.
+- Cancelled waiters do not leak permits; waiters on other event loops are
+  woken when a permit is released.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from scrobblescope.concurrency import AdaptiveConcurrencyLimit
+
+
+@pytest.mark.asyncio
+async def test_limit_caps_concurrent_holders():
+    limit = AdaptiveConcurrencyLimit("test", 2, maximum=2)
+    active = 0
+    peak = 0
+
+    async def hold():
+        nonlocal active, peak
+        async with limit:
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    await asyncio.gather(*(hold() for _ in range(6)))
+
+    assert peak == 2
+    assert limit.snapshot()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_burst_of_429s_halves_limit_once():
+    """
+    GIVEN a limit of 8 with 4 requests in flight
+    WHEN every one of them is answered with a 429
+    THEN the limit is halved once (to 4), not once per request.
+    """
+    limit = AdaptiveConcurrencyLimit("test", 8)
+    gate = asyncio.Event()
+
+    async def throttled():
+        async with limit:
+            await gate.wait()
+            limit.note_throttled()
+
+    tasks = [asyncio.create_task(throttled()) for _ in range(4)]
+    await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(*tasks)
+
+    assert limit.limit == 4
+    assert limit.snapshot()["decreases"] == 1
+
+
+@pytest.mark.asyncio
+async def test_timeout_counts_as_congestion():
+    limit = AdaptiveConcurrencyLimit("test", 6, minimum=2)
+
+    for _ in range(3):
+        with pytest.raises(asyncio.TimeoutError):
+            async with limit:
+                raise asyncio.TimeoutError()
+
+    assert limit.limit == 2
+
+
+@pytest.mark.asyncio
+async def test_healthy_saturated_completions_grow_to_ceiling():
+    limit = AdaptiveConcurrencyLimit("test", 2, maximum=4)
+
+    async def quick():
+        async with limit:
+            await asyncio.sleep(0)
+
+    for _ in range(30):
+        await asyncio.gather(*(quick() for _ in range(limit.limit)))
+
+    assert limit.limit == 4
+
+
+def test_note_throttled_outside_block_is_noop():
+    limit = AdaptiveConcurrencyLimit("test", 3)
+    limit.note_throttled()
+    assert limit.limit == 3
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_permit():
+    limit = AdaptiveConcurrencyLimit("test", 1, maximum=1)
+    release = asyncio.Event()
+
+    async def holder():
+        async with limit:
+            await release.wait()
+
+    held = asyncio.create_task(holder())
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(limit.__aenter__())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    release.set()
+    await held
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    async with limit:
+        assert limit.snapshot()["in_flight"] == 1
+    assert limit.snapshot() == {
+        "limit": 1,
+        "in_flight": 0,
+        "waiting": 0,
+        "decreases": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_waiter_on_another_event_loop_is_woken():
+    """
+    GIVEN the only permit held on this loop
+    WHEN a job thread with its own event loop waits for a permit
+    THEN it proceeds once the permit is released here.
+    """
+    limit = AdaptiveConcurrencyLimit("test", 1, maximum=1)
+    acquired = threading.Event()
+
+    async def other_job():
+        async with limit:
+            acquired.set()
+
+    async with limit:
+        thread = threading.Thread(target=lambda: asyncio.run(other_job()))
+        thread.start()
+        await asyncio.sleep(0.05)
+        assert not acquired.is_set()
+
+    await asyncio.to_thread(thread.join, 5)
+    assert acquired.is_set()
@@ -23,6 +23,7 @@ from scrobblescope.heatmap import (
     _fetch_and_process_heatmap,
     heatmap_task,
 )
+from tests.helpers import streamed_fetch
 
 # ---------------------------------------------------------------------------
 # Helpers
@@ -274,7 +275,7 @@ class TestFetchAndProcessHeatmap:
             patch("scrobblescope.heatmap.set_job_progress"),
             patch("scrobblescope.heatmap.set_job_stat"),
             patch(
-                "scrobblescope.heatmap.fetch_all_recent_tracks_async",
+                "scrobblescope.heatmap.fetch_recent_tracks_incremental",
                 new_callable=AsyncMock,
                 return_value=([], {"status": "error", "reason": "lastfm_unavailable"}),
             ),
@@ -304,9 +305,9 @@ class TestFetchAndProcessHeatmap:
             patch("scrobblescope.heatmap.cleanup_expired_jobs"),
             patch("scrobblescope.heatmap.set_job_progress"),
             patch(
-                "scrobblescope.heatmap.fetch_all_recent_tracks_async",
+                "scrobblescope.heatmap.fetch_recent_tracks_incremental",
                 new_callable=AsyncMock,
-                return_value=([page], meta),
+                side_effect=streamed_fetch([page], meta),
             ),
             patch("scrobblescope.heatmap.set_job_stat") as mock_stat,
             patch("scrobblescope.heatmap.set_job_results") as mock_results,
@@ -344,7 +345,7 @@ class TestFetchAndProcessHeatmap:
             patch("scrobblescope.heatmap.cleanup_expired_jobs"),
             patch("scrobblescope.heatmap.set_job_progress"),
             patch(
-                "scrobblescope.heatmap.fetch_all_recent_tracks_async",
+                "scrobblescope.heatmap.fetch_recent_tracks_incremental",
                 new_callable=AsyncMock,
                 return_value=([], meta),  # partial status but no tracks returned
             ),
@@ -376,7 +377,7 @@ class TestFetchAndProcessHeatmap:
             patch("scrobblescope.heatmap.set_job_progress"),
             patch("scrobblescope.heatmap.set_job_stat"),
             patch(
-                "scrobblescope.heatmap.fetch_all_recent_tracks_async",
+                "scrobblescope.heatmap.fetch_recent_tracks_incremental",
                 new_callable=AsyncMock,
                 return_value=([], meta),
             ),
@@ -416,9 +417,9 @@ class TestFetchAndProcessHeatmap:
             patch("scrobblescope.heatmap.set_job_progress"),
             patch("scrobblescope.heatmap.set_job_stat"),
             patch(
-                "scrobblescope.heatmap.fetch_all_recent_tracks_async",
+                "scrobblescope.heatmap.fetch_recent_tracks_incremental",
                 new_callable=AsyncMock,
-                return_value=([page], meta),
+                side_effect=streamed_fetch([page], meta),
             ),
             patch(
                 "scrobblescope.heatmap.set_job_results",
@@ -461,9 +462,9 @@ class TestFetchAndProcessHeatmap:
             ),
             patch("scrobblescope.heatmap.set_job_stat"),
             patch(
-                "scrobblescope.heatmap.fetch_all_recent_tracks_async",
+                "scrobblescope.heatmap.fetch_recent_tracks_incremental",
                 new_callable=AsyncMock,
-                return_value=([page], meta),
+                side_effect=streamed_fetch([page], meta),
             ),
             patch("scrobblescope.heatmap.set_job_results"),
             patch("scrobblescope.heatmap.set_job_error"),
@@ -0,0 +1,95 @@
+"""Tests for scrobblescope.lru -- the byte-budgeted LRUCache.
+
+Covers:
+- approx_size grows with payload size and walks nested containers.
+- get refreshes recency so the coldest entry is evicted first.
+- Oversized values are rejected; overwrites re-account bytes.
+- TTL expiry on get and purge_expired, with counters in stats().
+- Per-entry TTL overrides.
+- peek reads without touching recency or counters.
+"""
+
+from scrobblescope.lru import LRUCache, approx_size
+
+
+def test_approx_size_counts_nested_payload():
+    small = {"track": [{"name": "a"}]}
+    large = {"track": [{"name": "a" * 1000} for _ in range(10)]}
+    assert approx_size(large) > approx_size(small) + 10_000
+
+
+def test_get_refreshes_recency_before_eviction():
+    """
+    GIVEN a cache that fits exactly two 10-byte entries
+    WHEN "a" is read and then a third entry is added
+    THEN "b" (now least recently used) is evicted, not "a".
+    """
+    cache = LRUCache(20, ttl_seconds=60, sizeof=lambda value: 10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == 20
+
+
+def test_oversized_value_is_rejected_and_overwrite_reaccounts():
+    cache = LRUCache(100, ttl_seconds=60)
+    assert cache.set("a", "x", size=40) is True
+    assert cache.set("a", "y", size=30) is True
+    assert cache.stats()["bytes"] == 30
+
+    assert cache.set("big", "z", size=101) is False
+    assert "big" not in cache
+    assert cache.get("a") == "y"
+
+
+def test_expired_entries_miss_and_are_purged():
+    """
+    GIVEN entries written at t=0 with a 10-second TTL
+    WHEN one is read at t=10 and the rest are purged
+    THEN the read is a miss and every entry is gone.
+    """
+    cache = LRUCache(1000, ttl_seconds=10, sizeof=lambda value: 1)
+    cache.set("a", 1, now=0)
+    cache.set("b", 2, now=0)
+    cache.set("c", 3, now=5)
+
+    assert cache.get("a", now=10) is None
+    assert cache.purge_expired(now=10) == 1
+    assert cache.get("c", now=10) == 3
+
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["expirations"] == 2
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+
+
+def test_per_entry_ttl_overrides_default():
+    cache = LRUCache(1000, ttl_seconds=10, sizeof=lambda value: 1)
+    cache.set("long", 1, now=0, ttl=100)
+    cache.set("short", 2, now=0)
+
+    assert cache.get("short", now=50) is None
+    assert cache.get("long", now=50) == 1
+
+
+def test_peek_leaves_recency_and_counters_alone():
+    cache = LRUCache(20, ttl_seconds=60, sizeof=lambda value: 10)
+    cache.set("a", 1, now=0)
+    cache.set("b", 2, now=0)
+
+    assert cache.peek("a", now=1) == 1
+    assert cache.peek("a", now=61) is None  # expired, but not dropped
+    cache.set("c", 3, now=1)
+
+    assert "a" not in cache  # still the coldest entry
+    assert cache.stats()["hits"] == 0
+    assert cache.stats()["misses"] == 0
@@ -263,6 +263,28 @@ def test_results_loading_valid_post(client):
     assert mock_start.call_args[0][0] is background_task
 
 
+def test_results_loading_passes_ingest_mode_override(client):
+    """
+    GIVEN ingest_mode=charts in the form, then an unknown value
+    WHEN POST /results_loading is submitted
+    THEN "charts" reaches background_task and the unknown value becomes None.
+    """
+    with (
+        patch(
+            "scrobblescope.routes.run_async_in_thread",
+            return_value={"exists": True, "registered_year": None},
+        ),
+        patch("scrobblescope.routes.start_job_thread") as mock_start,
+    ):
+        client.post(
+            "/results_loading", data={**VALID_FORM_DATA, "ingest_mode": "charts"}
+        )
+        client.post("/results_loading", data={**VALID_FORM_DATA, "ingest_mode": "x"})
+
+    assert mock_start.call_args_list[0].kwargs["args"][-1] == "charts"
+    assert mock_start.call_args_list[1].kwargs["args"][-1] is None
+
+
 def test_results_loading_missing_username(client):
     """
     GIVEN a POST to /results_loading without a username
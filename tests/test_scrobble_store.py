@@ -0,0 +1,383 @@
+"""Tests for scrobblescope.scrobble_store -- incremental Last.fm sync.
+
+Covers:
+- _plan_sync: first sync, fully covered range, high-water-mark extension with
+  lookback, left-gap extension, disjoint reset, future right edge capped at now.
+- _window_rows: boundary rows outside a fetched window are never stored.
+- fetch_recent_tracks_incremental: DB-down fallback, store hit that skips
+  Last.fm, delta fetch + persist on a second connection (duplicate
+  scrobbles kept), no persist over another job's newer sync, partial fetch
+  never advances the window, scrobbles_cb streaming order.
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from scrobblescope import scrobble_store
+from scrobblescope.scrobble_store import (
+    _plan_sync,
+    _window_rows,
+    fetch_recent_tracks_incremental,
+)
+from scrobblescope.scrobbles import ScrobbleBatch
+
+DAY = 24 * 60 * 60
+
+
+def _page(*rows):
+    """Build a Last.fm page from ``(uts, artist, album, track)`` rows."""
+    return {
+        "recenttracks": {
+            "track": [
+                {
+                    "artist": {"#text": artist},
+                    "album": {"#text": album},
+                    "name": track,
+                    "date": {"uts": str(uts)},
+                }
+                for uts, artist, album, track in rows
+            ]
+        }
+    }
+
+
+def _paged_fetch(pages, metadata):
+    """Fake ``fetch_all_recent_tracks_async`` honouring its page_cb contract."""
+
+    async def _fetch(username, from_ts, to_ts, progress_cb=None, page_cb=None):
+        for page in pages:
+            page_cb(page)
+        return [], metadata
+
+    return _fetch
+
+
+def _mock_conn():
+    """Return an asyncpg-like mock connection with a usable transaction()."""
+    conn = AsyncMock()
+    conn.transaction = MagicMock()
+    conn.transaction.return_value.__aenter__ = AsyncMock(return_value=None)
+    conn.transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+    return conn
+
+
+# ---------------------------------------------------------------------------
+# _plan_sync
+# ---------------------------------------------------------------------------
+
+
+def test_plan_sync_first_sync_fetches_everything_and_caps_at_now():
+    """
+    GIVEN no stored sync state and a range ending in the future
+    WHEN _plan_sync runs
+    THEN the whole range is fetched, the store is reset, and the new
+    high-water mark stops at now.
+    """
+    windows, reset, new_state = _plan_sync(None, 100, 10_000, now=5_000)
+    assert windows == [(100, 10_000)]
+    assert reset is True
+    assert new_state == (100, 5_000)
+
+
+def test_plan_sync_fully_covered_range_fetches_nothing():
+    """A closed year already inside the synced window needs no Last.fm call."""
+    windows, reset, new_state = _plan_sync((0, 50 * DAY), DAY, 40 * DAY, now=99 * DAY)
+    assert windows == []
+    assert reset is False
+    assert new_state == (0, 50 * DAY)
+
+
+def test_plan_sync_extends_high_water_mark_with_lookback():
+    """
+    GIVEN a window synced up to day 300
+    WHEN a request runs to day 365
+    THEN only the lookback before day 300 plus the new days are fetched.
+    """
+    with patch.object(scrobble_store, "SCROBBLE_SYNC_LOOKBACK_SECONDS", DAY):
+        windows, reset, new_state = _plan_sync(
+            (0, 300 * DAY), 0, 365 * DAY, now=400 * DAY
+        )
+    assert windows == [(299 * DAY + 1, 365 * DAY)]
+    assert reset is False
+    assert new_state == (0, 365 * DAY)
+
+
+def test_plan_sync_left_gap_is_fetched_once():
+    """A request starting before the synced window fetches only the gap."""
+    with patch.object(scrobble_store, "SCROBBLE_SYNC_LOOKBACK_SECONDS", 0):
+        windows, reset, new_state = _plan_sync(
+            (100 * DAY, 200 * DAY), 50 * DAY, 150 * DAY, now=999 * DAY
+        )
+    assert windows == [(50 * DAY, 100 * DAY - 1)]
+    assert reset is False
+    assert new_state == (50 * DAY, 200 * DAY)
+
+
+def test_plan_sync_disjoint_range_resets_window():
+    """A range that neither overlaps nor touches the window replaces it."""
+    windows, reset, new_state = _plan_sync(
+        (500 * DAY, 600 * DAY), 0, 100 * DAY, now=999 * DAY
+    )
+    assert windows == [(0, 100 * DAY)]
+    assert reset is True
+    assert new_state == (0, 100 * DAY)
+
+
+# ---------------------------------------------------------------------------
+# Row flattening
+# ---------------------------------------------------------------------------
+
+
+def test_window_rows_drops_out_of_range_boundary_rows():
+    """Only rows inside the inclusive window become stored rows."""
+    batch = ScrobbleBatch.from_pages(
+        [_page((10, "A", "X", "t1"), (20, "B", "Y", "t2"), (99, "C", "Z", "t3"))]
+    )
+
+    assert _window_rows(batch, 0, len(batch), 10, 20) == [
+        (10, "A", "X", "t1"),
+        (20, "B", "Y", "t2"),
+    ]
+
+
+# ---------------------------------------------------------------------------
+# fetch_recent_tracks_incremental
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.asyncio
+async def test_incremental_falls_back_to_full_fetch_without_db():
+    """
+    GIVEN the DB is unavailable
+    WHEN fetch_recent_tracks_incremental runs
+    THEN the whole range is fetched from Last.fm into the batch.
+    """
+    with (
+        patch(
+            "scrobblescope.scrobble_store._get_db_connection",
+            new_callable=AsyncMock,
+            return_value=None,
+        ),
+        patch(
+            "scrobblescope.scrobble_store.fetch_all_recent_tracks_async",
+            new_callable=AsyncMock,
+            side_effect=_paged_fetch([_page((5, "A", "X", "t"))], {"status": "ok"}),
+        ) as mock_fetch,
+    ):
+        batch, meta = await fetch_recent_tracks_incremental("User", 0, 10)
+
+    assert mock_fetch.await_args.args == ("User", 0, 10)
+    assert list(batch.rows()) == [(5, "A", "X", "t")]
+    assert meta == {"status": "ok"}
+
+
+@pytest.mark.asyncio
+async def test_incremental_store_hit_skips_lastfm():
+    """
+    GIVEN a synced window covering the whole request
+    WHEN fetch_recent_tracks_incremental runs
+    THEN stored rows fill the batch and Last.fm is not called.
+    """
+    conn = _mock_conn()
+    conn.fetchrow.return_value = {"synced_from_uts": 0, "synced_to_uts": 1000}
+    conn.fetch.return_value = [
+        {"uts": 50, "artist": "A", "album": "X", "track": "t1"},
+    ]
+    with (
+        patch(
+            "scrobblescope.scrobble_store._get_db_connection",
+            new_callable=AsyncMock,
+            return_value=conn,
+        ),
+        patch(
+            "scrobblescope.scrobble_store.fetch_all_recent_tracks_async",
+            new_callable=AsyncMock,
+        ) as mock_fetch,
+    ):
+        batch, meta = await fetch_recent_tracks_incremental("User", 10, 900)
+
+    mock_fetch.assert_not_awaited()
+    assert list(batch.rows()) == [(50, "A", "X", "t1")]
+    assert meta["status"] == "ok"
+    assert meta["store_scrobbles"] == 1
+    # Username is case-insensitive on Last.fm, so the store key is lowered.
+    assert conn.fetchrow.await_args.args[1] == "user"
+    conn.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_incremental_fetches_delta_and_persists():
+    """
+    GIVEN a window synced to uts 1000 and a request up to uts 2000
+    WHEN fetch_recent_tracks_incremental runs
+    THEN only the delta is fetched with no connection held, stored rows inside
+    the delta are superseded by the fetched ones, and the fetched rows --
+    including a track scrobbled twice in the same second -- are persisted on
+    a second connection.
+    """
+    lookup_conn = _mock_conn()
+    lookup_conn.fetchrow.return_value = {"synced_from_uts": 0, "synced_to_uts": 1000}
+    lookup_conn.fetch.return_value = [
+        {"uts": 500, "artist": "A", "album": "X", "track": "old"},
+        {"uts": 1000, "artist": "A", "album": "X", "track": "resynced"},
+    ]
+    persist_conn = _mock_conn()
+    persist_conn.fetchrow.return_value = lookup_conn.fetchrow.return_value
+    delta_page = _page(
+        (1500, "B", "Y", "new"),
+        (1500, "B", "Y", "new"),
+        (1000, "A", "X", "resynced"),
+    )
+    fetch = _paged_fetch(
+        [delta_page], {"status": "ok", "pages_expected": 1, "pages_received": 1}
+    )
+
+    async def fetch_without_connection(*args, **kwargs):
+        lookup_conn.close.assert_awaited_once()
+        return await fetch(*args, **kwargs)
+
+    with (
+        patch.object(scrobble_store, "SCROBBLE_SYNC_LOOKBACK_SECONDS", 1),
+        patch(
+            "scrobblescope.scrobble_store._get_db_connection",
+            new_callable=AsyncMock,
+            side_effect=[lookup_conn, persist_conn],
+        ),
+        patch(
+            "scrobblescope.scrobble_store.fetch_all_recent_tracks_async",
+            new_callable=AsyncMock,
+            side_effect=fetch_without_connection,
+        ) as mock_fetch,
+    ):
+        batch, meta = await fetch_recent_tracks_incremental("user", 0, 2000)
+
+    mock_fetch.assert_awaited_once()
+    assert mock_fetch.await_args.args == ("user", 1000, 2000)
+    assert list(batch.rows()) == [
+        (500, "A", "X", "old"),
+        (1500, "B", "Y", "new"),
+        (1500, "B", "Y", "new"),
+        (1000, "A", "X", "resynced"),
+    ]
+    assert meta["pages_received"] == 1
+    lookup_conn.execute.assert_not_awaited()
+    insert_calls = [
+        c
+        for c in persist_conn.execute.await_args_list
+        if "INSERT INTO lastfm_scrobbles" in c.args[0]
+    ]
+    assert "pg_advisory_xact_lock" in persist_conn.execute.await_args_list[0].args[0]
+    assert len(insert_calls) == 1
+    assert "ON CONFLICT" not in insert_calls[0].args[0]
+    assert insert_calls[0].args[2] == [1500, 1500, 1000]
+    persist_conn.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_incremental_persist_skips_when_another_job_synced_first():
+    """
+    GIVEN a job that planned its delta on the window synced to uts 1000
+    WHEN another job for the user has moved the window before it persists
+    THEN it writes no rows and leaves the other job's window alone.
+    """
+    lookup_conn = _mock_conn()
+    lookup_conn.fetchrow.return_value = {"synced_from_uts": 0, "synced_to_uts": 1000}
+    lookup_conn.fetch.return_value = []
+    persist_conn = _mock_conn()
+    persist_conn.fetchrow.return_value = {"synced_from_uts": 0, "synced_to_uts": 1800}
+    with (
+        patch(
+            "scrobblescope.scrobble_store._get_db_connection",
+            new_callable=AsyncMock,
+            side_effect=[lookup_conn, persist_conn],
+        ),
+        patch(
+            "scrobblescope.scrobble_store.fetch_all_recent_tracks_async",
+            new_callable=AsyncMock,
+            side_effect=_paged_fetch(
+                [_page((1500, "B", "Y", "new"))],
+                {"status": "ok", "pages_expected": 1, "pages_received": 1},
+            ),
+        ),
+    ):
+        batch, meta = await fetch_recent_tracks_incremental("user", 0, 2000)
+
+    assert len(batch) == 1 and meta["status"] == "ok"
+    statements = [c.args[0] for c in persist_conn.execute.await_args_list]
+    assert len(statements) == 1 and "pg_advisory_xact_lock" in statements[0]
+    persist_conn.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_incremental_partial_fetch_does_not_advance_window():
+    """A partial delta fetch returns its data but leaves the store untouched."""
+    conn = _mock_conn()
+    conn.fetchrow.return_value = None
+    with (
+        patch(
+            "scrobblescope.scrobble_store._get_db_connection",
+            new_callable=AsyncMock,
+            return_value=conn,
+        ),
+        patch(
+            "scrobblescope.scrobble_store.fetch_all_recent_tracks_async",
+            new_callable=AsyncMock,
+            side_effect=_paged_fetch(
+                [_page((5, "A", "X", "t"))],
+                {
+                    "status": "partial",
+                    "pages_expected": 2,
+                    "pages_received": 1,
+                    "pages_dropped": 1,
+                },
+            ),
+        ),
+    ):
+        batch, meta = await fetch_recent_tracks_incremental("user", 0, 10)
+
+    assert meta["status"] == "partial"
+    assert meta["pages_dropped"] == 1
+    assert len(batch) == 1
+    conn.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_incremental_reports_stored_then_fetched_rows_to_scrobbles_cb():
+    """
+    GIVEN stored rows and a delta window
+    WHEN fetch_recent_tracks_incremental runs with scrobbles_cb
+    THEN the stored range is reported before the fetched one.
+    """
+    conn = _mock_conn()
+    conn.fetchrow.return_value = {"synced_from_uts": 0, "synced_to_uts": 100}
+    conn.fetch.return_value = [{"uts": 5, "artist": "A", "album": "X", "track": "t"}]
+    seen = []
+    with (
+        patch.object(scrobble_store, "SCROBBLE_SYNC_LOOKBACK_SECONDS", 0),
+        patch(
+            "scrobblescope.scrobble_store._get_db_connection",
+            new_callable=AsyncMock,
+            return_value=conn,
+        ),
+        patch(
+            "scrobblescope.scrobble_store.fetch_all_recent_tracks_async",
+            new_callable=AsyncMock,
+            side_effect=_paged_fetch(
+                [_page((150, "B", "Y", "u"), (160, "B", "Y", "v"))],
+                {"status": "ok", "pages_expected": 1, "pages_received": 1},
+            ),
+        ),
+    ):
+        batch, meta = await fetch_recent_tracks_incremental(
+            "user",
+            0,
+            200,
+            scrobbles_cb=lambda b, start, end: seen.append(list(b.rows(start, end))),
+        )
+
+    assert seen == [
+        [(5, "A", "X", "t")],
+        [(150, "B", "Y", "u"), (160, "B", "Y", "v")],
+    ]
+    assert meta["store_scrobbles"] == 1
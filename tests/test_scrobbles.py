@@ -0,0 +1,76 @@
+"""Tests for scrobblescope.scrobbles -- the columnar ScrobbleBatch.
+
+Covers:
+- StringTable interning returns dense, stable ids.
+- ScrobbleBatch.extend_page skips now-playing tracks and applies the
+  historical "..." / "" field defaults.
+- from_pages/rows round-trip rows in arrival order with shared string ids.
+"""
+
+from scrobblescope.scrobbles import ScrobbleBatch, StringTable
+
+
+def test_string_table_interns_once():
+    table = StringTable()
+    assert table.intern("a") == 0
+    assert table.intern("b") == 1
+    assert table.intern("a") == 0
+    assert len(table) == 2
+    assert table[1] == "b"
+
+
+def test_extend_page_skips_now_playing_and_applies_defaults():
+    """
+    GIVEN a page with a now-playing track, a null album and a missing name
+    WHEN extend_page runs
+    THEN only dated tracks are added, with "" for nulls and "..." for
+    missing keys.
+    """
+    page = {
+        "recenttracks": {
+            "track": [
+                {
+                    "artist": {"#text": "A"},
+                    "album": {"#text": "X"},
+                    "name": "now",
+                    "@attr": {"nowplaying": "true"},
+                },
+                {
+                    "artist": {"#text": "A"},
+                    "album": {"#text": None},
+                    "date": {"uts": "100"},
+                },
+            ]
+        }
+    }
+    batch = ScrobbleBatch()
+
+    assert batch.extend_page(page) == 1
+    assert list(batch.rows()) == [(100, "A", "", "...")]
+
+
+def test_from_pages_preserves_order_and_shares_string_ids():
+    pages = [
+        {
+            "recenttracks": {
+                "track": [
+                    {
+                        "artist": {"#text": "A"},
+                        "album": {"#text": "X"},
+                        "name": "t1",
+                        "date": {"uts": str(uts)},
+                    }
+                    for uts in (3, 2)
+                ]
+            }
+        },
+        {"recenttracks": {"track": []}},
+    ]
+
+    batch = ScrobbleBatch.from_pages(pages)
+
+    assert len(batch) == 2
+    assert batch.row(1) == (2, "A", "X", "t1")
+    assert list(batch.rows(0, 1)) == [(3, "A", "X", "t1")]
+    assert len(batch.artists) == 1
+    assert batch.artist_ids.tolist() == [0, 0]
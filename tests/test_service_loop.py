@@ -0,0 +1,51 @@
+"""Tests for scrobblescope.service_loop -- the background maintenance loop.
+
+Covers:
+- Coroutines submitted from any thread run on the one service thread.
+- A failing coroutine is logged, not raised into the submitter.
+"""
+
+import asyncio
+import logging
+import threading
+
+from scrobblescope.service_loop import get_service_loop, submit
+
+
+def test_submitted_coroutines_run_on_the_service_thread():
+    """
+    GIVEN coroutines submitted from the test thread and a second thread
+    WHEN both complete
+    THEN both ran on the same daemon thread and the loop is reused.
+    """
+
+    async def where():
+        await asyncio.sleep(0)
+        return threading.current_thread()
+
+    first = submit(where()).result(5)
+    other = []
+    t = threading.Thread(target=lambda: other.append(submit(where()).result(5)))
+    t.start()
+    t.join(5)
+
+    assert first is other[0]
+    assert first is not threading.current_thread()
+    assert first.daemon
+    assert get_service_loop() is get_service_loop()
+
+
+def test_failed_coroutine_is_logged(caplog):
+    async def boom():
+        raise RuntimeError("refresh failed")
+
+    future = submit(boom())
+    with caplog.at_level(logging.WARNING):
+        try:
+            future.result(5)
+        except RuntimeError:
+            pass
+        # The logging callback runs on the service thread after completion.
+        submit(asyncio.sleep(0)).result(5)
+
+    assert "Background task failed" in caplog.text
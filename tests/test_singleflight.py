@@ -0,0 +1,106 @@
+"""Tests for scrobblescope.singleflight -- cross-job request deduplication.
+
+Covers:
+- Callers on two threads/event loops share one in-flight call.
+- A cancelled leader releases its followers to fetch for themselves.
+- do_many fetches only keys nobody else is fetching; missing keys map to None.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from scrobblescope.singleflight import SingleFlight
+
+
+def test_calls_on_different_loops_share_one_request():
+    """
+    GIVEN two threads, each with its own event loop, asking for one key
+    WHEN the leader's call is still running as the follower arrives
+    THEN the call runs once and both threads get its result.
+    """
+    flights = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = {}
+
+    async def slow_call():
+        calls.append(1)
+        started.set()
+        while not release.is_set():
+            await asyncio.sleep(0.001)
+        return {"id": "sp1"}
+
+    def run(name):
+        results[name] = asyncio.run(flights.do(("a", "b"), slow_call))
+
+    leader = threading.Thread(target=run, args=("leader",))
+    leader.start()
+    assert started.wait(5)
+    follower = threading.Thread(target=run, args=("follower",))
+    follower.start()
+    while flights.stats()["shared"] == 0:
+        time.sleep(0.001)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(calls) == 1
+    assert results == {"leader": {"id": "sp1"}, "follower": {"id": "sp1"}}
+    assert flights.stats() == {"led": 1, "shared": 1, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_releases_followers_to_fetch():
+    flights = SingleFlight("test")
+    gate = asyncio.Event()
+
+    async def blocked():
+        await gate.wait()
+
+    async def fresh():
+        return "fresh"
+
+    leader = asyncio.ensure_future(flights.do("key", blocked))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flights.do("key", fresh))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+
+    assert await follower == "fresh"
+    assert flights.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_do_many_fetches_only_unclaimed_keys():
+    """
+    GIVEN id "b" already in flight for another caller
+    WHEN do_many asks for "a", "b" and "c" and Spotify omits "c"
+    THEN only "a" and "c" are fetched, "b" comes from the other call and
+    "c" maps to None.
+    """
+    flights = SingleFlight("test")
+    gate = asyncio.Event()
+    batches = []
+
+    async def other_fetch(owned):
+        await gate.wait()
+        return {"b": "B"}
+
+    async def fetch(owned):
+        batches.append(owned)
+        gate.set()
+        return {"a": "A"}
+
+    other = asyncio.ensure_future(flights.do_many(["b"], other_fetch))
+    await asyncio.sleep(0)
+
+    result = await flights.do_many(["a", "b", "c"], fetch)
+
+    assert batches == [["a", "c"]]
+    assert result == {"a": "A", "b": "B", "c": None}
+    assert await other == {"b": "B"}
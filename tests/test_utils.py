@@ -2,30 +2,34 @@
 import asyncio
 import threading
 import time
+from unittest.mock import MagicMock
 
+import aiohttp
 import pytest
 
 from scrobblescope.utils import (
     REQUEST_CACHE,
-    _cache_lock,
     _GlobalThrottle,
+    _SlidingWindowPolicy,
+    _ThrottledLimiter,
     cleanup_expired_cache,
     format_seconds,
     format_seconds_mobile,
     get_cached_response,
     get_lastfm_limiter,
+    get_request_cache_stats,
     set_cached_response,
+    tag_requests_with_job,
 )
+from tests.helpers import NoopAsyncContext
 
 
 @pytest.fixture(autouse=True)
 def clear_cache():
     """Clear REQUEST_CACHE before and after each test to prevent state bleed."""
-    with _cache_lock:
-        REQUEST_CACHE.clear()
+    REQUEST_CACHE.clear()
     yield
-    with _cache_lock:
-        REQUEST_CACHE.clear()
+    REQUEST_CACHE.clear()
 
 
 def test_get_cached_response_returns_fresh_entry():
@@ -55,8 +59,7 @@ def test_get_cached_response_returns_none_for_expired_entry():
     WHEN get_cached_response is called
     THEN it should return None (treat as miss).
     """
-    with _cache_lock:
-        REQUEST_CACHE["/api/stale"] = (time.time() - 7200, {"stale": True})
+    REQUEST_CACHE.set("/api/stale", {"stale": True}, now=time.time() - 7200)
     result = get_cached_response("/api/stale")
     assert result is None
 
@@ -79,15 +82,51 @@ def test_cleanup_expired_cache_removes_expired_keeps_fresh():
     WHEN cleanup_expired_cache is called
     THEN only expired entries should be removed; fresh entries should remain.
     """
-    with _cache_lock:
-        REQUEST_CACHE["/old"] = (time.time() - 7200, {"old": True})
-        REQUEST_CACHE["/new"] = (time.time(), {"new": True})
+    REQUEST_CACHE.set("/old", {"old": True}, now=time.time() - 7200)
+    REQUEST_CACHE.set("/new", {"new": True})
 
     cleanup_expired_cache()
 
-    with _cache_lock:
-        assert "/old" not in REQUEST_CACHE
-        assert "/new" in REQUEST_CACHE
+    assert "/old" not in REQUEST_CACHE
+    assert "/new" in REQUEST_CACHE
+
+
+def test_compressed_response_round_trips_and_is_smaller():
+    """
+    GIVEN a repetitive payload cached with compress=True
+    WHEN it is read back
+    THEN an equal, independent copy is returned and fewer bytes are charged.
+    """
+    payload = {"track": [{"name": "song", "image": ["url"] * 4}] * 200}
+    set_cached_response("/api/plain", payload)
+    set_cached_response("/api/packed", payload, compress=True)
+
+    result = get_cached_response("/api/packed")
+    assert result == payload
+    assert result is not payload
+    assert get_cached_response("/api/packed") is not result
+
+    stats = get_request_cache_stats()
+    plain_only = REQUEST_CACHE._sizeof(payload)
+    assert stats["bytes"] - plain_only < plain_only / 10
+
+
+def test_request_cache_stats_count_hits_and_misses():
+    """
+    GIVEN one cached response
+    WHEN it is read once and a missing key is read once
+    THEN the stats report one more hit, one more miss, and non-zero bytes.
+    """
+    before = get_request_cache_stats()
+    set_cached_response("/api/test", {"result": "ok"})
+    get_cached_response("/api/test")
+    get_cached_response("/api/missing")
+
+    after = get_request_cache_stats()
+    assert after["hits"] - before["hits"] == 1
+    assert after["misses"] - before["misses"] == 1
+    assert after["entries"] == 1
+    assert after["bytes"] > 0
 
 
 def test_cache_concurrent_write_and_cleanup_no_error():
@@ -95,7 +134,7 @@ def test_cache_concurrent_write_and_cleanup_no_error():
     GIVEN multiple threads simultaneously writing to and cleaning REQUEST_CACHE
     WHEN all threads run concurrently
     THEN no RuntimeError (dictionary changed size during iteration) should occur.
-    This validates WP-2 thread-safety: _cache_lock guards all cache mutations.
+    This validates WP-2 thread-safety: the LRUCache lock guards all mutations.
     """
     errors = []
 
@@ -123,20 +162,189 @@ def test_cache_concurrent_write_and_cleanup_no_error():
     assert errors == [], f"Concurrent cache access raised errors: {errors}"
 
 
-def test_global_throttle_serializes_rapid_calls():
+@pytest.mark.asyncio
+async def test_global_throttle_serializes_rapid_calls():
+    """
+    GIVEN a _GlobalThrottle at rate=50 (0.02s minimum interval)
+    WHEN 5 acquires are issued at once
+    THEN the first passes immediately and the rest are spaced by at least
+    the minimum interval, proving that concurrent callers are serialized.
+    """
+    throttle = _GlobalThrottle(50, 1.0)
+    granted = []
+
+    async def acquire():
+        await throttle.acquire("job")
+        granted.append(time.monotonic())
+
+    start = time.monotonic()
+    await asyncio.gather(*(acquire() for _ in range(5)))
+
+    assert granted[0] - start < 0.015
+    gaps = [b - a for a, b in zip(granted, granted[1:])]
+    assert all(gap >= 0.015 for gap in gaps)
+
+
+@pytest.mark.asyncio
+async def test_global_throttle_serves_jobs_round_robin():
     """
-    GIVEN a _GlobalThrottle at rate=10 (0.1s minimum interval)
-    WHEN next_wait() is called 5 times in rapid succession
-    THEN the first call returns 0 and subsequent calls return increasing
-    positive waits, proving that concurrent callers are serialized.
+    GIVEN a heavy job with 8 queued requests
+    WHEN a light job queues 2 requests behind them
+    THEN the light job's requests are interleaved with the heavy job's
+    instead of waiting for its whole backlog.
     """
+    throttle = _GlobalThrottle(200, 1.0)
+    order = []
+
+    async def request(job):
+        await throttle.acquire(job)
+        order.append(job)
+
+    heavy = [asyncio.create_task(request("heavy")) for _ in range(8)]
+    await asyncio.sleep(0)
+    light = [asyncio.create_task(request("light")) for _ in range(2)]
+    await asyncio.gather(*heavy, *light)
+
+    assert order[:5] == ["heavy", "heavy", "light", "heavy", "light"]
+    assert throttle.queued_jobs() == {}
+
+
+@pytest.mark.asyncio
+async def test_global_throttle_skips_cancelled_waiters():
+    throttle = _GlobalThrottle(100, 1.0)
+    await throttle.acquire("a")
+    cancelled = asyncio.create_task(throttle.acquire("a"))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    await asyncio.wait_for(throttle.acquire("b"), timeout=1)
+    assert cancelled.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_global_throttle_back_off_pauses_then_ramps_up():
+    """
+    GIVEN a fast throttle with a 0.02s resume interval
+    WHEN a 429 backs it off for 0.05s and three requests queue up
+    THEN none is granted before the pause ends, the burst after it is spaced
+    by the resume interval, and the pause is counted once.
+    """
+    throttle = _GlobalThrottle(1000, 1.0, resume_interval=0.02)
+    throttle.back_off(0.05)
+    throttle.back_off(0.01)  # inside the current pause: no extra penalty
+    granted = []
+
+    async def acquire():
+        await throttle.acquire("job")
+        granted.append(time.monotonic())
+
+    start = time.monotonic()
+    await asyncio.gather(*(acquire() for _ in range(3)))
+
+    assert granted[0] - start >= 0.045
+    gaps = [b - a for a, b in zip(granted, granted[1:])]
+    assert all(gap >= 0.015 for gap in gaps)
+    stats = throttle.stats()
+    assert stats["pauses"] == 1
+    assert 0.045 <= stats["penalty_seconds"] <= 0.06
+    assert stats["paused_for"] == 0
+
+
+def test_global_throttle_back_off_extension_adds_only_new_time():
     throttle = _GlobalThrottle(10, 1.0)
-    waits = [throttle.next_wait() for _ in range(5)]
+    throttle.back_off(10)
+    throttle.back_off(15)
+
+    stats = throttle.stats()
+    assert stats["pauses"] == 1
+    assert 14.9 <= stats["penalty_seconds"] <= 15.1
+
+
+@pytest.mark.asyncio
+async def test_throttled_limiter_tags_requests_with_bound_job():
+    """Requests made after tag_requests_with_job queue under that job id."""
+    seen = []
+
+    class _RecordingThrottle:
+        async def acquire(self, job_key=None):
+            seen.append(job_key)
+
+    async def run():
+        tag_requests_with_job("job-42")
+        limiter = _ThrottledLimiter(_RecordingThrottle(), NoopAsyncContext())
+        async with limiter:
+            pass
+
+    await asyncio.create_task(run())
+    assert seen == ["job-42"]
+
+
+def test_sliding_window_allows_burst_then_enforces_average():
+    """
+    GIVEN a 2 req/s average over 10s with bursts of 5 per second
+    WHEN slots are consumed back to back
+    THEN 5 go out at once, the 6th waits for the burst second, and after
+    the 20-slot window budget is spent the next waits for the window.
+    """
+    policy = _SlidingWindowPolicy(2, 10, 5)
+    for _ in range(5):
+        assert policy.delay(0.0) == 0
+        policy.consume(0.0)
+    assert policy.delay(0.0) == pytest.approx(1.0)
+
+    for second in range(1, 4):
+        for _ in range(5):
+            assert policy.delay(float(second)) == 0
+            policy.consume(float(second))
+    assert policy.delay(4.0) == pytest.approx(6.0)
+
+
+def test_sliding_window_refund_returns_the_slot():
+    policy = _SlidingWindowPolicy(1, 10, 1)
+    token = policy.consume(0.0)
+    assert policy.delay(0.5) > 0
+
+    policy.refund(token)
+
+    assert policy.delay(0.5) == 0
+
+
+@pytest.mark.asyncio
+async def test_throttled_limiter_refunds_slot_when_cancelled_before_sending():
+    """
+    GIVEN a throttle slot granted to a request
+    WHEN the request is cancelled while waiting on the per-loop limiter
+    THEN the slot is refunded to the global throttle.
+    """
+    throttle = _GlobalThrottle(policy=_SlidingWindowPolicy(1, 60, 1))
+    blocked = asyncio.Event()
+
+    class _BlockingLimiter(NoopAsyncContext):
+        async def __aenter__(self):
+            await blocked.wait()
+
+    task = asyncio.create_task(
+        _ThrottledLimiter(throttle, _BlockingLimiter()).__aenter__()
+    )
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    await asyncio.wait_for(throttle.acquire(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_throttled_limiter_refunds_slot_on_connection_failure():
+    throttle = _GlobalThrottle(policy=_SlidingWindowPolicy(1, 60, 1))
+    limiter = _ThrottledLimiter(throttle, NoopAsyncContext())
+    connector_error = aiohttp.ClientConnectorError(MagicMock(), OSError("down"))
+
+    with pytest.raises(aiohttp.ClientConnectorError):
+        async with limiter:
+            raise connector_error
 
-    assert waits[0] == 0.0
-    assert all(w > 0 for w in waits[1:])
-    for i in range(1, len(waits) - 1):
-        assert waits[i + 1] > waits[i]
+    await asyncio.wait_for(throttle.acquire(), timeout=1)
 
 
 def test_cross_thread_limiters_share_global_throttle():